@@ -3,39 +3,107 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.svm import SVR
-from sklearn.linear_model import LinearRegression
-from sklearn.neural_network import MLPRegressor
-from sklearn.metrics import mean_squared_error, r2_score
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import base64
 from io import BytesIO
 import datetime
+import os
+import time
+
+from deviation_data import (
+    augment_data, generate_demo_data, read_csv_preview, load_mapped_csv, compact_dataset, map_columns, NOT_AVAILABLE,
+    OPTIONAL_DEFAULTS
+)
+from deviation_cache import SharedCache, bytes_fingerprint, dataframe_fingerprint, estimate_nbytes
+from deviation_model import (split_data, build_design_matrix, preprocessor_kind, design_dtype, fit_model, fit_models, update_models,
+                              evaluate, predict, predict_holes, get_feature_names, FEATURES, MODEL_OPTIONS, INCREMENTAL_MODEL_OPTIONS)
+from deviation_store import model_store_key, save_models, load_models
+from deviation_tuning import tune_models
+from deviation_profiles import load_profiles, save_profile, match_profile
+from deviation_intervals import (fit_quantile_models, calibrate_forest_intervals, prediction_intervals,
+                                 supports_intervals, INTERVAL_COVERAGE, QUANTILE_OPTIONS)
+from deviation_perf import StageTimer, memory_report, current_memory_mb
+from deviation_stats import exploration_statistics
+from deviation_aggregate import (AGGREGATION_ROW_THRESHOLD, density_grid, binned_trend, box_statistics,
+                                 histogram_counts)
+from deviation_trajectory import (hole_trajectories, campaign_trajectories, decimate_trajectories,
+                                  pack_trajectories, COLLAR_COLUMNS)
+
+# Graine de l'augmentation des données (reproductible d'une exécution à l'autre)
+AUGMENTATION_SEED = 42
+# Mémoire maximale du cache commun à toutes les sessions (données, jeux augmentés, matrices des
+# variables, modèles); modifiable par la variable d'environnement DEVIATION_SHARED_CACHE_MB
+SHARED_CACHE_MAX_BYTES = int(float(os.environ.get('DEVIATION_SHARED_CACHE_MB', 2048)) * 1e6)
+# Budgets de points proposés pour la vue 3D d'une campagne, et nombre maximal de forages tracés
+CAMPAIGN_POINT_BUDGETS = [20000, 50000, 100000, 200000]
+CAMPAIGN_MAX_HOLES = 20000
+# Mémoire des données et modèles d'une session au-delà de laquelle un avertissement est affiché
+SESSION_MEMORY_WARNING_MB = 1024
+
+# Journal JSON-lines facultatif des durées d'étapes (une ligne par étape et par exécution)
+PERF_LOG_PATH = os.environ.get('DEVIATION_PERF_LOG')
 
 # Initialiser l'état de session pour le suivi de l'entraînement des modèles
 if 'model_trained' not in st.session_state:
     st.session_state.model_trained = False
-if 'model_azimuth' not in st.session_state:
-    st.session_state.model_azimuth = None
-if 'model_inclinaison' not in st.session_state:
-    st.session_state.model_inclinaison = None
+if 'models' not in st.session_state:
+    st.session_state.models = None
+if 'training_times' not in st.session_state:
+    st.session_state.training_times = {}
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
+# Jeu de test de l'entraînement, conservé pour comparer les métriques après une mise à jour incrémentale
+if 'test_split' not in st.session_state:
+    st.session_state.test_split = None
+if 'training_rows' not in st.session_state:
+    st.session_state.training_rows = 0
+if 'trained_model_option' not in st.session_state:
+    st.session_state.trained_model_option = None
+# Modèles des quantiles inférieur et supérieur (intervalles de prédiction du gradient boosting)
+if 'quantile_models' not in st.session_state:
+    st.session_state.quantile_models = None
+# Facteurs d'élargissement des intervalles de la forêt aléatoire, calibrés hors sac
+if 'forest_interval_scales' not in st.session_state:
+    st.session_state.forest_interval_scales = None
+
+# Mesure des étapes de cette exécution (avec celles d'avant un st.rerun() éventuel)
+perf = StageTimer(st.session_state.pop('carried_perf_records', None))
 if 'df' not in st.session_state:
     st.session_state.df = None
+# Empreinte du contenu de df, calculée une fois à l'affectation des données (voir store_dataset)
+if 'data_fingerprint' not in st.session_state:
+    st.session_state.data_fingerprint = None
 if 'raw_df' not in st.session_state:
     st.session_state.raw_df = None
+# raw_df n'est qu'un aperçu des premières lignes quand il a été lu en lecture optimisée
+if 'raw_df_is_preview' not in st.session_state:
+    st.session_state.raw_df_is_preview = False
 if 'columns_mapped' not in st.session_state:
     st.session_state.columns_mapped = False
 if 'augmented_df' not in st.session_state:
     st.session_state.augmented_df = None
 if 'use_augmented_data' not in st.session_state:
     st.session_state.use_augmented_data = False
+if 'ingest_stats' not in st.session_state:
+    st.session_state.ingest_stats = None
+if 'uploaded_file_id' not in st.session_state:
+    st.session_state.uploaded_file_id = None
+# Nom du profil de mappage appliqué automatiquement au fichier chargé
+if 'mapping_profile' not in st.session_state:
+    st.session_state.mapping_profile = None
+
+# Cache commun à toutes les sessions du serveur: des sessions sur les mêmes données avec les mêmes
+# paramètres partagent un seul exemplaire des données, des jeux augmentés et des modèles
+@st.cache_resource
+def get_shared_cache():
+    return SharedCache(SHARED_CACHE_MAX_BYTES)
+
+# Bail de la session sur le cache partagé, libéré avec l'état de la session
+if 'cache_lease' not in st.session_state:
+    st.session_state.cache_lease = get_shared_cache().lease()
+cache_lease = st.session_state.cache_lease
 
 # Configuration de la page
 st.set_page_config(
@@ -594,61 +662,95 @@ st.markdown("""
 def get_icon_html(icon_name, color="white", size=24):
     return f'<i class="material-icons" style="color: {color}; font-size: {size}px;">{icon_name}</i>'
 
-# Fonction pour charger les données
-@st.cache_data
+# Fonction pour afficher une figure en mesurant le temps de rendu
+def render_chart(fig):
+    with perf.stage("Rendu des figures"):
+        st.plotly_chart(fig, use_container_width=True)
+
+# Fonction pour charger les données, lues une seule fois par contenu de fichier pour toutes les sessions
 def load_data(file):
-    df = pd.read_csv(file)
-    return df
+    content = file.getvalue()
+    # Types compacts dès la lecture: le mappage des colonnes n'en fera que des vues renommées
+    return cache_lease.get_or_compute('raw_df', ('csv', bytes_fingerprint(content)),
+                                      lambda: compact_dataset(pd.read_csv(BytesIO(content))))
 
-# Fonction pour l'augmentation des données
-def augment_data(df, num_augmented_samples=500, noise_level=0.1, categorical_variation=True):
-    """
-    Génère des données synthétiques en ajoutant du bruit aléatoire aux données existantes
-    et en variant les catégories pour les variables catégorielles.
-    
-    Args:
-        df: DataFrame contenant les données d'origine
-        num_augmented_samples: Nombre d'échantillons à générer
-        noise_level: Niveau de bruit à ajouter aux variables numériques (proportion de l'écart-type)
-        categorical_variation: Si True, varie les catégories pour les variables catégorielles
-        
-    Returns:
-        DataFrame avec les données d'origine et les données augmentées
-    """
-    # Créer une copie des données d'origine
-    augmented_df = df.copy()
-    
-    # Séparer les colonnes numériques et catégorielles
-    numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-    
-    # Calculer les écarts-types pour les colonnes numériques
-    std_devs = df[numeric_cols].std()
-    
-    # Générer des données augmentées
-    for _ in range(num_augmented_samples):
-        # Sélectionner un échantillon aléatoire comme base
-        sample_idx = np.random.randint(0, len(df))
-        new_sample = df.iloc[sample_idx].copy()
-        
-        # Ajouter du bruit aux variables numériques
-        for col in numeric_cols:
-            noise = np.random.normal(0, std_devs[col] * noise_level)
-            new_sample[col] += noise
-        
-        # Varier les catégories pour les variables catégorielles
-        if categorical_variation and categorical_cols:
-            # Pour chaque colonne catégorielle, il y a une chance de changer la valeur
-            for col in categorical_cols:
-                if np.random.random() < 0.3:  # 30% de chance de changer la catégorie
-                    unique_values = df[col].unique()
-                    new_value = np.random.choice(unique_values)
-                    new_sample[col] = new_value
-        
-        # Ajouter l'échantillon augmenté au DataFrame
-        augmented_df = pd.concat([augmented_df, pd.DataFrame([new_sample])], ignore_index=True)
-    
-    return augmented_df
+# Graphiques agrégés: seules les statistiques calculées côté serveur sont envoyées au navigateur
+def category_count_figure(df, column, colors):
+    counts = df[column].value_counts(sort=False)
+    fig = px.bar(x=counts.index.astype(str), y=counts.to_numpy(), color=counts.index.astype(str),
+                 color_discrete_sequence=colors, template="plotly_white")
+    return fig
+
+def aggregated_box_figure(df, group, value, colors, title):
+    stats = box_statistics(df, value, group)
+    fig = go.Figure()
+    for i, (name, row) in enumerate(stats.iterrows()):
+        fig.add_trace(go.Box(
+            x=[str(name)], q1=[row['q1']], median=[row['median']], q3=[row['q3']],
+            lowerfence=[row['lowerfence']], upperfence=[row['upperfence']], mean=[row['mean']],
+            name=str(name), marker_color=colors[i % len(colors)], boxpoints=False
+        ))
+    fig.update_layout(title=title, template="plotly_white")
+    return fig
+
+def density_trend_figure(df, x, y, group, colors, title):
+    x_centers, y_centers, counts = density_grid(df, x, y)
+    fig = go.Figure(go.Heatmap(x=x_centers, y=y_centers, z=counts, colorscale='Blues',
+                               colorbar=dict(title="Forages"), hoverongaps=False))
+    trend = binned_trend(df, x, y, group)
+    for i, (name, group_trend) in enumerate(trend.groupby(group, observed=True, sort=False)):
+        fig.add_trace(go.Scatter(x=group_trend['x'], y=group_trend['mean'], mode='lines+markers',
+                                 name=str(name), line=dict(color=colors[i % len(colors)], width=2)))
+    fig.update_layout(title=title, template="plotly_white",
+                      legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1))
+    return fig
+
+def aggregated_histogram_figure(df, x, group, colors, title):
+    # Même disposition que px.histogram(marginal="box"): histogramme sur les axes principaux,
+    # boîtes sur un second axe y au-dessus
+    centers, width, counts = histogram_counts(df, x, group)
+    stats = box_statistics(df, x, group)
+    fig = go.Figure()
+    for i, name in enumerate(counts.columns):
+        color = colors[i % len(colors)]
+        row = stats.loc[name]
+        fig.add_trace(go.Bar(x=centers, y=counts[name].to_numpy(), width=width, name=str(name),
+                             marker_color=color))
+        fig.add_trace(go.Box(
+            y=[str(name)], q1=[row['q1']], median=[row['median']], q3=[row['q3']],
+            lowerfence=[row['lowerfence']], upperfence=[row['upperfence']], orientation='h',
+            name=str(name), marker_color=color, boxpoints=False, showlegend=False,
+            xaxis='x2', yaxis='y2'
+        ))
+    fig.update_layout(
+        title=title, barmode='stack', bargap=0, template="plotly_white",
+        yaxis=dict(domain=[0, 0.74]),
+        xaxis2=dict(anchor='y2', matches='x', showticklabels=False),
+        yaxis2=dict(domain=[0.76, 1], showticklabels=False)
+    )
+    return fig
+
+# Statistiques d'exploration, mémorisées par empreinte des données (le DataFrame n'est pas haché)
+@st.cache_data(max_entries=8)
+def load_exploration_statistics(fingerprint, _df):
+    return exploration_statistics(_df)
+
+# Fonction pour générer les données de démonstration (partagées entre sessions, par taille et graine)
+def load_demo_data(n_samples, seed=42):
+    return cache_lease.get_or_compute('df', ('demo', n_samples, seed),
+                                      lambda: compact_dataset(generate_demo_data(n_samples=n_samples, seed=seed)))
+
+# Enregistre le jeu de données de la session avec son empreinte (clé des caches de statistiques,
+# d'augmentation et des modèles): le DataFrame est haché une fois ici, pas à chaque exécution
+def store_dataset(df, share=True):
+    with perf.stage("Empreinte des données"):
+        fingerprint = dataframe_fingerprint(df)
+    if share:
+        # Des sessions ayant chargé et mappé les mêmes données gardent un seul DataFrame
+        df = cache_lease.put('df', ('dataset', fingerprint), df)
+    st.session_state.df = df
+    st.session_state.data_fingerprint = fingerprint
+    return df
 
 # Sidebar pour les options
 with st.sidebar:
@@ -687,11 +789,80 @@ with st.sidebar:
     
     if data_option == "Charger mes données":
         uploaded_file = st.file_uploader("Choisir un fichier CSV", type="csv")
+        chunked_ingestion = st.checkbox(
+            "Lecture optimisée (gros fichiers)",
+            help="Lit le fichier par blocs et ne garde que les colonnes mappées, avec des types compacts"
+        )
+        
+        # Un nouveau fichier remplace les données et le mappage précédents
+        if uploaded_file is not None and uploaded_file.file_id != st.session_state.uploaded_file_id:
+            st.session_state.uploaded_file_id = uploaded_file.file_id
+            st.session_state.raw_df = None
+            st.session_state.df = None
+            st.session_state.augmented_df = None
+            st.session_state.ingest_stats = None
+            st.session_state.mapping_profile = None
+        
+        # Changer de mode de lecture avant le mappage relit le fichier: un aperçu ne doit pas
+        # être mappé comme s'il contenait toutes les lignes
+        if (st.session_state.raw_df is not None and not st.session_state.columns_mapped
+                and st.session_state.raw_df_is_preview != chunked_ingestion):
+            st.session_state.raw_df = None
         
         if uploaded_file is not None and st.session_state.raw_df is None:
-            # Charger les données brutes
-            st.session_state.raw_df = load_data(uploaded_file)
+            # Charger les données brutes (seulement un aperçu en lecture optimisée)
+            with perf.stage("Lecture du fichier"):
+                if chunked_ingestion:
+                    st.session_state.raw_df = read_csv_preview(uploaded_file)
+                else:
+                    st.session_state.raw_df = load_data(uploaded_file)
+            st.session_state.raw_df_is_preview = chunked_ingestion
             st.session_state.columns_mapped = False
+            
+            # Un format d'export déjà mappé (même en-tête qu'un profil enregistré) est mappé
+            # directement, sans passer par l'écran de mappage
+            try:
+                profile, exact_header = match_profile(load_profiles(), st.session_state.raw_df.columns)
+            except (OSError, ValueError) as e:
+                st.warning(f"⚠️ Les profils de mappage n'ont pas pu être lus: {e}")
+                profile, exact_header = None, False
+            if profile is not None and exact_header:
+                try:
+                    with perf.stage("Mappage des colonnes (profil)"):
+                        if chunked_ingestion:
+                            mapped_df, st.session_state.ingest_stats = load_mapped_csv(uploaded_file,
+                                                                                       profile['mapping'])
+                        else:
+                            mapped_df = map_columns(st.session_state.raw_df, profile['mapping'])
+                except (KeyError, ValueError) as e:
+                    st.warning(f"⚠️ Le profil de mappage « {profile['name']} » n'a pas pu être appliqué: {e}")
+                else:
+                    store_dataset(mapped_df)
+                    st.session_state.columns_mapped = True
+                    st.session_state.mapping_profile = profile['name']
+        
+        if st.session_state.mapping_profile is not None and st.session_state.columns_mapped:
+            st.caption(f"Profil de mappage appliqué: « {st.session_state.mapping_profile} »")
+            if st.button("Modifier le mappage"):
+                st.session_state.columns_mapped = False
+                st.session_state.mapping_profile = None
+                st.session_state.df = None
+                st.session_state.augmented_df = None
+                st.rerun()
+        
+        if st.session_state.ingest_stats is not None:
+            stats = st.session_state.ingest_stats
+            st.caption(
+                f"{stats['rows']:,} lignes lues en {stats['seconds']:.2f} s "
+                f"({stats['rows_per_second']:,.0f} lignes/s, pic mémoire {stats['peak_memory_mb']:.1f} Mo)"
+            )
+    else:
+        demo_samples = st.select_slider(
+            "Nombre de forages démo",
+            options=[1000, 10000, 100000, 1000000],
+            value=1000,
+            help="Taille du jeu de données synthétique"
+        )
     
     # Séparateur visuel
     st.markdown('<hr style="margin: 1.75rem 0; border-color: #3D4A6A; opacity: 0.6;">', unsafe_allow_html=True)
@@ -700,9 +871,35 @@ with st.sidebar:
     st.markdown('<p style="color: #E2E8F0; font-weight: 600; margin-bottom: 0.75rem; font-family: \'Poppins\', sans-serif;">Modèle de machine learning</p>', unsafe_allow_html=True)
     model_option = st.selectbox(
         "",
-        ["Random Forest", "SVM", "Régression Linéaire", "Réseau de Neurones"],
+        MODEL_OPTIONS,
         label_visibility="collapsed"
     )
+    joint_model = st.checkbox(
+        "Modèle conjoint azimuth + inclinaison",
+        help="Entraîne un seul modèle multi-sorties pour les deux déviations (environ deux fois moins de temps et de mémoire)"
+    )
+    training_workers = st.number_input(
+        "Cœurs pour l'entraînement",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        help="Au-delà de 1, les deux déviations sont entraînées en parallèle et les arbres de la forêt sont construits sur plusieurs cœurs"
+    )
+    force_retrain = st.checkbox(
+        "Forcer le réentraînement",
+        help="Entraîne sans reprendre les modèles enregistrés ou ceux d'une autre session, par exemple pour mesurer l'accélération sur plusieurs cœurs"
+    )
+    tune_hyperparameters = st.checkbox(
+        "Optimiser les hyperparamètres",
+        help="Recherche par divisions successives avec validation croisée sur les cœurs choisis"
+    )
+    if tune_hyperparameters:
+        tuning_budget = st.number_input("Budget d'optimisation (s)", min_value=10, max_value=3600, value=60, step=10)
+    quantile_intervals = model_option in QUANTILE_OPTIONS and st.checkbox(
+        "Intervalles de prédiction (quantiles)",
+        help=f"Entraîne deux modèles supplémentaires par déviation, pour les quantiles bornant "
+             f"{INTERVAL_COVERAGE:.0%} des valeurs"
+    )
     
     # Option d'augmentation des données
     st.markdown('<p style="color: #E2E8F0; font-weight: 600; margin-bottom: 0.75rem; margin-top: 1.75rem; font-family: \'Poppins\', sans-serif;">Augmentation des données</p>', unsafe_allow_html=True)
@@ -711,7 +908,7 @@ with st.sidebar:
     
     if use_augmentation:
         st.session_state.use_augmented_data = True
-        aug_samples = st.slider("Échantillons supplémentaires", min_value=100, max_value=1000, value=500, step=100)
+        aug_samples = st.slider("Échantillons supplémentaires", min_value=1000, max_value=1000000, value=10000, step=1000)
         noise_level = st.slider("Niveau de variation", min_value=0.05, max_value=0.3, value=0.1, step=0.05)
     else:
         st.session_state.use_augmented_data = False
@@ -759,7 +956,16 @@ if data_option == "Charger mes données" and st.session_state.raw_df is not None
     available_columns = st.session_state.raw_df.columns.tolist()
     
     # Ajouter une option "Non disponible" pour les colonnes facultatives
-    available_columns_with_na = ['Non disponible'] + available_columns
+    available_columns_with_na = [NOT_AVAILABLE] + available_columns
+    
+    # Profil enregistré dont toutes les colonnes sources existent dans ce fichier (en-tête différent)
+    try:
+        suggested_profile, _ = match_profile(load_profiles(), available_columns)
+    except (OSError, ValueError):
+        suggested_profile = None
+    suggested_mapping = suggested_profile['mapping'] if suggested_profile is not None else {}
+    if suggested_profile is not None:
+        st.info(f"Mappage pré-rempli avec le profil « {suggested_profile['name']} »")
     
     # Créer des sélecteurs pour chaque colonne requise
     col1, col2 = st.columns(2)
@@ -772,6 +978,9 @@ if data_option == "Charger mes données" and st.session_state.raw_df is not None
                 if required_col.lower() in col.lower() or any(word in col.lower() for word in required_col.split('_')):
                     suggested_index = j + 1  # +1 car nous avons ajouté "Non disponible" en première position
                     break
+            # Un profil enregistré applicable prime sur les mots-clés
+            if required_col in suggested_mapping:
+                suggested_index = available_columns_with_na.index(suggested_mapping[required_col])
             
             column_mapping[required_col] = st.selectbox(
                 f"{description}",
@@ -788,6 +997,9 @@ if data_option == "Charger mes données" and st.session_state.raw_df is not None
                 if required_col.lower() in col.lower() or any(word in col.lower() for word in required_col.split('_')):
                     suggested_index = j + 1  # +1 car nous avons ajouté "Non disponible" en première position
                     break
+            # Un profil enregistré applicable prime sur les mots-clés
+            if required_col in suggested_mapping:
+                suggested_index = available_columns_with_na.index(suggested_mapping[required_col])
             
             column_mapping[required_col] = st.selectbox(
                 f"{description}",
@@ -798,7 +1010,7 @@ if data_option == "Charger mes données" and st.session_state.raw_df is not None
     
     # Vérifier si toutes les colonnes obligatoires sont mappées
     missing_required = [col for col, mapped in column_mapping.items() 
-                       if mapped == 'Non disponible' and col not in ['lithologie', 'company']]
+                       if mapped == NOT_AVAILABLE and col not in OPTIONAL_DEFAULTS]
     
     if len(missing_required) > 0:
         st.warning(f"⚠️ Certaines colonnes obligatoires n'ont pas été mappées: {', '.join(missing_required)}")
@@ -806,28 +1018,47 @@ if data_option == "Charger mes données" and st.session_state.raw_df is not None
     else:
         can_proceed = True
     
+    # Enregistrer le mappage pour que les prochains fichiers de même en-tête soient mappés automatiquement
+    save_mapping_profile = st.checkbox(
+        "Enregistrer ce mappage comme profil",
+        help="Les prochains fichiers avec le même en-tête seront mappés automatiquement"
+    )
+    profile_name = st.text_input(
+        "Nom du profil",
+        value=suggested_profile['name'] if suggested_profile is not None else "",
+        disabled=not save_mapping_profile
+    )
+    
     # Bouton pour valider le mappage
     mapping_col1, mapping_col2, mapping_col3 = st.columns([1, 2, 1])
     with mapping_col2:
         if st.button("Valider le mappage", disabled=not can_proceed, use_container_width=True):
-            # Créer un nouveau DataFrame avec les colonnes mappées
-            mapped_df = pd.DataFrame()
-            
-            for required_col, source_col in column_mapping.items():
-                if source_col != 'Non disponible':
-                    mapped_df[required_col] = st.session_state.raw_df[source_col]
+            if save_mapping_profile:
+                try:
+                    save_profile(profile_name, available_columns, column_mapping)
+                    st.session_state.mapping_profile = profile_name.strip()
+                except (OSError, ValueError) as e:
+                    st.warning(f"⚠️ Le profil de mappage n'a pas pu être enregistré: {e}")
+            try:
+                if chunked_ingestion:
+                    # Relire le fichier par blocs en ne gardant que les colonnes mappées
+                    with st.spinner("Lecture du fichier par blocs..."), perf.stage("Lecture et mappage par blocs"):
+                        mapped_df, st.session_state.ingest_stats = load_mapped_csv(uploaded_file, column_mapping)
                 else:
-                    # Si la colonne est facultative, on peut générer des valeurs par défaut
-                    if required_col == 'lithologie':
-                        mapped_df[required_col] = 'Inconnu'  # Valeur par défaut pour la lithologie
-                    elif required_col == 'company':
-                        mapped_df[required_col] = 'Non spécifiée'  # Valeur par défaut pour l'entreprise
-            
-            # Stocker le DataFrame mappé dans la session
-            st.session_state.df = mapped_df
-            st.session_state.columns_mapped = True
-            st.success("✅ Mappage validé! Vous pouvez maintenant explorer et modéliser vos données.")
-            st.rerun()
+                    # Renommer les colonnes mappées (vues des données brutes, sans copie); les colonnes
+                    # facultatives non mappées reçoivent leur valeur par défaut
+                    with perf.stage("Mappage des colonnes"):
+                        mapped_df = map_columns(st.session_state.raw_df, column_mapping)
+            except (KeyError, ValueError) as e:
+                # Type incompatible ou colonne absente d'un bloc: le mappage reste à corriger
+                st.error(f"❌ Le fichier n'a pas pu être lu avec ce mappage: {e}")
+            else:
+                # Stocker le DataFrame mappé dans la session
+                store_dataset(mapped_df)
+                st.session_state.columns_mapped = True
+                st.success("✅ Mappage validé! Vous pouvez maintenant explorer et modéliser vos données.")
+                st.session_state.carried_perf_records = perf.records
+                st.rerun()
 
 elif data_option == "Charger mes données" and st.session_state.columns_mapped:
     # Utiliser le DataFrame déjà mappé
@@ -841,93 +1072,36 @@ elif data_option == "Utiliser données démo":
     </div>
     """, unsafe_allow_html=True)
     
-    # Créer des données synthétiques pour la démonstration
-    np.random.seed(42)
-    n_samples = 1000
-    
-    prof_finale = np.random.uniform(100, 1000, n_samples)
-    azimuth_initial = np.random.uniform(0, 360, n_samples)
-    inclinaison_initiale = np.random.uniform(-90, 0, n_samples)
-    vitesse_rotation = np.random.uniform(50, 200, n_samples)
-    
-    # Lithologies possibles
-    lithologies = ['Granite', 'Schiste', 'Gneiss', 'Calcaire', 'Basalte']
-    lithologie = np.random.choice(lithologies, n_samples)
-    
-    # Entreprises de forage possibles
-    companies = ['ForageTech', 'MineXpert', 'DrillPro', 'GeoForage', 'TerraDrill']
-    company = np.random.choice(companies, n_samples)
-    
-    # Créer une relation entre les entrées et les déviations (simplifiée)
-    azimuth_deviation = (
-        0.05 * prof_finale 
-        + 0.02 * azimuth_initial 
-        + 0.1 * inclinaison_initiale 
-        + 0.03 * vitesse_rotation 
-        + np.random.normal(0, 10, n_samples)
-    )
-    
-    inclinaison_deviation = (
-        0.03 * prof_finale 
-        - 0.01 * azimuth_initial 
-        + 0.05 * inclinaison_initiale 
-        + 0.02 * vitesse_rotation 
-        + np.random.normal(0, 5, n_samples)
-    )
+    # Créer (ou récupérer du cache) les données synthétiques pour la démonstration
+    with perf.stage("Génération des données démo"):
+        df = load_demo_data(demo_samples, seed=42)
     
-    # Ajouter un effet de la lithologie (différent pour chaque type)
-    lithology_effect = {
-        'Granite': (2.0, 1.0),
-        'Schiste': (-1.5, 3.0),
-        'Gneiss': (0.5, -2.0),
-        'Calcaire': (-1.0, -1.5),
-        'Basalte': (3.0, 2.5)
-    }
-    
-    # Ajouter un effet de l'entreprise de forage (différent pour chaque entreprise)
-    company_effect = {
-        'ForageTech': (1.5, 0.8),
-        'MineXpert': (-1.0, -0.5),
-        'DrillPro': (0.0, 2.0),
-        'GeoForage': (-2.0, -1.0),
-        'TerraDrill': (2.5, 1.5)
-    }
-    
-    for i in range(n_samples):
-        # Effet de la lithologie
-        effect_az_lith, effect_inc_lith = lithology_effect[lithologie[i]]
-        azimuth_deviation[i] += effect_az_lith
-        inclinaison_deviation[i] += effect_inc_lith
-        
-        # Effet de l'entreprise de forage
-        effect_az_comp, effect_inc_comp = company_effect[company[i]]
-        azimuth_deviation[i] += effect_az_comp
-        inclinaison_deviation[i] += effect_inc_comp
-    
-    # Créer le DataFrame
-    df = pd.DataFrame({
-        'profondeur_finale': prof_finale,
-        'azimuth_initial': azimuth_initial,
-        'inclinaison_initiale': inclinaison_initiale,
-        'lithologie': lithologie,
-        'vitesse_rotation': vitesse_rotation,
-        'company': company,
-        'deviation_azimuth': azimuth_deviation,
-        'deviation_inclinaison': inclinaison_deviation
-    })
-    
-    # Stocker dans la session state
-    st.session_state.df = df
+    # Stocker dans la session state (les données démo sont déjà partagées entre sessions)
+    if st.session_state.df is not df:
+        store_dataset(df, share=False)
     st.session_state.columns_mapped = True
 
 # Si des données sont disponibles, afficher l'application principale
 if df is not None:
+    # Empreinte du contenu, clé des caches de statistiques et d'augmentation
+    data_fingerprint = st.session_state.data_fingerprint
+    
     # Onglets pour les différentes sections
     tabs = st.tabs(["📊 Exploration", "🧠 Modélisation", "🔮 Prédiction"])
     
-    with tabs[0]:  # Exploration des données
+    with tabs[0], perf.stage("Onglet Exploration"):  # Exploration des données
         st.markdown("<h2>Exploration des données</h2>", unsafe_allow_html=True)
         
+        # Au-delà du seuil, les graphiques n'envoient que des agrégats au navigateur
+        aggregate_plots = st.checkbox(
+            "Graphiques agrégés (densités, moyennes par classe, boîtes précalculées)",
+            value=len(df) > AGGREGATION_ROW_THRESHOLD,
+            help=f"Activé automatiquement au-delà de {AGGREGATION_ROW_THRESHOLD:,} forages."
+        )
+        
+        with perf.stage("Statistiques d'exploration"):
+            exploration_stats = load_exploration_statistics(data_fingerprint, df)
+        
         # Affichage des données en deux colonnes
         col1, col2 = st.columns([2, 1])
         
@@ -937,7 +1111,7 @@ if df is not None:
         
         with col2:
             st.markdown("<h3>Statistiques descriptives</h3>", unsafe_allow_html=True)
-            st.dataframe(df.describe().style.highlight_max(axis=0), use_container_width=True)
+            st.dataframe(exploration_stats['describe'].style.highlight_max(axis=0), use_container_width=True)
         
         # Distribution des lithologies et métriques globales
         col1, col2 = st.columns([3, 2])
@@ -948,38 +1122,45 @@ if df is not None:
             
             with category_tabs[0]:
                 st.markdown("<h3>Distribution des lithologies</h3>", unsafe_allow_html=True)
-                fig_litho = px.histogram(df, x='lithologie', color='lithologie', 
-                                         color_discrete_sequence=px.colors.qualitative.Bold,
-                                         template="plotly_white")
+                if aggregate_plots:
+                    fig_litho = category_count_figure(df, 'lithologie', px.colors.qualitative.Bold)
+                else:
+                    fig_litho = px.histogram(df, x='lithologie', color='lithologie', 
+                                             color_discrete_sequence=px.colors.qualitative.Bold,
+                                             template="plotly_white")
                 fig_litho.update_layout(
                     xaxis_title="Lithologie",
                     yaxis_title="Nombre de forages",
                     showlegend=False,
                     margin=dict(l=20, r=20, t=40, b=20),
                 )
-                st.plotly_chart(fig_litho, use_container_width=True)
+                render_chart(fig_litho)
             
             with category_tabs[1]:
                 st.markdown("<h3>Distribution des entreprises de forage</h3>", unsafe_allow_html=True)
-                fig_company = px.histogram(df, x='company', color='company', 
-                                         color_discrete_sequence=px.colors.qualitative.Set2,
-                                         template="plotly_white")
+                if aggregate_plots:
+                    fig_company = category_count_figure(df, 'company', px.colors.qualitative.Set2)
+                else:
+                    fig_company = px.histogram(df, x='company', color='company', 
+                                             color_discrete_sequence=px.colors.qualitative.Set2,
+                                             template="plotly_white")
                 fig_company.update_layout(
                     xaxis_title="Entreprise",
                     yaxis_title="Nombre de forages",
                     showlegend=False,
                     margin=dict(l=20, r=20, t=40, b=20),
                 )
-                st.plotly_chart(fig_company, use_container_width=True)
+                render_chart(fig_company)
             
         with col2:
             st.markdown("<h3>Métriques globales</h3>", unsafe_allow_html=True)
             
             # Calculer des métriques intéressantes
-            mean_az_dev = df['deviation_azimuth'].abs().mean()
-            max_az_dev = df['deviation_azimuth'].abs().max()
-            mean_inc_dev = df['deviation_inclinaison'].abs().mean()
-            max_inc_dev = df['deviation_inclinaison'].abs().max()
+            deviation_metrics = exploration_stats['deviation_metrics']
+            mean_az_dev = deviation_metrics['deviation_azimuth']['mean_abs']
+            max_az_dev = deviation_metrics['deviation_azimuth']['max_abs']
+            mean_inc_dev = deviation_metrics['deviation_inclinaison']['mean_abs']
+            max_inc_dev = deviation_metrics['deviation_inclinaison']['max_abs']
             
             # Afficher les métriques
             c1, c2 = st.columns(2)
@@ -991,17 +1172,13 @@ if df is not None:
             c2.metric("Déviation max. d'inclinaison", f"{max_inc_dev:.2f}°")
             
             # Calculer la lithologie avec la déviation la plus importante
-            lithology_deviation = df.groupby('lithologie')[['deviation_azimuth', 'deviation_inclinaison']].apply(
-                lambda x: (x['deviation_azimuth']**2 + x['deviation_inclinaison']**2).mean()**0.5
-            ).sort_values(ascending=False)
+            lithology_deviation = exploration_stats['by_group']['lithologie']['rms_deviation'].sort_values(ascending=False)
             
             most_deviated = lithology_deviation.index[0]
             deviation_value = lithology_deviation.iloc[0]
             
             # Calculer l'entreprise avec la déviation la plus importante
-            company_deviation = df.groupby('company')[['deviation_azimuth', 'deviation_inclinaison']].apply(
-                lambda x: (x['deviation_azimuth']**2 + x['deviation_inclinaison']**2).mean()**0.5
-            ).sort_values(ascending=False)
+            company_deviation = exploration_stats['by_group']['company']['rms_deviation'].sort_values(ascending=False)
             
             most_deviated_company = company_deviation.index[0]
             company_deviation_value = company_deviation.iloc[0]
@@ -1038,8 +1215,7 @@ if df is not None:
         
         with explore_tabs[0]:
             # Matrice de corrélation
-            numeric_cols = df.select_dtypes(include=np.number).columns
-            corr_matrix = df[numeric_cols].corr()
+            corr_matrix = exploration_stats['corr']
             
             fig_corr = px.imshow(corr_matrix, 
                                 text_auto=True, 
@@ -1049,23 +1225,14 @@ if df is not None:
             fig_corr.update_layout(
                 margin=dict(l=20, r=20, t=50, b=20),
             )
-            st.plotly_chart(fig_corr, use_container_width=True)
+            render_chart(fig_corr)
             
-            # Interprétation automatique des corrélations
-            strong_correlations = []
-            
-            for i in range(len(corr_matrix.columns)):
-                for j in range(i):
-                    if abs(corr_matrix.iloc[i, j]) > 0.3:  # Seuil de corrélation
-                        strong_correlations.append({
-                            'var1': corr_matrix.columns[i],
-                            'var2': corr_matrix.columns[j],
-                            'corr': corr_matrix.iloc[i, j]
-                        })
+            # Interprétation automatique des corrélations (déjà triées par force décroissante)
+            strong_correlations = exploration_stats['strong_correlations']
             
             if strong_correlations:
                 st.markdown("<h4>Corrélations significatives</h4>", unsafe_allow_html=True)
-                for corr in sorted(strong_correlations, key=lambda x: abs(x['corr']), reverse=True):
+                for corr in strong_correlations:
                     relation = "positive" if corr['corr'] > 0 else "négative"
                     strength = "forte" if abs(corr['corr']) > 0.7 else "modérée"
                     st.markdown(f"- Corrélation {strength} {relation} ({corr['corr']:.2f}) entre **{corr['var1']}** et **{corr['var2']}**")
@@ -1078,39 +1245,45 @@ if df is not None:
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    fig_box1 = px.box(df, x='lithologie', y='deviation_azimuth', 
-                                    title="Déviation d'azimuth par lithologie", 
-                                    color='lithologie',
-                                    color_discrete_sequence=px.colors.qualitative.Bold,
-                                    template="plotly_white")
+                    if aggregate_plots:
+                        fig_box1 = aggregated_box_figure(df, 'lithologie', 'deviation_azimuth', px.colors.qualitative.Bold,
+                                                         "Déviation d'azimuth par lithologie")
+                    else:
+                        fig_box1 = px.box(df, x='lithologie', y='deviation_azimuth', 
+                                        title="Déviation d'azimuth par lithologie", 
+                                        color='lithologie',
+                                        color_discrete_sequence=px.colors.qualitative.Bold,
+                                        template="plotly_white")
                     fig_box1.update_layout(
                         xaxis_title="Lithologie",
                         yaxis_title="Déviation d'azimuth (°)",
                         showlegend=False,
                         margin=dict(l=20, r=20, t=50, b=20),
                     )
-                    st.plotly_chart(fig_box1, use_container_width=True)
+                    render_chart(fig_box1)
                 
                 with col2:
-                    fig_box2 = px.box(df, x='lithologie', y='deviation_inclinaison', 
-                                    title="Déviation d'inclinaison par lithologie", 
-                                    color='lithologie',
-                                    color_discrete_sequence=px.colors.qualitative.Bold,
-                                    template="plotly_white")
+                    if aggregate_plots:
+                        fig_box2 = aggregated_box_figure(df, 'lithologie', 'deviation_inclinaison', px.colors.qualitative.Bold,
+                                                         "Déviation d'inclinaison par lithologie")
+                    else:
+                        fig_box2 = px.box(df, x='lithologie', y='deviation_inclinaison', 
+                                        title="Déviation d'inclinaison par lithologie", 
+                                        color='lithologie',
+                                        color_discrete_sequence=px.colors.qualitative.Bold,
+                                        template="plotly_white")
                     fig_box2.update_layout(
                         xaxis_title="Lithologie",
                         yaxis_title="Déviation d'inclinaison (°)",
                         showlegend=False,
                         margin=dict(l=20, r=20, t=50, b=20),
                     )
-                    st.plotly_chart(fig_box2, use_container_width=True)
+                    render_chart(fig_box2)
                 
                 # Résumé statistique par lithologie
                 st.markdown("<h4>Résumé statistique par lithologie</h4>", unsafe_allow_html=True)
                 
-                litho_stats = df.groupby('lithologie')[['deviation_azimuth', 'deviation_inclinaison']].agg(
-                    ['mean', 'std', 'min', 'max']
-                ).round(2)
+                litho_stats = exploration_stats['by_group']['lithologie'].drop(columns='rms_deviation').round(2)
                 
                 litho_stats.columns = ['Azimuth Moy', 'Azimuth Std', 'Azimuth Min', 'Azimuth Max', 
                                     'Inclinaison Moy', 'Inclinaison Std', 'Inclinaison Min', 'Inclinaison Max']
@@ -1121,39 +1294,45 @@ if df is not None:
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    fig_box1 = px.box(df, x='company', y='deviation_azimuth', 
-                                    title="Déviation d'azimuth par entreprise", 
-                                    color='company',
-                                    color_discrete_sequence=px.colors.qualitative.Set2,
-                                    template="plotly_white")
+                    if aggregate_plots:
+                        fig_box1 = aggregated_box_figure(df, 'company', 'deviation_azimuth', px.colors.qualitative.Set2,
+                                                         "Déviation d'azimuth par entreprise")
+                    else:
+                        fig_box1 = px.box(df, x='company', y='deviation_azimuth', 
+                                        title="Déviation d'azimuth par entreprise", 
+                                        color='company',
+                                        color_discrete_sequence=px.colors.qualitative.Set2,
+                                        template="plotly_white")
                     fig_box1.update_layout(
                         xaxis_title="Entreprise",
                         yaxis_title="Déviation d'azimuth (°)",
                         showlegend=False,
                         margin=dict(l=20, r=20, t=50, b=20),
                     )
-                    st.plotly_chart(fig_box1, use_container_width=True)
+                    render_chart(fig_box1)
                 
                 with col2:
-                    fig_box2 = px.box(df, x='company', y='deviation_inclinaison', 
-                                    title="Déviation d'inclinaison par entreprise", 
-                                    color='company',
-                                    color_discrete_sequence=px.colors.qualitative.Set2,
-                                    template="plotly_white")
+                    if aggregate_plots:
+                        fig_box2 = aggregated_box_figure(df, 'company', 'deviation_inclinaison', px.colors.qualitative.Set2,
+                                                         "Déviation d'inclinaison par entreprise")
+                    else:
+                        fig_box2 = px.box(df, x='company', y='deviation_inclinaison', 
+                                        title="Déviation d'inclinaison par entreprise", 
+                                        color='company',
+                                        color_discrete_sequence=px.colors.qualitative.Set2,
+                                        template="plotly_white")
                     fig_box2.update_layout(
                         xaxis_title="Entreprise",
                         yaxis_title="Déviation d'inclinaison (°)",
                         showlegend=False,
                         margin=dict(l=20, r=20, t=50, b=20),
                     )
-                    st.plotly_chart(fig_box2, use_container_width=True)
+                    render_chart(fig_box2)
                 
                 # Résumé statistique par entreprise
                 st.markdown("<h4>Résumé statistique par entreprise</h4>", unsafe_allow_html=True)
                 
-                company_stats = df.groupby('company')[['deviation_azimuth', 'deviation_inclinaison']].agg(
-                    ['mean', 'std', 'min', 'max']
-                ).round(2)
+                company_stats = exploration_stats['by_group']['company'].drop(columns='rms_deviation').round(2)
                 
                 company_stats.columns = ['Azimuth Moy', 'Azimuth Std', 'Azimuth Min', 'Azimuth Max', 
                                       'Inclinaison Moy', 'Inclinaison Std', 'Inclinaison Min', 'Inclinaison Max']
@@ -1181,165 +1360,115 @@ if df is not None:
             col1, col2 = st.columns(2)
             
             with col1:
-                fig_scatter1 = px.scatter(df, x=selected_feature, y='deviation_azimuth', 
-                                        color=color_var, opacity=0.7,
-                                        title=f"Déviation d'azimuth vs {selected_feature}",
-                                        color_discrete_sequence=color_discrete_map,
-                                        trendline="ols",
-                                        template="plotly_white")
+                if aggregate_plots:
+                    fig_scatter1 = density_trend_figure(df, selected_feature, 'deviation_azimuth', color_var, color_discrete_map,
+                                                        f"Déviation d'azimuth vs {selected_feature}")
+                else:
+                    fig_scatter1 = px.scatter(df, x=selected_feature, y='deviation_azimuth', 
+                                            color=color_var, opacity=0.7,
+                                            title=f"Déviation d'azimuth vs {selected_feature}",
+                                            color_discrete_sequence=color_discrete_map,
+                                            trendline="ols",
+                                            template="plotly_white")
                 fig_scatter1.update_layout(
                     xaxis_title=selected_feature,
                     yaxis_title="Déviation d'azimuth (°)",
                     margin=dict(l=20, r=20, t=50, b=20),
                 )
-                st.plotly_chart(fig_scatter1, use_container_width=True)
+                render_chart(fig_scatter1)
             
             with col2:
-                fig_scatter2 = px.scatter(df, x=selected_feature, y='deviation_inclinaison', 
-                                        color=color_var, opacity=0.7,
-                                        title=f"Déviation d'inclinaison vs {selected_feature}",
-                                        color_discrete_sequence=color_discrete_map,
-                                        trendline="ols",
-                                        template="plotly_white")
+                if aggregate_plots:
+                    fig_scatter2 = density_trend_figure(df, selected_feature, 'deviation_inclinaison', color_var, color_discrete_map,
+                                                        f"Déviation d'inclinaison vs {selected_feature}")
+                else:
+                    fig_scatter2 = px.scatter(df, x=selected_feature, y='deviation_inclinaison', 
+                                            color=color_var, opacity=0.7,
+                                            title=f"Déviation d'inclinaison vs {selected_feature}",
+                                            color_discrete_sequence=color_discrete_map,
+                                            trendline="ols",
+                                            template="plotly_white")
                 fig_scatter2.update_layout(
                     xaxis_title=selected_feature,
                     yaxis_title="Déviation d'inclinaison (°)",
                     margin=dict(l=20, r=20, t=50, b=20),
                 )
-                st.plotly_chart(fig_scatter2, use_container_width=True)
+                render_chart(fig_scatter2)
             
             # Distribution du paramètre sélectionné
-            fig_hist = px.histogram(df, x=selected_feature, color=color_var,
-                                   title=f"Distribution de {selected_feature}",
-                                   color_discrete_sequence=color_discrete_map,
-                                   marginal="box",
-                                   template="plotly_white")
+            if aggregate_plots:
+                fig_hist = aggregated_histogram_figure(df, selected_feature, color_var, color_discrete_map,
+                                                       f"Distribution de {selected_feature}")
+            else:
+                fig_hist = px.histogram(df, x=selected_feature, color=color_var,
+                                       title=f"Distribution de {selected_feature}",
+                                       color_discrete_sequence=color_discrete_map,
+                                       marginal="box",
+                                       template="plotly_white")
             fig_hist.update_layout(
                 xaxis_title=selected_feature,
                 yaxis_title="Nombre de forages",
                 margin=dict(l=20, r=20, t=50, b=20),
             )
-            st.plotly_chart(fig_hist, use_container_width=True)
+            render_chart(fig_hist)
     
     with tabs[1]:  # Modélisation
         st.markdown("<h2>Modélisation des déviations</h2>", unsafe_allow_html=True)
         
         # Vérifier si l'augmentation des données est demandée
-        if st.session_state.use_augmented_data and st.session_state.augmented_df is None:
-            # Augmenter les données
-            with st.spinner("Augmentation des données en cours..."):
-                augmented_df = augment_data(df, num_augmented_samples=aug_samples, noise_level=noise_level)
-                st.session_state.augmented_df = augmented_df
+        if st.session_state.use_augmented_data:
+            # Les données augmentées sont réutilisées (et partagées entre sessions) tant que la source
+            # et les paramètres sont inchangés
+            augmentation_key = ('augmented', data_fingerprint, aug_samples, noise_level, True, AUGMENTATION_SEED)
+            augmented_df = cache_lease.get('augmented_df', augmentation_key)
+            
+            if augmented_df is None:
+                # Augmenter les données
+                with st.spinner("Augmentation des données en cours..."):
+                    with perf.stage("Augmentation des données"):
+                        augmented_df = augment_data(df, num_augmented_samples=aug_samples, noise_level=noise_level,
+                                                    random_state=AUGMENTATION_SEED)
+                    augmented_df = cache_lease.put('augmented_df', augmentation_key, augmented_df)
+                    
+                    # Afficher une info sur l'augmentation des données
+                    st.info(f"✅ Données augmentées : {len(df)} échantillons originaux + {len(augmented_df) - len(df)} échantillons synthétiques = {len(augmented_df)} échantillons au total")
                 
-                # Afficher une info sur l'augmentation des données
-                st.info(f"✅ Données augmentées : {len(df)} échantillons originaux + {len(augmented_df) - len(df)} échantillons synthétiques = {len(augmented_df)} échantillons au total")
+                    # Calculer le pourcentage d'augmentation
+                    aug_percentage = ((len(augmented_df) - len(df)) / len(df)) * 100
                 
-                # Calculer le pourcentage d'augmentation
-                aug_percentage = ((len(augmented_df) - len(df)) / len(df)) * 100
-                
-                # Afficher un graphique comparant avant/après
-                data_size_comparison = pd.DataFrame({
-                    'Type de données': ['Données originales', 'Données augmentées'],
-                    'Nombre d\'échantillons': [len(df), len(augmented_df)]
-                })
-                
-                fig_augmentation = px.bar(data_size_comparison, 
-                                         x='Type de données', 
-                                         y='Nombre d\'échantillons',
-                                         color='Type de données',
-                                         color_discrete_sequence=['#3563E9', '#0CCE6B'],
-                                         title=f"Effet de l'augmentation des données (+{aug_percentage:.1f}%)",
-                                         template="plotly_white")
-                fig_augmentation.update_layout(
-                    showlegend=False,
-                    xaxis_title="",
-                    yaxis_title="Nombre d'échantillons"
-                )
-                st.plotly_chart(fig_augmentation, use_container_width=True)
+                    # Afficher un graphique comparant avant/après
+                    data_size_comparison = pd.DataFrame({
+                        'Type de données': ['Données originales', 'Données augmentées'],
+                        'Nombre d\'échantillons': [len(df), len(augmented_df)]
+                    })
                 
-                # Utiliser les données augmentées pour l'entraînement
-                modeling_df = augmented_df
-        elif st.session_state.use_augmented_data and st.session_state.augmented_df is not None:
-            # Utiliser les données augmentées déjà générées
-            modeling_df = st.session_state.augmented_df
-            st.info(f"✅ Utilisation des données augmentées : {len(modeling_df)} échantillons au total")
+                    fig_augmentation = px.bar(data_size_comparison, 
+                                             x='Type de données', 
+                                             y='Nombre d\'échantillons',
+                                             color='Type de données',
+                                             color_discrete_sequence=['#3563E9', '#0CCE6B'],
+                                             title=f"Effet de l'augmentation des données (+{aug_percentage:.1f}%)",
+                                             template="plotly_white")
+                    fig_augmentation.update_layout(
+                        showlegend=False,
+                        xaxis_title="",
+                        yaxis_title="Nombre d'échantillons"
+                    )
+                    render_chart(fig_augmentation)
+            else:
+                # Utiliser les données augmentées déjà générées
+                st.info(f"✅ Utilisation des données augmentées : {len(augmented_df)} échantillons au total")
+            
+            st.session_state.augmented_df = augmented_df
+            # Utiliser les données augmentées pour l'entraînement
+            modeling_df = augmented_df
+            modeling_key = augmentation_key
         else:
             # Utiliser les données originales
             modeling_df = df
-        
-        # Définir les caractéristiques et cibles
-        X = modeling_df[['profondeur_finale', 'azimuth_initial', 'inclinaison_initiale', 'lithologie', 'company', 'vitesse_rotation']]
-        y_azimuth = modeling_df['deviation_azimuth']
-        y_inclinaison = modeling_df['deviation_inclinaison']
-        
-        # Préparation pour la modélisation
-        numeric_features = ['profondeur_finale', 'azimuth_initial', 'inclinaison_initiale', 'vitesse_rotation']
-        categorical_features = ['lithologie', 'company']
-        
-        # Préprocesseurs
-        numeric_transformer = Pipeline(steps=[
-            ('scaler', StandardScaler())
-        ])
-        
-        categorical_transformer = Pipeline(steps=[
-            ('onehot', OneHotEncoder(handle_unknown='ignore'))
-        ])
-        
-        preprocessor = ColumnTransformer(
-            transformers=[
-                ('num', numeric_transformer, numeric_features),
-                ('cat', categorical_transformer, categorical_features)
-            ])
-        
-        # Choix du modèle
-        if model_option == "Random Forest":
-            model_azimuth = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
-            ])
-            
-            model_inclinaison = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
-            ])
-            
-        elif model_option == "SVM":
-            model_azimuth = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', SVR())
-            ])
-            
-            model_inclinaison = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', SVR())
-            ])
-            
-        elif model_option == "Régression Linéaire":
-            model_azimuth = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', LinearRegression())
-            ])
-            
-            model_inclinaison = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', LinearRegression())
-            ])
-            
-        else:  # Réseau de Neurones
-            model_azimuth = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', MLPRegressor(hidden_layer_sizes=(100,50), max_iter=1000, random_state=42))
-            ])
-            
-            model_inclinaison = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                ('regressor', MLPRegressor(hidden_layer_sizes=(100,50), max_iter=1000, random_state=42))
-            ])
-        
-        # Diviser les données
-        X_train, X_test, y_azimuth_train, y_azimuth_test, y_inclinaison_train, y_inclinaison_test = train_test_split(
-            X, y_azimuth, y_inclinaison, test_size=0.2, random_state=42
-        )
+            modeling_key = data_fingerprint
+            st.session_state.augmented_df = None
+            cache_lease.release('augmented_df')
         
         # Description du modèle sélectionné
         model_descriptions = {
@@ -1387,6 +1516,18 @@ if df is not None:
                 - Très flexible
                 
                 **Complexité du modèle**: Élevée
+            """,
+            "Gradient Boosting": """
+                **Gradient Boosting (histogrammes)** construit une suite d'arbres de décision, chacun corrigeant les 
+                erreurs des précédents, sur des variables discrétisées en 255 classes au plus. Il traite directement 
+                la lithologie et l'entreprise comme des catégories, sans encodage one-hot.
+                
+                **Avantages**:
+                - Entraînement et prédiction très rapides sur de grandes bases de levés
+                - Arrêt anticipé lorsque le score de validation ne progresse plus
+                - Gère nativement les valeurs manquantes
+                
+                **Complexité du modèle**: Moyenne à élevée
             """
         }
         
@@ -1426,35 +1567,166 @@ if df is not None:
             
             # Étape 1: Préparation des données
             status_text.text("Préparation des données...")
+            # La séparation et la matrice des variables sont calculées une fois par jeu de données, par
+            # type de préprocesseur et par précision, puis partagées par toutes les options de modèle
+            # compatibles (et par les sessions qui entraînent sur les mêmes données)
+            design_key = ('design', modeling_key, preprocessor_kind(model_option), np.dtype(design_dtype(model_option)).name)
+            design_entry = cache_lease.get('design', design_key)
+            if design_entry is None:
+                with perf.stage("Séparation entraînement/test"):
+                    X_train, X_test, y_train, y_test = split_data(modeling_df)
+                design = build_design_matrix(X_train, X_test, model_option, timer=perf)
+                design_entry = cache_lease.put(
+                    'design', design_key, (X_train, X_test, y_train, y_test, design),
+                    nbytes=design['nbytes'] + sum(estimate_nbytes(part) for part in (X_train, X_test, y_train, y_test))
+                )
+            X_train, X_test, y_train, y_test, design = design_entry
+            y_azimuth_test = y_test['deviation_azimuth']
+            y_inclinaison_test = y_test['deviation_inclinaison']
             progress_bar.progress(20)
             
-            # Étape 2: Entraînement du modèle d'azimuth
-            status_text.text("Entraînement du modèle pour la déviation d'azimuth...")
-            model_azimuth.fit(X_train, y_azimuth_train)
-            y_azimuth_pred = model_azimuth.predict(X_test)
-            progress_bar.progress(50)
-            
-            # Étape 3: Entraînement du modèle d'inclinaison
-            status_text.text("Entraînement du modèle pour la déviation d'inclinaison...")
-            model_inclinaison.fit(X_train, y_inclinaison_train)
-            y_inclinaison_pred = model_inclinaison.predict(X_test)
-            progress_bar.progress(80)
+            # Un seul cœur: chemin séquentiel d'origine
+            training_jobs = int(training_workers) if training_workers > 1 else None
+            training_start = time.perf_counter()
+            
+            # Reprendre les modèles d'une autre session, ou les recharger si un entraînement identique
+            # a déjà été enregistré (les modèles optimisés dépendent du budget de temps et ne sont ni
+            # partagés ni enregistrés). La clé ne dépend pas du nombre de cœurs: après un entraînement
+            # mesuré avec un autre nombre de cœurs, le modèle est réentraîné pour comparer les temps.
+            timing_key = (modeling_key, model_option, joint_model)
+            measured_timings = st.session_state.training_times.get(timing_key, {})
+            retrain = force_retrain or (bool(measured_timings) and int(training_workers) not in measured_timings)
+            tuning_leaderboard = None
+            models = None
+            if tune_hyperparameters:
+                cache_lease.release('models')
+            else:
+                store_key = model_store_key(X_train, y_train, model_option, joint_model)
+                if not retrain:
+                    models = cache_lease.get('models', ('models', store_key))
+                    if models is None:
+                        with perf.stage("Chargement des modèles enregistrés"):
+                            models = load_models(store_key)
+            models_loaded = models is not None
+            
+            if tune_hyperparameters:
+                # Étape 2: Recherche des hyperparamètres puis entraînement des meilleurs candidats
+                status_text.text(f"Optimisation des hyperparamètres (budget {tuning_budget} s)...")
+                models, tuning_leaderboard = tune_models(X_train, y_train, model_option, joint=joint_model,
+                                                         time_budget=tuning_budget, n_jobs=int(training_workers),
+                                                         timer=perf, design=design)
+                progress_bar.progress(80)
+            elif models_loaded:
+                status_text.text("Entraînement identique trouvé, chargement des modèles enregistrés...")
+                progress_bar.progress(80)
+            elif joint_model:
+                # Étape 2: Entraînement d'un seul modèle pour les deux déviations
+                status_text.text("Entraînement du modèle conjoint pour les déviations d'azimuth et d'inclinaison...")
+                models = fit_models(X_train, y_train, model_option, joint=True, n_jobs=training_jobs, timer=perf,
+                                    design=design)
+                progress_bar.progress(80)
+            elif training_jobs is not None:
+                # Étape 2: Entraînement simultané des deux modèles dans des processus séparés
+                status_text.text("Entraînement parallèle des modèles d'azimuth et d'inclinaison...")
+                models = fit_models(X_train, y_train, model_option, n_jobs=training_jobs, timer=perf,
+                                    design=design)
+                progress_bar.progress(80)
+            else:
+                # Étape 2: Entraînement du modèle d'azimuth
+                status_text.text("Entraînement du modèle pour la déviation d'azimuth...")
+                model_azimuth = fit_model(X_train, y_train['deviation_azimuth'], model_option, timer=perf,
+                                          design=design)
+                progress_bar.progress(50)
+                
+                # Étape 3: Entraînement du modèle d'inclinaison
+                status_text.text("Entraînement du modèle pour la déviation d'inclinaison...")
+                model_inclinaison = fit_model(X_train, y_train['deviation_inclinaison'], model_option, timer=perf,
+                                              design=design)
+                progress_bar.progress(80)
+                
+                models = {'deviation_azimuth': model_azimuth, 'deviation_inclinaison': model_inclinaison}
+            
+            training_seconds = time.perf_counter() - training_start
+            
+            if not models_loaded and not tune_hyperparameters:
+                try:
+                    with perf.stage("Enregistrement des modèles"):
+                        save_models(models, store_key)
+                except OSError as e:
+                    st.warning(f"⚠️ Les modèles n'ont pas pu être enregistrés: {e}")
+            if not tune_hyperparameters:
+                # Les sessions qui entraînent le même modèle sur les mêmes données partagent ces modèles
+                models = cache_lease.put('models', ('models', store_key), models,
+                                         nbytes=int(memory_report({'modèles': models})['memory_mb'].iloc[0] * 1e6))
+            
+            if not joint_model:
+                model_azimuth = models['deviation_azimuth']
+                model_inclinaison = models['deviation_inclinaison']
+            
+            # Modèles quantiles des intervalles de prédiction, sur la même matrice des variables
+            quantile_models = None
+            if quantile_intervals:
+                status_text.text("Entraînement des modèles quantiles...")
+                quantile_models = fit_quantile_models(X_train, y_train, model_option, design=design, timer=perf)
+            forest_scales = None
+            if model_option == "Random Forest":
+                with perf.stage("Calibrage des intervalles (hors sac)"):
+                    forest_scales = calibrate_forest_intervals(models, X_train, y_train)
             
             # Étape 4: Évaluation des performances
             status_text.text("Évaluation des performances...")
-            azimuth_rmse = np.sqrt(mean_squared_error(y_azimuth_test, y_azimuth_pred))
-            azimuth_r2 = r2_score(y_azimuth_test, y_azimuth_pred)
-            
-            inclinaison_rmse = np.sqrt(mean_squared_error(y_inclinaison_test, y_inclinaison_pred))
-            inclinaison_r2 = r2_score(y_inclinaison_test, y_inclinaison_pred)
+            with perf.stage("Évaluation"):
+                metrics = evaluate(models, X_test, y_test, design=design)
+            y_azimuth_pred = metrics['deviation_azimuth']['y_pred']
+            azimuth_rmse = metrics['deviation_azimuth']['rmse']
+            azimuth_r2 = metrics['deviation_azimuth']['r2']
+            
+            y_inclinaison_pred = metrics['deviation_inclinaison']['y_pred']
+            inclinaison_rmse = metrics['deviation_inclinaison']['rmse']
+            inclinaison_r2 = metrics['deviation_inclinaison']['r2']
             progress_bar.progress(100)
             
             # Stocker les modèles dans la session state
-            st.session_state.model_azimuth = model_azimuth
-            st.session_state.model_inclinaison = model_inclinaison
+            st.session_state.models = models
             st.session_state.model_trained = True
-            
-            status_text.text("Entraînement terminé!")
+            st.session_state.test_split = (X_test, y_test)
+            st.session_state.training_rows = len(X_train)
+            st.session_state.trained_model_option = model_option
+            st.session_state.quantile_models = quantile_models
+            st.session_state.forest_interval_scales = forest_scales
+            
+            if models_loaded:
+                timing_text = (f"Modèles chargés depuis le stockage en {training_seconds * 1000:.0f} ms (aucun réentraînement; "
+                               f"cochez « Forcer le réentraînement » pour mesurer le temps d'entraînement)")
+            elif tune_hyperparameters:
+                timing_text = f"Optimisation et entraînement terminés en {training_seconds:.2f} s ({len(tuning_leaderboard)} évaluations de candidats)"
+                if training_seconds > tuning_budget:
+                    # Le premier candidat et l'ajustement final le plus court sont toujours exécutés
+                    timing_text += f"; budget de {tuning_budget} s trop court pour l'ajustement final sur ces données"
+            else:
+                # Comparer au temps de l'entraînement séquentiel sur les mêmes données et le même modèle
+                timings = st.session_state.training_times.setdefault(timing_key, {})
+                timings[int(training_workers)] = training_seconds
+                
+                timing_text = f"Entraînement terminé en {training_seconds:.2f} s"
+                if training_workers > 1:
+                    if 1 in timings:
+                        timing_text += f" (accélération ×{timings[1] / training_seconds:.1f} par rapport au mode séquentiel)"
+                    else:
+                        timing_text += " (entraînez avec 1 cœur pour mesurer l'accélération)"
+            status_text.text(timing_text)
+            
+            # Proportion des déviations du jeu de test comprises dans leur intervalle de prédiction
+            if supports_intervals(models, quantile_models, forest_scales):
+                with perf.stage("Intervalles de prédiction (test)"):
+                    test_intervals = prediction_intervals(models, X_test, quantile_models=quantile_models,
+                                                          forest_scales=forest_scales)
+                coverages = []
+                for target in y_test.columns:
+                    inside = y_test[target].between(test_intervals[f"{target}_inf"], test_intervals[f"{target}_sup"])
+                    coverages.append(f"{target} {inside.mean():.0%}")
+                st.caption(f"Couverture des intervalles de prédiction à {INTERVAL_COVERAGE:.0%} sur le jeu de test: "
+                           + ", ".join(coverages))
             
             # Affichage des résultats
             st.markdown("<h3>Résultats de l'entraînement</h3>", unsafe_allow_html=True)
@@ -1491,7 +1763,7 @@ if df is not None:
                 fig_pred_az.update_layout(
                     margin=dict(l=20, r=20, t=50, b=20),
                 )
-                st.plotly_chart(fig_pred_az, use_container_width=True)
+                render_chart(fig_pred_az)
             
             with col2:
                 st.markdown("<h4>Déviation d'inclinaison</h4>", unsafe_allow_html=True)
@@ -1523,7 +1795,7 @@ if df is not None:
                 fig_pred_inc.update_layout(
                     margin=dict(l=20, r=20, t=50, b=20),
                 )
-                st.plotly_chart(fig_pred_inc, use_container_width=True)
+                render_chart(fig_pred_inc)
             
             # Interprétation des résultats
             st.markdown("<h3>Interprétation des résultats</h3>", unsafe_allow_html=True)
@@ -1580,24 +1852,39 @@ if df is not None:
             </div>
             """, unsafe_allow_html=True)
             
+            # Classement des candidats de l'optimisation: meilleur tour atteint d'abord, puis RMSE
+            if tuning_leaderboard is not None:
+                st.markdown("<h3>Classement de l'optimisation</h3>", unsafe_allow_html=True)
+                leaderboard_display = tuning_leaderboard.sort_values(['cible', 'tour', 'rmse_cv'], ascending=[True, False, True])
+                leaderboard_display = leaderboard_display.assign(
+                    **{'hyperparamètres': leaderboard_display['hyperparamètres'].map(str)}
+                )
+                st.dataframe(leaderboard_display.round(4), use_container_width=True, hide_index=True)
+            
             # Si Random Forest, afficher l'importance des caractéristiques
             if model_option == "Random Forest":
                 st.markdown("<h3>Importance des caractéristiques</h3>", unsafe_allow_html=True)
                 
-                # Extraire l'importance des caractéristiques pour l'azimuth
-                rf_azimuth = model_azimuth.named_steps['regressor']
-                preprocessor_azimuth = model_azimuth.named_steps['preprocessor']
-                
-                # Obtenir les noms des caractéristiques après transformation
-                cat_features = preprocessor_azimuth.transformers_[1][1].named_steps['onehot'].get_feature_names_out(categorical_features)
-                feature_names = np.concatenate([numeric_features, cat_features])
-                
-                # Obtenir l'importance des caractéristiques
-                feature_importance_azimuth = rf_azimuth.feature_importances_
-                
-                # Pour l'inclinaison
-                rf_inclinaison = model_inclinaison.named_steps['regressor']
-                feature_importance_inclinaison = rf_inclinaison.feature_importances_
+                if joint_model:
+                    # Un modèle conjoint n'a qu'une importance, commune aux deux déviations
+                    joint_pipeline = next(iter(models.values()))
+                    feature_names = get_feature_names(joint_pipeline)
+                    feature_importance_azimuth = joint_pipeline.named_steps['regressor'].feature_importances_
+                    feature_importance_inclinaison = feature_importance_azimuth
+                    st.caption("Modèle conjoint : l'importance des facteurs est commune aux deux déviations.")
+                else:
+                    # Extraire l'importance des caractéristiques pour l'azimuth
+                    rf_azimuth = model_azimuth.named_steps['regressor']
+                    
+                    # Obtenir les noms des caractéristiques après transformation
+                    feature_names = get_feature_names(model_azimuth)
+                    
+                    # Obtenir l'importance des caractéristiques
+                    feature_importance_azimuth = rf_azimuth.feature_importances_
+                    
+                    # Pour l'inclinaison
+                    rf_inclinaison = model_inclinaison.named_steps['regressor']
+                    feature_importance_inclinaison = rf_inclinaison.feature_importances_
                 
                 # Créer un DataFrame pour l'affichage
                 importance_df = pd.DataFrame({
@@ -1624,7 +1911,7 @@ if df is not None:
                         margin=dict(l=20, r=20, t=50, b=20),
                         coloraxis_showscale=False
                     )
-                    st.plotly_chart(fig_imp_az, use_container_width=True)
+                    render_chart(fig_imp_az)
                 
                 with col2:
                     fig_imp_inc = px.bar(
@@ -1641,7 +1928,61 @@ if df is not None:
                         margin=dict(l=20, r=20, t=50, b=20),
                         coloraxis_showscale=False
                     )
-                    st.plotly_chart(fig_imp_inc, use_container_width=True)
+                    render_chart(fig_imp_inc)
+    
+        # Mise à jour incrémentale avec de nouveaux forages mesurés, sans réentraînement complet
+        if st.session_state.model_trained and st.session_state.test_split is not None:
+            st.markdown("<h3>Mise à jour incrémentale</h3>", unsafe_allow_html=True)
+            st.markdown("""
+            <div class="info-box">
+                <b>Nouveaux forages mesurés</b>: Chargez un CSV avec les variables d'entrée et les déviations mesurées
+                pour mettre à jour les modèles en un temps proportionnel au nombre de nouvelles lignes. Les métriques
+                sont recalculées sur le même jeu de test que l'entraînement initial.
+            </div>
+            """, unsafe_allow_html=True)
+            
+            if st.session_state.trained_model_option not in INCREMENTAL_MODEL_OPTIONS:
+                st.warning(f"⚠️ Le modèle {st.session_state.trained_model_option} ne permet pas la mise à jour incrémentale; réentraînez-le sur l'ensemble des données.")
+            else:
+                new_rows_file = st.file_uploader("Nouveaux forages mesurés (CSV)", type="csv", key="new_survey_rows_file")
+                
+                update_col1, update_col2, update_col3 = st.columns([1, 2, 1])
+                with update_col2:
+                    update_button = st.button("🔁 Mettre à jour les modèles", use_container_width=True,
+                                              disabled=new_rows_file is None)
+                
+                if update_button:
+                    new_rows = pd.read_csv(new_rows_file, dtype={'lithologie': 'category', 'company': 'category'})
+                    missing = [col for col in FEATURES + ['deviation_azimuth', 'deviation_inclinaison'] if col not in new_rows.columns]
+                    if missing:
+                        st.error(f"⚠️ Colonnes manquantes: {', '.join(missing)}")
+                    else:
+                        X_test, y_test = st.session_state.test_split
+                        metrics_before = evaluate(st.session_state.models, X_test, y_test)
+                        update_start = time.perf_counter()
+                        try:
+                            updated_models = update_models(
+                                st.session_state.models, new_rows[FEATURES],
+                                new_rows[['deviation_azimuth', 'deviation_inclinaison']],
+                                st.session_state.training_rows, timer=perf
+                            )
+                        except ValueError as e:
+                            st.error(f"⚠️ {e}")
+                        else:
+                            update_seconds = time.perf_counter() - update_start
+                            with perf.stage("Évaluation"):
+                                metrics_after = evaluate(updated_models, X_test, y_test)
+                            st.session_state.models = updated_models
+                            st.session_state.training_rows += len(new_rows)
+                            
+                            st.success(f"✅ Modèles mis à jour avec {len(new_rows):,} nouveaux forages en {update_seconds:.2f} s "
+                                       f"({st.session_state.training_rows:,} lignes apprises au total)")
+                            st.dataframe(pd.DataFrame({
+                                'RMSE avant': [metrics_before[target]['rmse'] for target in metrics_before],
+                                'RMSE après': [metrics_after[target]['rmse'] for target in metrics_before],
+                                'R² avant': [metrics_before[target]['r2'] for target in metrics_before],
+                                'R² après': [metrics_after[target]['r2'] for target in metrics_before]
+                            }, index=['Azimuth', 'Inclinaison']).round(4), use_container_width=True)
     
     with tabs[2]:  # Prédiction
         st.markdown("<h2>Prédiction pour un nouveau forage</h2>", unsafe_allow_html=True)
@@ -1732,7 +2073,7 @@ if df is not None:
                 return fig
             
             drill_fig = generate_drill_illustration(azimuth_initial_input, inclinaison_initiale_input)
-            st.plotly_chart(drill_fig, use_container_width=True)
+            render_chart(drill_fig)
             
             # Informations supplémentaires sur la lithologie et l'entreprise
             lithology_info = {
@@ -1783,8 +2124,17 @@ if df is not None:
             })
             
             # Faire les prédictions avec les modèles stockés dans session_state
-            predicted_azimuth = st.session_state.model_azimuth.predict(input_data)[0]
-            predicted_inclinaison = st.session_state.model_inclinaison.predict(input_data)[0]
+            predictions = predict(st.session_state.models, input_data)
+            predicted_azimuth = predictions['deviation_azimuth'].iloc[0]
+            predicted_inclinaison = predictions['deviation_inclinaison'].iloc[0]
+            
+            # Intervalles de prédiction (forêt aléatoire ou modèles quantiles)
+            intervals = None
+            if supports_intervals(st.session_state.models, st.session_state.quantile_models,
+                                  st.session_state.forest_interval_scales):
+                intervals = prediction_intervals(st.session_state.models, input_data,
+                                                 quantile_models=st.session_state.quantile_models,
+                                                 forest_scales=st.session_state.forest_interval_scales).iloc[0]
             
             # Calculer les valeurs finales
             azimuth_final = azimuth_initial_input + predicted_azimuth
@@ -1809,10 +2159,16 @@ if df is not None:
             
             with col1:
                 st.metric("Déviation d'azimuth", f"{predicted_azimuth:.2f}°")
+                if intervals is not None:
+                    st.caption(f"Intervalle à {INTERVAL_COVERAGE:.0%}: [{intervals['deviation_azimuth_inf']:.2f}°, "
+                               f"{intervals['deviation_azimuth_sup']:.2f}°]")
                 st.metric("Azimuth final", f"{azimuth_final:.2f}°")
             
             with col2:
                 st.metric("Déviation d'inclinaison", f"{predicted_inclinaison:.2f}°")
+                if intervals is not None:
+                    st.caption(f"Intervalle à {INTERVAL_COVERAGE:.0%}: [{intervals['deviation_inclinaison_inf']:.2f}°, "
+                               f"{intervals['deviation_inclinaison_sup']:.2f}°]")
                 st.metric("Inclinaison finale", f"{inclinaison_final:.2f}°")
             
             # Calcul de l'intensité de la déviation pour le texte d'interprétation
@@ -1841,34 +2197,14 @@ if df is not None:
             # Visualisation 3D de la trajectoire du forage
             st.markdown("<h3>Visualisation de la trajectoire</h3>", unsafe_allow_html=True)
             
-            # Conversion des coordonnées polaires en coordonnées cartésiennes
-            def sph_to_cart(depth, azimuth, inclination):
-                # Conversion des degrés en radians
-                azimuth_rad = np.radians(azimuth)
-                inclination_rad = np.radians(inclination)
-                
-                # x pointe vers l'est, y vers le nord, z vers le haut
-                x = depth * np.cos(inclination_rad) * np.sin(azimuth_rad)
-                y = depth * np.cos(inclination_rad) * np.cos(azimuth_rad)
-                z = depth * np.sin(inclination_rad)  # z est négatif car inclination est négative
-                
-                return x, y, z
-            
-            # Calculer plusieurs points le long de la trajectoire
-            num_points = 100
-            depths = np.linspace(0, prof_finale_input, num_points)
-            
-            # Interpolation linéaire entre les angles initiaux et finaux
-            azimuth_interp = np.linspace(azimuth_initial_input, azimuth_final, num_points)
-            inclination_interp = np.linspace(inclinaison_initiale_input, inclinaison_final, num_points)
-            
-            # Calculer les coordonnées cartésiennes pour chaque point
-            x_coords, y_coords, z_coords = [], [], []
-            for i in range(num_points):
-                x, y, z = sph_to_cart(depths[i], azimuth_interp[i], inclination_interp[i])
-                x_coords.append(x)
-                y_coords.append(y)
-                z_coords.append(z)
+            # Trajectoires prédite et planifiée par la méthode de courbure minimale
+            with perf.stage("Calcul de la trajectoire"):
+                trajectory, planned_trajectory = hole_trajectories(
+                    prof_finale_input, azimuth_initial_input, inclinaison_initiale_input,
+                    azimuth_final, inclinaison_final
+                )
+            x_coords, y_coords, z_coords = trajectory.T
+            x_planned, y_planned, z_planned = planned_trajectory.T
             
             # Surface (grille)
             x_surface = np.linspace(min(x_coords)-50, max(x_coords)+50, 10)
@@ -1931,12 +2267,10 @@ if df is not None:
             ))
             
             # Ajouter la trajectoire idéale (ligne droite) avec une meilleure visibilité
-            x_ideal, y_ideal, z_ideal = sph_to_cart(prof_finale_input, azimuth_initial_input, inclinaison_initiale_input)
-            
             fig.add_trace(go.Scatter3d(
-                x=[0, x_ideal],
-                y=[0, y_ideal],
-                z=[0, z_ideal],
+                x=x_planned,
+                y=y_planned,
+                z=z_planned,
                 mode='lines',
                 line=dict(
                     color='rgba(255, 99, 71, 0.7)',  # Rouge plus visible
@@ -1947,7 +2281,7 @@ if df is not None:
             ))
             
             # Calculer l'écart final en mètres
-            final_deviation = ((x_coords[-1] - x_ideal)**2 + (y_coords[-1] - y_ideal)**2 + (z_coords[-1] - z_ideal)**2)**0.5
+            final_deviation = np.linalg.norm(trajectory[-1] - planned_trajectory[-1])
             
             fig.update_layout(
                 title=f"Trajectoire du forage (Écart final: {final_deviation:.2f} m)",
@@ -1962,7 +2296,7 @@ if df is not None:
                 margin=dict(l=0, r=0, t=50, b=0)
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(fig)
             
             # Ajouter une section d'interprétation et de recommandation
             st.markdown("<h3>Interprétation et recommandations</h3>", unsafe_allow_html=True)
@@ -2037,7 +2371,7 @@ if df is not None:
                     font={'family': 'DM Sans'}
                 )
                 
-                st.plotly_chart(gauge_fig, use_container_width=True)
+                render_chart(gauge_fig)
             
             # Ajouter une option pour télécharger le rapport
             st.markdown("<h3>Télécharger le rapport</h3>", unsafe_allow_html=True)
@@ -2094,7 +2428,129 @@ Didier Ouedraogo, P.Geo. - Géologue & Data Scientist
                     mime="text/plain",
                     use_container_width=True
                 )
-    
+        
+        # Prédiction par lots pour une campagne de forages planifiés
+        st.markdown("<h3>Prédiction par lots</h3>", unsafe_allow_html=True)
+        st.markdown("""
+        <div class="info-box">
+            <b>Campagne de forages</b>: Chargez un CSV de forages planifiés contenant les colonnes
+            profondeur_finale, azimuth_initial, inclinaison_initiale, lithologie, company et vitesse_rotation.
+            Les autres colonnes (identifiant, coordonnées du collet...) sont conservées dans les résultats.
+        </div>
+        """, unsafe_allow_html=True)
+        
+        planned_file = st.file_uploader("Forages planifiés (CSV)", type="csv", key="planned_holes_file")
+        if planned_file is None:
+            st.session_state.batch_results = None
+        
+        batch_col1, batch_col2, batch_col3 = st.columns([1, 2, 1])
+        with batch_col2:
+            batch_button = st.button("⚡ Prédire le lot", use_container_width=True,
+                                     disabled=planned_file is None or not st.session_state.model_trained)
+        
+        if batch_button:
+            planned_holes = pd.read_csv(planned_file, dtype={'lithologie': 'category', 'company': 'category'})
+            batch_start = time.perf_counter()
+            try:
+                batch_results = predict_holes(st.session_state.models, planned_holes)
+                # Bornes des intervalles de prédiction à côté des déviations prédites
+                if supports_intervals(st.session_state.models, st.session_state.quantile_models,
+                                      st.session_state.forest_interval_scales):
+                    with perf.stage("Intervalles de prédiction (lot)"):
+                        batch_results = batch_results.join(prediction_intervals(
+                            st.session_state.models, planned_holes[FEATURES],
+                            quantile_models=st.session_state.quantile_models,
+                            forest_scales=st.session_state.forest_interval_scales
+                        ))
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+            else:
+                batch_seconds = time.perf_counter() - batch_start
+                st.session_state.batch_results = batch_results
+                st.success(f"✅ {len(batch_results):,} forages prédits en {batch_seconds:.2f} s "
+                           f"({len(batch_results) / max(batch_seconds, 1e-9):,.0f} forages/s)")
+        
+        if st.session_state.batch_results is not None:
+            st.dataframe(st.session_state.batch_results.head(100), use_container_width=True)
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col2:
+                st.download_button(
+                    label="📄 Télécharger les prédictions",
+                    data=st.session_state.batch_results.to_csv(index=False).encode('utf-8'),
+                    file_name=f"predictions_forages_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+
+            # Vue 3D de la campagne: tous les forages dans une seule trace, points décimés
+            st.markdown("<h4>Trajectoires de la campagne</h4>", unsafe_allow_html=True)
+            batch_results = st.session_state.batch_results
+            has_collars = all(col in batch_results.columns for col in COLLAR_COLUMNS[:2])
+
+            view_col1, view_col2 = st.columns(2)
+            with view_col1:
+                point_budget = st.select_slider("Points affichés", options=CAMPAIGN_POINT_BUDGETS,
+                                                value=CAMPAIGN_POINT_BUDGETS[1],
+                                                format_func=lambda n: f"{n:,}")
+            view_holes = batch_results
+            if has_collars:
+                # Zoom sur une zone: le budget de points se répartit sur moins de forages, plus détaillés
+                with view_col2:
+                    east_min, east_max = float(batch_results['collet_est'].min()), float(batch_results['collet_est'].max())
+                    north_min, north_max = float(batch_results['collet_nord'].min()), float(batch_results['collet_nord'].max())
+                    east_range = st.slider("Zone Est (m)", east_min, max(east_max, east_min + 1), (east_min, max(east_max, east_min + 1)))
+                    north_range = st.slider("Zone Nord (m)", north_min, max(north_max, north_min + 1), (north_min, max(north_max, north_min + 1)))
+                view_holes = batch_results[
+                    batch_results['collet_est'].between(*east_range) & batch_results['collet_nord'].between(*north_range)
+                ]
+            else:
+                st.caption(f"Sans colonnes {COLLAR_COLUMNS[0]} et {COLLAR_COLUMNS[1]}, tous les forages partent de l'origine.")
+
+            # Au-delà de ce que le budget permet (2 points par forage), un forage sur k est affiché
+            max_view_holes = min(point_budget // 2, CAMPAIGN_MAX_HOLES)
+            if len(view_holes) > max_view_holes:
+                view_holes = view_holes.iloc[np.linspace(0, len(view_holes) - 1, max_view_holes).astype(int)]
+
+            if len(view_holes) == 0:
+                st.warning("Aucun forage dans la zone sélectionnée.")
+            else:
+                with perf.stage("Trajectoires de la campagne"):
+                    campaign_positions = campaign_trajectories(view_holes)
+                    campaign_keep = decimate_trajectories(campaign_positions, point_budget)
+                    x_campaign, y_campaign, z_campaign, offset_colors = pack_trajectories(
+                        campaign_positions, campaign_keep, view_holes['ecart_final_m'].to_numpy()
+                    )
+
+                campaign_fig = go.Figure(go.Scatter3d(
+                    x=x_campaign,
+                    y=y_campaign,
+                    z=z_campaign,
+                    mode='lines',
+                    line=dict(
+                        color=offset_colors,
+                        colorscale='Viridis',
+                        width=3,
+                        colorbar=dict(title="Écart final (m)")
+                    ),
+                    hoverinfo='skip',
+                    name='Trajectoires prédites'
+                ))
+                campaign_fig.update_layout(
+                    scene=dict(
+                        xaxis_title='Est (m)',
+                        yaxis_title='Nord (m)',
+                        zaxis_title='Élévation (m)',
+                        aspectmode='data'
+                    ),
+                    template="plotly_white",
+                    height=700,
+                    margin=dict(l=0, r=0, t=30, b=0)
+                )
+                render_chart(campaign_fig)
+                st.caption(f"{len(view_holes):,} forages affichés sur {len(batch_results):,}, "
+                           f"{int(campaign_keep.sum()):,} points ({campaign_keep.mean():.0%} des stations calculées).")
+
     # Ajouter un pied de page avec les informations d'auteur
     st.markdown("""
     <div class="footer">
@@ -2136,4 +2592,64 @@ else:
                 </div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
\ No newline at end of file
+        """, unsafe_allow_html=True)
+# Panneau de performance: durée et mémoire de chaque étape de cette exécution
+with st.sidebar:
+    with st.expander("⏱️ Performance de l'exécution"):
+        perf_frame = perf.to_frame()
+        if perf_frame.empty:
+            st.caption("Aucune étape mesurée pour cette exécution.")
+        else:
+            st.dataframe(
+                perf_frame.rename(columns={
+                    'stage': 'Étape',
+                    'seconds': 'Durée (s)',
+                    'memory_delta_mb': 'Δ mémoire (Mo)',
+                    'calls': 'Appels'
+                }).style.format({'Durée (s)': '{:.3f}', 'Δ mémoire (Mo)': '{:+.1f}'}, na_rep='—'),
+                hide_index=True
+            )
+            st.caption("Le rendu des figures d'un onglet est aussi compté dans la durée de l'onglet.")
+
+# Mémoire de la session: données, modèles et caches conservés dans st.session_state
+with st.sidebar:
+    with st.expander("🧮 Mémoire de la session"):
+        session_memory = memory_report({
+            'Données brutes': st.session_state.raw_df,
+            'Données mappées': st.session_state.df,
+            'Données augmentées': st.session_state.augmented_df,
+            'Jeu de test': st.session_state.test_split,
+            'Modèles': st.session_state.models,
+            'Prédictions par lot': st.session_state.batch_results
+        })
+        session_total_mb = session_memory['memory_mb'].sum()
+        st.dataframe(
+            session_memory.rename(columns={
+                'objet': 'Objet',
+                'memory_mb': 'Mémoire (Mo)',
+                'shared_mb': 'Partagée (Mo)'
+            }).style.format({'Mémoire (Mo)': '{:.1f}', 'Partagée (Mo)': '{:.1f}'}),
+            hide_index=True
+        )
+        process_mb = current_memory_mb()
+        st.caption(
+            f"Total de la session: {session_total_mb:.1f} Mo"
+            + (f" (processus serveur: {process_mb:.0f} Mo)" if process_mb is not None else "")
+            + ". La mémoire partagée (vues, objets référencés plusieurs fois) n'est comptée qu'une fois."
+        )
+        if session_total_mb > SESSION_MEMORY_WARNING_MB:
+            st.warning(f"⚠️ Cette session occupe plus de {SESSION_MEMORY_WARNING_MB} Mo: désactivez l'augmentation "
+                       "ou utilisez la lecture optimisée pour libérer de la mémoire.")
+        shared_stats = get_shared_cache().stats()
+        st.caption(
+            f"Cache partagé entre sessions: {shared_stats['entries']} entrées, {shared_stats['memory_mb']:.1f} Mo "
+            f"sur {shared_stats['max_mb']:.0f} Mo ({shared_stats['held_entries']} entrées tenues par "
+            f"{shared_stats['leases']} sessions, {shared_stats['hits']} réutilisations). Les données et modèles "
+            "partagés figurent aussi dans le total de chaque session qui les utilise."
+        )
+
+if PERF_LOG_PATH:
+    try:
+        perf.write_jsonl(PERF_LOG_PATH)
+    except OSError as e:
+        st.sidebar.warning(f"Journal de performance non écrit: {e}")
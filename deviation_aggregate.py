@@ -0,0 +1,113 @@
+"""
+Agrégats pour les graphiques d'exploration des grands jeux de données, sans Streamlit.
+
+Au-delà de AGGREGATION_ROW_THRESHOLD lignes, l'application ne transmet plus chaque point au
+navigateur: les nuages de points deviennent des densités 2D, les droites OLS des moyennes par
+classe et les boîtes à moustaches sont calculées côté serveur.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Nombre de lignes au-delà duquel les graphiques d'exploration passent en mode agrégé
+AGGREGATION_ROW_THRESHOLD = 50000
+
+# Nombre de classes par défaut des densités, tendances et histogrammes agrégés
+DENSITY_BINS = 60
+TREND_BINS = 30
+HISTOGRAM_BINS = 50
+
+
+def bin_edges(values, bins):
+    """Bornes de bins classes régulières couvrant les valeurs finies."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.histogram_bin_edges(values[np.isfinite(values)], bins=bins)
+
+
+def _bin_codes(values, edges):
+    # Indice de classe de chaque valeur, la dernière borne étant incluse comme dans np.histogram
+    return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+
+
+def density_grid(df, x, y, bins=DENSITY_BINS):
+    """
+    Densité 2D (nombre de forages par case) de deux variables numériques.
+
+    Returns:
+        Tuple (centres des classes en x, centres des classes en y, comptes de forme
+        (len(y), len(x))), comptes nuls remplacés par NaN pour laisser les cases vides transparentes
+    """
+    x_values = df[x].to_numpy(dtype=np.float64)
+    y_values = df[y].to_numpy(dtype=np.float64)
+    valid = np.isfinite(x_values) & np.isfinite(y_values)
+    counts, x_edges, y_edges = np.histogram2d(x_values[valid], y_values[valid], bins=bins)
+    counts[counts == 0] = np.nan
+    return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts.T
+
+
+def binned_trend(df, x, y, group=None, bins=TREND_BINS):
+    """
+    Moyenne de y par classe de x, éventuellement pour chaque modalité de group.
+
+    Remplace la droite de tendance OLS: une seule agrégation groupée au lieu d'une
+    régression par modalité, et la forme non linéaire de la relation reste visible.
+
+    Returns:
+        DataFrame avec les colonnes [group,] 'x' (centre de classe), 'mean' et 'count'
+    """
+    x_values = df[x].to_numpy(dtype=np.float64)
+    edges = bin_edges(x_values, bins)
+    frame = pd.DataFrame({'bin': _bin_codes(x_values, edges), 'y': df[y].to_numpy(dtype=np.float64)})
+    keys = ['bin']
+    if group is not None:
+        frame[group] = df[group].to_numpy()
+        keys = [group, 'bin']
+    trend = frame.groupby(keys, observed=True, sort=True)['y'].agg(['mean', 'count']).reset_index()
+    centers = (edges[:-1] + edges[1:]) / 2
+    trend.insert(len(keys) - 1, 'x', centers[trend['bin'].to_numpy()])
+    return trend.drop(columns='bin')
+
+
+def box_statistics(df, value, group):
+    """
+    Statistiques des boîtes à moustaches de value par modalité de group (règle 1,5 × IQR).
+
+    Returns:
+        DataFrame indexé par modalité, colonnes 'q1', 'median', 'q3', 'lowerfence',
+        'upperfence', 'mean' et 'count'
+    """
+    grouped = df.groupby(group, observed=True)[value]
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    quartiles.columns = ['q1', 'median', 'q3']
+    iqr = quartiles['q3'] - quartiles['q1']
+
+    # Les moustaches s'arrêtent à la dernière valeur observée à l'intérieur de 1,5 × IQR
+    values = df[value]
+    groups = df[group]
+    lower_limit = groups.map(quartiles['q1'] - 1.5 * iqr).astype(np.float64)
+    upper_limit = groups.map(quartiles['q3'] + 1.5 * iqr).astype(np.float64)
+    stats = quartiles.assign(
+        lowerfence=values.where(values >= lower_limit).groupby(groups, observed=True).min(),
+        upperfence=values.where(values <= upper_limit).groupby(groups, observed=True).max(),
+        mean=grouped.mean(),
+        count=grouped.size()
+    )
+    return stats
+
+
+def histogram_counts(df, value, group=None, bins=HISTOGRAM_BINS):
+    """
+    Histogramme de value, éventuellement une série de comptes par modalité de group.
+
+    Returns:
+        Tuple (centres des classes, largeur de classe, DataFrame des comptes avec une ligne
+        par classe et une colonne par modalité, ou une seule colonne 'count')
+    """
+    values = df[value].to_numpy(dtype=np.float64)
+    edges = bin_edges(values, bins)
+    codes = _bin_codes(values, edges)
+    if group is None:
+        counts = pd.DataFrame({'count': np.bincount(codes, minlength=len(edges) - 1)})
+    else:
+        counts = pd.crosstab(codes, df[group].to_numpy()).reindex(range(len(edges) - 1), fill_value=0)
+    return (edges[:-1] + edges[1:]) / 2, edges[1] - edges[0], counts
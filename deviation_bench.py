@@ -0,0 +1,205 @@
+"""
+Banc d'essai reproductible de la chaîne de traitement, sans Streamlit.
+
+Mesure, pour chaque taille de jeu de données: la lecture du CSV (complète et par blocs),
+l'augmentation des données, l'entraînement de chaque modèle et la latence de prédiction
+(un forage et lot complet, par les pipelines, par l'artefact avec les régresseurs à arbres
+de scikit-learn et par l'artefact seul). Les résultats sont écrits dans un fichier JSON trié,
+à comparer d'une version à l'autre.
+
+Utilisation:
+    python deviation_bench.py --sizes 1000,10000,100000,1000000 --output bench_results.json
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from deviation_data import augment_data, generate_demo_data, load_mapped_csv
+from deviation_export import export_models
+from deviation_inference import load_compiled_models
+from deviation_model import MODEL_OPTIONS, split_data, fit_models, predict
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Au-delà de ces tailles, l'entraînement n'est pas mesuré (complexité quadratique de SVR)
+FIT_ROW_LIMITS = {
+    "SVM": 20000
+}
+
+# Nombre de prédictions d'un seul forage pour mesurer la latence
+SINGLE_PREDICTIONS = 50
+
+
+def time_call(fn, repeat=1):
+    """Exécute fn `repeat` fois et renvoie (meilleur temps en secondes, résultat du dernier appel)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _record(stage, n_rows, seconds, **extra):
+    record = {
+        'stage': stage,
+        'rows': n_rows,
+        'seconds': seconds,
+        'rows_per_second': n_rows / seconds if seconds > 0 else None
+    }
+    record.update(extra)
+    return record
+
+
+def bench_ingestion(df, repeat=1):
+    """Lecture d'un CSV de la taille du jeu de données, complète puis par blocs typés."""
+    records = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'forages.csv')
+        df.to_csv(path, index=False)
+        seconds, _ = time_call(lambda: pd.read_csv(path), repeat)
+        records.append(_record('load_csv', len(df), seconds))
+
+        mapping = {col: col for col in df.columns}
+        seconds, (_, stats) = time_call(lambda: load_mapped_csv(path, mapping), repeat)
+        records.append(_record('load_mapped_csv', len(df), seconds, peak_memory_mb=stats['peak_memory_mb']))
+    return records
+
+
+def bench_augmentation(df, repeat=1):
+    """Augmentation doublant le jeu de données."""
+    seconds, _ = time_call(
+        lambda: augment_data(df, num_augmented_samples=len(df), noise_level=0.1, random_state=0), repeat
+    )
+    return [_record('augment_data', len(df), seconds)]
+
+
+def bench_model(df, model_option, repeat=1):
+    """
+    Entraînement des deux modèles puis prédiction d'un forage et du jeu de test complet, par les
+    pipelines, par l'artefact (deviation_export) avec les pipelines pour les arbres, puis par
+    l'artefact seul (_numpy).
+    """
+    X_train, X_test, y_train, _ = split_data(df)
+    limit = FIT_ROW_LIMITS.get(model_option)
+    if limit is not None and len(X_train) > limit:
+        return [{'stage': 'fit', 'rows': len(X_train), 'model_option': model_option,
+                 'skipped': f"plus de {limit} lignes d'entraînement"}]
+
+    seconds, models = time_call(lambda: fit_models(X_train, y_train, model_option), repeat)
+    records = [_record('fit', len(X_train), seconds, model_option=model_option)]
+
+    artifact = export_models(models)
+    compiled = load_compiled_models(io.BytesIO(artifact), models)
+    numpy_only = load_compiled_models(io.BytesIO(artifact))
+    for suffix, predict_fn in (('', lambda X: predict(models, X)), ('_compiled', compiled.predict),
+                               ('_numpy', numpy_only.predict)):
+        records.append(_single_latency(f'predict_single{suffix}', predict_fn, X_test.iloc[:1], model_option))
+        seconds, _ = time_call(lambda: predict_fn(X_test), repeat)
+        records.append(_record(f'predict_batch{suffix}', len(X_test), seconds, model_option=model_option))
+    return records
+
+
+def _single_latency(stage, predict_fn, single_row, model_option):
+    latencies = []
+    for _ in range(SINGLE_PREDICTIONS):
+        start = time.perf_counter()
+        predict_fn(single_row)
+        latencies.append(time.perf_counter() - start)
+    return {
+        'stage': stage,
+        'rows': 1,
+        'model_option': model_option,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000)
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, model_options=MODEL_OPTIONS, repeat=1, seed=42, log=print):
+    """
+    Exécute le banc d'essai complet.
+
+    Returns:
+        Dictionnaire {'environment': ..., 'results': [...]} sérialisable en JSON
+    """
+    results = []
+    for n_rows in sizes:
+        df = generate_demo_data(n_samples=n_rows, seed=seed)
+        log(f"== {n_rows} lignes")
+        stage_records = bench_ingestion(df, repeat) + bench_augmentation(df, repeat)
+        for model_option in model_options:
+            stage_records += bench_model(df, model_option, repeat)
+        for record in stage_records:
+            record['dataset_rows'] = n_rows
+            log("   " + ", ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                  for key, value in record.items() if key != 'dataset_rows'))
+        results += stage_records
+
+    return {
+        'environment': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'seed': seed,
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai de la prédiction des déviations de forage")
+    parser.add_argument('--sizes', default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Tailles des jeux de données, séparées par des virgules")
+    parser.add_argument('--models', default=",".join(MODEL_OPTIONS),
+                        help="Modèles à mesurer, séparés par des virgules")
+    parser.add_argument('--repeat', type=int, default=1, help="Répétitions par mesure (le meilleur temps est gardé)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    model_options = [option.strip() for option in args.models.split(',') if option.strip()]
+    unknown = [option for option in model_options if option not in MODEL_OPTIONS]
+    if unknown:
+        parser.error(f"Modèles inconnus: {', '.join(unknown)}")
+
+    report = run_benchmarks(
+        sizes=[int(size) for size in args.sizes.split(',')],
+        model_options=model_options,
+        repeat=args.repeat,
+        seed=args.seed
+    )
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
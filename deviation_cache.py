@@ -0,0 +1,239 @@
+"""Empreintes de contenu et cache borné en mémoire, partagé entre les sessions."""
+
+import hashlib
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def dataframe_fingerprint(df):
+    """
+    Calcule une empreinte rapide du contenu d'un DataFrame (colonnes, types et valeurs).
+
+    Args:
+        df: DataFrame à identifier
+
+    Returns:
+        Chaîne hexadécimale identique pour deux DataFrames de même contenu
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def bytes_fingerprint(content):
+    """Empreinte du contenu d'un fichier (octets), par exemple un CSV chargé."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def estimate_nbytes(value):
+    """Estime la mémoire occupée par une valeur mise en cache."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """
+    Cache commun à toutes les sessions d'un processus, borné en octets, avec comptage des références.
+
+    Chaque valeur est identifiée par une clé de contenu: des sessions qui travaillent sur les
+    mêmes données avec les mêmes paramètres reçoivent le même objet. Une session tient ses
+    valeurs par un bail (voir lease); une valeur tenue par au moins un bail n'est jamais évincée.
+    Au-delà de max_bytes, les valeurs qui ne sont plus tenues sont évincées de la moins à la plus
+    récemment utilisée.
+
+    Les valeurs partagées ne doivent pas être modifiées en place.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # clé -> [valeur, taille, identifiants des baux qui la tiennent]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Un verrou par clé en cours de calcul: une seule session calcule, les autres attendent
+        self._computing = {}
+        self._next_lease_id = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def lease(self):
+        """Crée un bail pour une session; ses valeurs sont libérées quand le bail disparaît."""
+        with self._lock:
+            self._next_lease_id += 1
+            return CacheLease(self, self._next_lease_id)
+
+    def _get(self, key, lease_id):
+        # À appeler sous self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        entry[2].add(lease_id)
+        return entry
+
+    def _put(self, key, value, nbytes, lease_id):
+        # À appeler sous self._lock; une valeur déjà présente pour la clé est conservée
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [value, nbytes, set()]
+            self.current_bytes += nbytes
+        self._entries.move_to_end(key)
+        entry[2].add(lease_id)
+        self._evict()
+        return entry[0]
+
+    def _release(self, key, lease_id):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2].discard(lease_id)
+                self._evict()
+
+    def _evict(self):
+        # Évince les valeurs non tenues, de la moins récemment utilisée à la plus récente
+        if self.current_bytes <= self.max_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if not entry[2]]:
+            _, nbytes, _ = self._entries.pop(key)
+            self.current_bytes -= nbytes
+            if self.current_bytes <= self.max_bytes:
+                break
+
+    def stats(self):
+        """
+        État du cache.
+
+        Returns:
+            Dictionnaire {'entries', 'held_entries', 'leases', 'memory_mb', 'held_memory_mb',
+            'max_mb', 'hits', 'misses'}
+        """
+        with self._lock:
+            held = [entry for entry in self._entries.values() if entry[2]]
+            return {
+                'entries': len(self._entries),
+                'held_entries': len(held),
+                'leases': len(set().union(*(entry[2] for entry in held))),
+                'memory_mb': self.current_bytes / 1e6,
+                'held_memory_mb': sum(entry[1] for entry in held) / 1e6,
+                'max_mb': self.max_bytes / 1e6,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class CacheLease:
+    """
+    Valeurs d'un SharedCache tenues par une session, une par rôle ('données', 'modèles'...).
+
+    Tenir une nouvelle valeur pour un rôle libère la précédente. Toutes les valeurs sont
+    libérées par release() ou quand le bail est détruit avec l'état de la session.
+    """
+
+    def __init__(self, cache, lease_id):
+        self._cache = cache
+        self._id = lease_id
+        self._held = {}
+        weakref.finalize(self, CacheLease._release_all, cache, lease_id, self._held)
+
+    @staticmethod
+    def _release_all(cache, lease_id, held):
+        for key in list(held.values()):
+            cache._release(key, lease_id)
+        held.clear()
+
+    def _hold(self, role, key):
+        previous = self._held.get(role)
+        self._held[role] = key
+        self._drop(previous)
+
+    def _drop(self, key):
+        # Libère une clé qui n'est plus tenue par aucun rôle de ce bail
+        if key is not None and key not in self._held.values():
+            self._cache._release(key, self._id)
+
+    def get(self, role, key, default=None):
+        """Valeur partagée de la clé, tenue pour ce rôle, ou default si elle n'est pas en cache."""
+        with self._cache._lock:
+            entry = self._cache._get(key, self._id)
+            if entry is None:
+                self._cache.misses += 1
+        if entry is None:
+            return default
+        self._hold(role, key)
+        return entry[0]
+
+    def put(self, role, key, value, nbytes=None):
+        """
+        Partage une valeur et la tient pour ce rôle.
+
+        Returns:
+            La valeur partagée: celle d'une autre session si la clé était déjà en cache
+        """
+        if nbytes is None:
+            nbytes = estimate_nbytes(value)
+        with self._cache._lock:
+            shared = self._cache._put(key, value, nbytes, self._id)
+        self._hold(role, key)
+        return shared
+
+    def get_or_compute(self, role, key, compute, nbytes=None):
+        """
+        Valeur partagée de la clé, calculée par compute() si aucune session ne l'a en cache.
+
+        Des sessions qui demandent la même clé en même temps attendent le premier calcul.
+
+        Args:
+            role: Rôle de la valeur dans la session
+            key: Clé de contenu (hachable)
+            compute: Fonction sans argument qui calcule la valeur
+            nbytes: Taille de la valeur, ou fonction valeur -> taille; estimée si None
+        """
+        cache = self._cache
+        with cache._lock:
+            entry = cache._get(key, self._id)
+            key_lock = None if entry is not None else cache._computing.setdefault(key, threading.Lock())
+        if entry is not None:
+            self._hold(role, key)
+            return entry[0]
+        with key_lock:
+            with cache._lock:
+                entry = cache._get(key, self._id)
+            if entry is not None:
+                self._hold(role, key)
+                return entry[0]
+            with cache._lock:
+                cache.misses += 1
+            try:
+                value = compute()
+                size = nbytes(value) if callable(nbytes) else nbytes
+                return self.put(role, key, value, size)
+            finally:
+                with cache._lock:
+                    cache._computing.pop(key, None)
+
+    def release(self, role=None):
+        """Libère la valeur d'un rôle, ou toutes les valeurs si role est None."""
+        if role is None:
+            CacheLease._release_all(self._cache, self._id, self._held)
+        else:
+            self._drop(self._held.pop(role, None))
@@ -0,0 +1,316 @@
+"""Préparation des données de forage, utilisable hors de Streamlit."""
+
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sklearn.utils import check_random_state
+
+# Probabilité de changer la catégorie d'un échantillon synthétique
+CATEGORY_SWAP_PROBABILITY = 0.3
+
+
+# Fonction pour l'augmentation des données
+def augment_data(df, num_augmented_samples=500, noise_level=0.1, categorical_variation=True,
+                 random_state=None):
+    """
+    Génère des données synthétiques en ajoutant du bruit aléatoire aux données existantes
+    et en variant les catégories pour les variables catégorielles.
+
+    Tous les tirages (indices de base, bruit gaussien, changements de catégorie) sont faits
+    en une fois sous forme de tableaux NumPy et le résultat est construit en une seule
+    allocation, ce qui permet de générer des centaines de milliers d'échantillons.
+
+    Args:
+        df: DataFrame contenant les données d'origine
+        num_augmented_samples: Nombre d'échantillons à générer
+        noise_level: Niveau de bruit à ajouter aux variables numériques (proportion de l'écart-type)
+        categorical_variation: Si True, varie les catégories pour les variables catégorielles
+        random_state: Graine ou RandomState; None utilise l'état global de np.random
+
+    Returns:
+        DataFrame avec les données d'origine et les données augmentées
+    """
+    rng = check_random_state(random_state)
+    n_original = len(df)
+
+    if num_augmented_samples <= 0 or n_original == 0:
+        return df.copy()
+
+    # Séparer les colonnes numériques et catégorielles
+    numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+
+    # Sélectionner les échantillons de base et construire le résultat en une seule copie
+    base_idx = rng.randint(0, n_original, size=num_augmented_samples)
+    rows = np.concatenate([np.arange(n_original), base_idx])
+    augmented_df = df.iloc[rows].reset_index(drop=True)
+
+    # Ajouter du bruit aux variables numériques (écart-type de chaque colonne * noise_level)
+    if numeric_cols:
+        std_devs = df[numeric_cols].std().to_numpy(dtype=np.float64)
+        values = augmented_df[numeric_cols].to_numpy(dtype=np.float64, copy=True)
+        noise = rng.normal(0.0, 1.0, size=(num_augmented_samples, len(numeric_cols)))
+        values[n_original:] += noise * (std_devs * noise_level)
+        # Les colonnes décimales gardent leur type (un jeu compact en float32 le reste)
+        dtypes = {col: df[col].dtype if pd.api.types.is_float_dtype(df[col].dtype) else np.float64
+                  for col in numeric_cols}
+        augmented_df[numeric_cols] = values
+        augmented_df = augmented_df.astype(dtypes)
+
+    # Varier les catégories pour les variables catégorielles
+    if categorical_variation and categorical_cols:
+        for col in categorical_cols:
+            unique_values = df[col].unique()
+            swap = np.flatnonzero(rng.random_sample(num_augmented_samples) < CATEGORY_SWAP_PROBABILITY)
+            if len(swap) == 0:
+                continue
+            new_values = unique_values[rng.randint(0, len(unique_values), size=len(swap))]
+            augmented_df.iloc[n_original + swap, augmented_df.columns.get_loc(col)] = new_values
+
+    return augmented_df
+
+
+# Colonnes attendues par l'application
+NUMERIC_FEATURES = ['profondeur_finale', 'azimuth_initial', 'inclinaison_initiale', 'vitesse_rotation']
+CATEGORICAL_FEATURES = ['lithologie', 'company']
+TARGETS = ['deviation_azimuth', 'deviation_inclinaison']
+
+# Proportion maximale de valeurs distinctes pour convertir une colonne de texte en catégories
+CATEGORY_MAX_RATIO = 0.5
+
+# Valeur du mappage pour une colonne absente du CSV
+NOT_AVAILABLE = 'Non disponible'
+
+# Valeurs par défaut des colonnes facultatives non mappées
+OPTIONAL_DEFAULTS = {
+    'lithologie': 'Inconnu',
+    'company': 'Non spécifiée'
+}
+
+
+def _default_column(target, n_rows):
+    # Colonne facultative absente: une seule catégorie, sans chaîne répétée
+    return pd.Categorical.from_codes(np.zeros(n_rows, dtype=np.int8), categories=[OPTIONAL_DEFAULTS[target]])
+
+
+def _missing_required(column_mapping):
+    missing = [target for target, source in column_mapping.items()
+               if source == NOT_AVAILABLE and target not in OPTIONAL_DEFAULTS]
+    if missing:
+        raise ValueError(f"Colonnes obligatoires non mappées: {', '.join(missing)}")
+
+
+def compact_dataset(df):
+    """
+    Représentation compacte d'un DataFrame: float32 pour les colonnes décimales et 'category'
+    pour les colonnes de texte (lithologie, entreprise et toute colonne peu variée).
+
+    Les colonnes déjà compactes ne sont pas copiées. float32 garde environ 7 chiffres
+    significatifs, largement assez pour des profondeurs, des angles et des vitesses.
+
+    Args:
+        df: DataFrame à convertir
+
+    Returns:
+        DataFrame de mêmes colonnes et même index
+    """
+    columns = {}
+    for col, series in df.items():
+        if pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32:
+            series = series.astype(np.float32)
+        elif pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+            # Une colonne de texte presque unique (identifiant) coûterait plus cher en catégories
+            if col in CATEGORICAL_FEATURES or series.nunique() <= CATEGORY_MAX_RATIO * len(series):
+                series = series.astype('category')
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def map_columns(raw_df, column_mapping):
+    """
+    Renomme les colonnes d'un DataFrame déjà chargé selon le mappage, sans recopier les données.
+
+    Les colonnes mappées sont des vues des colonnes de raw_df (qui devrait déjà être compact,
+    voir compact_dataset); seules les colonnes encore en float64 ou en texte sont converties.
+
+    Args:
+        raw_df: DataFrame lu depuis le CSV
+        column_mapping: Dictionnaire {colonne attendue: colonne du CSV ou NOT_AVAILABLE}
+
+    Returns:
+        DataFrame compact avec les colonnes attendues, dans l'ordre du mappage
+    """
+    _missing_required(column_mapping)
+    columns = {
+        target: _default_column(target, len(raw_df)) if source == NOT_AVAILABLE else raw_df[source]
+        for target, source in column_mapping.items()
+    }
+    return compact_dataset(pd.DataFrame(columns, index=raw_df.index, copy=False))
+
+
+def read_csv_preview(file, nrows=100):
+    """
+    Lit uniquement les premières lignes d'un CSV pour afficher l'aperçu et proposer le mappage.
+
+    Args:
+        file: Chemin ou fichier ouvert (remis au début après lecture)
+        nrows: Nombre de lignes à lire
+
+    Returns:
+        DataFrame contenant les premières lignes du fichier
+    """
+    preview = pd.read_csv(file, nrows=nrows)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return preview
+
+
+def load_mapped_csv(file, column_mapping, chunksize=250_000):
+    """
+    Lit un CSV par blocs en ne conservant que les colonnes mappées, avec des types compacts:
+    'category' pour la lithologie et l'entreprise, float32 pour les colonnes numériques.
+
+    Args:
+        file: Chemin ou fichier ouvert
+        column_mapping: Dictionnaire {colonne attendue: colonne du CSV ou NOT_AVAILABLE}
+        chunksize: Nombre de lignes lues par bloc
+
+    Returns:
+        Tuple (DataFrame mappé, statistiques de lecture: lignes, durée, lignes/s, pic mémoire en Mo)
+    """
+    _missing_required(column_mapping)
+    sources = {target: source for target, source in column_mapping.items() if source != NOT_AVAILABLE}
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    dtypes = {
+        source: 'category' if target in CATEGORICAL_FEATURES else np.float32
+        for target, source in sources.items()
+    }
+
+    # Mesurer le pic mémoire de la lecture sans perturber un suivi déjà actif
+    already_tracing = tracemalloc.is_tracing()
+    if already_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        chunks = list(pd.read_csv(file, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize))
+        n_rows = sum(len(chunk) for chunk in chunks)
+
+        columns = {}
+        for target in column_mapping:
+            source = sources.get(target)
+            if source is None:
+                columns[target] = _default_column(target, n_rows)
+            elif target in CATEGORICAL_FEATURES:
+                columns[target] = union_categoricals([chunk[source] for chunk in chunks])
+            else:
+                columns[target] = np.concatenate([chunk[source].to_numpy() for chunk in chunks])
+        del chunks
+
+        mapped_df = pd.DataFrame(columns)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+
+    stats = {
+        'rows': n_rows,
+        'seconds': elapsed,
+        'rows_per_second': n_rows / elapsed if elapsed > 0 else float('inf'),
+        'peak_memory_mb': peak / 1e6
+    }
+    return mapped_df, stats
+
+
+# Catégories du jeu de démonstration
+LITHOLOGIES = ['Granite', 'Schiste', 'Gneiss', 'Calcaire', 'Basalte']
+COMPANIES = ['ForageTech', 'MineXpert', 'DrillPro', 'GeoForage', 'TerraDrill']
+
+# Effet de la lithologie et de l'entreprise sur (déviation d'azimuth, déviation d'inclinaison)
+LITHOLOGY_EFFECTS = {
+    'Granite': (2.0, 1.0),
+    'Schiste': (-1.5, 3.0),
+    'Gneiss': (0.5, -2.0),
+    'Calcaire': (-1.0, -1.5),
+    'Basalte': (3.0, 2.5)
+}
+COMPANY_EFFECTS = {
+    'ForageTech': (1.5, 0.8),
+    'MineXpert': (-1.0, -0.5),
+    'DrillPro': (0.0, 2.0),
+    'GeoForage': (-2.0, -1.0),
+    'TerraDrill': (2.5, 1.5)
+}
+
+
+def generate_demo_data(n_samples=1000, seed=42):
+    """
+    Crée un jeu de données synthétique de forages pour la démonstration et les tests de charge.
+
+    Les effets de la lithologie et de l'entreprise sont appliqués par indexation de tableaux,
+    ce qui permet de générer plusieurs millions de lignes. Pour une même graine, les valeurs
+    sont identiques à celles de l'ancienne génération ligne par ligne.
+
+    Args:
+        n_samples: Nombre de forages à générer
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        DataFrame avec les colonnes attendues par l'application
+    """
+    rng = np.random.RandomState(seed)
+
+    prof_finale = rng.uniform(100, 1000, n_samples)
+    azimuth_initial = rng.uniform(0, 360, n_samples)
+    inclinaison_initiale = rng.uniform(-90, 0, n_samples)
+    vitesse_rotation = rng.uniform(50, 200, n_samples)
+
+    # Codes des catégories (mêmes tirages que np.random.choice sur les listes)
+    lithology_codes = rng.choice(len(LITHOLOGIES), n_samples)
+    company_codes = rng.choice(len(COMPANIES), n_samples)
+
+    # Créer une relation entre les entrées et les déviations (simplifiée)
+    azimuth_deviation = (
+        0.05 * prof_finale
+        + 0.02 * azimuth_initial
+        + 0.1 * inclinaison_initiale
+        + 0.03 * vitesse_rotation
+        + rng.normal(0, 10, n_samples)
+    )
+
+    inclinaison_deviation = (
+        0.03 * prof_finale
+        - 0.01 * azimuth_initial
+        + 0.05 * inclinaison_initiale
+        + 0.02 * vitesse_rotation
+        + rng.normal(0, 5, n_samples)
+    )
+
+    # Ajouter les effets de la lithologie puis de l'entreprise
+    lithology_effects = np.array([LITHOLOGY_EFFECTS[name] for name in LITHOLOGIES])
+    company_effects = np.array([COMPANY_EFFECTS[name] for name in COMPANIES])
+
+    azimuth_deviation += lithology_effects[lithology_codes, 0]
+    inclinaison_deviation += lithology_effects[lithology_codes, 1]
+    azimuth_deviation += company_effects[company_codes, 0]
+    inclinaison_deviation += company_effects[company_codes, 1]
+
+    return pd.DataFrame({
+        'profondeur_finale': prof_finale,
+        'azimuth_initial': azimuth_initial,
+        'inclinaison_initiale': inclinaison_initiale,
+        'lithologie': pd.Categorical.from_codes(lithology_codes, categories=LITHOLOGIES),
+        'vitesse_rotation': vitesse_rotation,
+        'company': pd.Categorical.from_codes(company_codes, categories=COMPANIES),
+        'deviation_azimuth': azimuth_deviation,
+        'deviation_inclinaison': inclinaison_deviation
+    })
@@ -0,0 +1,286 @@
+"""
+Export des pipelines entraînés vers un artefact d'inférence NumPy (voir deviation_inference).
+
+Chaque étape est réduite à ses tableaux: moyennes et échelles du StandardScaler, catégories
+des encodeurs, coefficients des régressions, poids du réseau de neurones, vecteurs de support
+du SVR et nœuds des arbres (forêt et gradient boosting) mis bout à bout.
+
+Utilisation:
+    python deviation_export.py --models model_store/<clé>.joblib --output modeles.npz
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.neural_network import MLPRegressor
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+from sklearn.svm import SVR
+
+from deviation_inference import ARTIFACT_FORMAT, ARTIFACT_VERSION, load_compiled_models
+
+
+def _transformer_steps(transformer):
+    # Dernière étape d'un transformateur simple ou d'un Pipeline d'une seule étape
+    if hasattr(transformer, 'steps'):
+        if len(transformer.steps) != 1:
+            raise ValueError("Seuls les pipelines de prétraitement d'une étape sont exportables")
+        return transformer.steps[0][1]
+    return transformer
+
+
+def _is_passthrough(transformer):
+    # Une fois ajusté, ColumnTransformer remplace 'passthrough' par un FunctionTransformer identité
+    return transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer) and transformer.func is None)
+
+
+def _export_preprocessor(preprocessor):
+    if not isinstance(preprocessor, ColumnTransformer):
+        raise ValueError("Le préprocesseur doit être un ColumnTransformer")
+    transformers = {name: (transformer, columns) for name, transformer, columns in preprocessor.transformers_}
+    if set(transformers) - {'num', 'cat', 'remainder'} or transformers.get('remainder', ('drop',))[0] != 'drop':
+        raise ValueError("Préprocesseur non exportable: colonnes 'num' et 'cat' attendues")
+    numeric, numeric_columns = transformers['num']
+    encoder, categorical_columns = transformers['cat']
+    numeric = _transformer_steps(numeric)
+    encoder = _transformer_steps(encoder)
+
+    arrays = {
+        f'categories_{i}': np.array([str(category) for category in categories])
+        for i, categories in enumerate(encoder.categories_)
+    }
+    if isinstance(numeric, StandardScaler) and isinstance(encoder, OneHotEncoder):
+        if encoder.drop is not None or encoder.handle_unknown != 'ignore':
+            raise ValueError("OneHotEncoder exportable seulement sans drop et avec handle_unknown='ignore'")
+        kind = 'standard'
+        arrays['mean'] = numeric.mean_ if numeric.with_mean else np.zeros(len(numeric_columns))
+        arrays['scale'] = numeric.scale_ if numeric.with_std else np.ones(len(numeric_columns))
+    elif _is_passthrough(numeric) and isinstance(encoder, OrdinalEncoder):
+        if not (encoder.handle_unknown == 'use_encoded_value' and np.isnan(encoder.unknown_value)):
+            raise ValueError("OrdinalEncoder exportable seulement avec unknown_value=np.nan")
+        kind = 'natif'
+    else:
+        raise ValueError("Combinaison de prétraitement non exportable")
+    spec = {'kind': kind, 'numeric': list(numeric_columns), 'categorical': list(categorical_columns)}
+    return spec, arrays
+
+
+def _forest_arrays(forest):
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    roots = np.concatenate([[0], np.cumsum([tree.node_count for tree in trees])[:-1]])
+    left = np.concatenate([np.where(tree.children_left >= 0, tree.children_left + root, -1)
+                           for tree, root in zip(trees, roots)])
+    feature = np.concatenate([tree.feature for tree in trees]).astype(np.int32)
+    feature[left < 0] = -1
+    # scikit-learn compare les entrées converties en float32 à des seuils float64: le seuil
+    # float32 immédiatement inférieur donne exactement les mêmes branchements
+    threshold = np.concatenate([tree.threshold for tree in trees])
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32.astype(np.float64) > threshold
+    threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+    return {
+        'roots': roots.astype(np.int64),
+        'feature': feature,
+        'threshold': threshold32,
+        'left': left.astype(np.int64),
+        'right': np.concatenate([np.where(tree.children_right >= 0, tree.children_right + root, -1)
+                                 for tree, root in zip(trees, roots)]).astype(np.int64),
+        'missing_left': np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool),
+        'value': np.concatenate([tree.value[:, :, 0] for tree in trees])
+    }
+
+
+def _recode_bitsets(bitsets, values):
+    # Réécrit des ensembles de codes internes (bit c pour le code c) avec les valeurs d'origine:
+    # le bit values[c] est levé à la place du bit c
+    codes = np.arange(len(values))
+    members = (bitsets[:, codes >> 5] >> (codes & 31).astype(np.uint32)) & 1
+    recoded = np.zeros_like(bitsets)
+    rows, positions = np.nonzero(members)
+    targets = values[positions]
+    np.bitwise_or.at(recoded, (rows, targets >> 5), (np.uint32(1) << (targets & 31).astype(np.uint32)))
+    return recoded
+
+
+def _boosting_arrays(booster):
+    if booster._loss.link.__class__.__name__ != 'IdentityLink' or booster.n_trees_per_iteration_ != 1:
+        raise ValueError("Gradient boosting exportable seulement pour une régression à lien identité")
+    predictors = [predictors[0] for predictors in booster._predictors]
+    sizes = [len(predictor.nodes) for predictor in predictors]
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    nodes = np.concatenate([predictor.nodes for predictor in predictors])
+    node_roots = np.repeat(roots, sizes)
+    bitset_sizes = [len(predictor.raw_left_cat_bitsets) for predictor in predictors]
+    bitset_roots = np.repeat(np.concatenate([[0], np.cumsum(bitset_sizes)[:-1]]), sizes)
+
+    is_leaf = nodes['is_leaf'].astype(bool)
+    feature = np.where(is_leaf, -1, nodes['feature_idx']).astype(np.int32)
+    arrays = {
+        'roots': roots,
+        'feature': feature,
+        'threshold': nodes['num_threshold'].astype(np.float64),
+        'left': np.where(is_leaf, -1, nodes['left'].astype(np.int64) + node_roots),
+        'right': np.where(is_leaf, -1, nodes['right'].astype(np.int64) + node_roots),
+        'missing_left': nodes['missing_go_to_left'].astype(bool),
+        'value': nodes['value'].astype(np.float64)[:, np.newaxis],
+        'baseline': np.asarray(booster._baseline_prediction, dtype=np.float64).ravel()
+    }
+    if booster._preprocessor is None:
+        return arrays
+
+    # Avec des catégories, le modèle réordonne ses entrées (catégorielles puis numériques) et
+    # recode chaque catégorie par son rang parmi les valeurs vues à l'entraînement. Les nœuds
+    # sont ramenés aux colonnes et aux codes reçus par le modèle.
+    original = np.concatenate([np.flatnonzero(booster.is_categorical_), np.flatnonzero(~booster.is_categorical_)])
+    arrays['feature'] = np.where(is_leaf, -1, original[np.maximum(feature, 0)]).astype(np.int32)
+    is_categorical = nodes['is_categorical'].astype(bool) & ~is_leaf
+    bitset_idx = nodes['bitset_idx'].astype(np.int64) + bitset_roots
+    bitsets = np.concatenate([predictor.raw_left_cat_bitsets for predictor in predictors])
+    known_bitsets, f_idx_map = booster._bin_mapper.make_known_categories_bitsets()
+    encoder = booster._preprocessor.named_transformers_['encoder']
+    recoded_bitsets = np.zeros_like(bitsets)
+    recoded_known = np.zeros((booster.n_features_in_, bitsets.shape[1]), dtype=bitsets.dtype)
+    for internal, categories in enumerate(encoder.categories_):
+        values = categories[~np.isnan(categories)]
+        if len(values) and (values.min() < 0 or values.max() >= 32 * bitsets.shape[1] or np.any(values % 1)):
+            raise ValueError("Gradient boosting exportable seulement avec des catégories codées par des entiers")
+        values = values.astype(np.intp)
+        rows = bitset_idx[is_categorical & (feature == internal)]
+        recoded_bitsets[rows] = _recode_bitsets(bitsets[rows], values)
+        recoded_known[original[internal]] = _recode_bitsets(known_bitsets[[f_idx_map[internal]]], values)[0]
+    arrays['is_categorical'] = is_categorical
+    arrays['bitset_idx'] = bitset_idx
+    arrays['bitsets'] = recoded_bitsets
+    # Ensemble des modalités connues, indexé directement par la colonne d'entrée
+    arrays['known_bitsets'] = recoded_known
+    return arrays
+
+
+def _export_regressor(regressor):
+    # Liste de (spécification, tableaux): un élément par régresseur d'un MultiOutputRegressor
+    if isinstance(regressor, MultiOutputRegressor):
+        return [exported for estimator in regressor.estimators_ for exported in _export_regressor(estimator)]
+    if isinstance(regressor, (LinearRegression, SGDRegressor)):
+        coef = np.atleast_2d(regressor.coef_).astype(np.float64)
+        return [({'type': 'linear'}, {'coef': coef, 'intercept': np.atleast_1d(regressor.intercept_).astype(np.float64)})]
+    if isinstance(regressor, MLPRegressor):
+        arrays = {}
+        for layer, (weights, bias) in enumerate(zip(regressor.coefs_, regressor.intercepts_)):
+            arrays[f'weights_{layer}'] = weights.astype(np.float64)
+            arrays[f'bias_{layer}'] = bias.astype(np.float64)
+        if regressor.out_activation_ != 'identity':
+            raise ValueError("Réseau de neurones exportable seulement avec une sortie linéaire")
+        return [({'type': 'mlp', 'activation': regressor.activation, 'n_layers': len(regressor.coefs_)}, arrays)]
+    if isinstance(regressor, SVR):
+        if regressor.kernel != 'rbf':
+            raise ValueError("SVR exportable seulement avec un noyau RBF")
+        return [({'type': 'svr', 'gamma': float(regressor._gamma)}, {
+            'support_vectors': np.asarray(regressor.support_vectors_, dtype=np.float64),
+            'dual_coef': regressor.dual_coef_.ravel().astype(np.float64),
+            'intercept': regressor.intercept_.astype(np.float64)
+        })]
+    if isinstance(regressor, RandomForestRegressor):
+        return [({'type': 'trees', 'reduce': 'mean'}, _forest_arrays(regressor))]
+    if isinstance(regressor, HistGradientBoostingRegressor):
+        return [({'type': 'trees', 'reduce': 'sum'}, _boosting_arrays(regressor))]
+    raise ValueError(f"Régresseur non exportable: {type(regressor).__name__}")
+
+
+def export_models(models, path=None):
+    """
+    Convertit un dictionnaire de pipelines (voir fit_models) en artefact d'inférence NumPy.
+
+    Args:
+        models: Dictionnaire {cible ou tuple de cibles: pipeline entraîné}
+        path: Fichier .npz à écrire (renommé atomiquement); None renvoie le contenu en octets
+
+    Returns:
+        Chemin du fichier écrit, ou contenu du fichier si path est None
+    """
+    meta = {'format': ARTIFACT_FORMAT, 'version': ARTIFACT_VERSION, 'models': []}
+    arrays = {}
+    for i, (targets, model) in enumerate(models.items()):
+        preprocessor_spec, preprocessor_arrays = _export_preprocessor(model.named_steps['preprocessor'])
+        regressors = _export_regressor(model.named_steps['regressor'])
+        meta['models'].append({
+            'targets': list(targets) if isinstance(targets, tuple) else [targets],
+            'preprocessor': preprocessor_spec,
+            'regressors': [spec for spec, _ in regressors]
+        })
+        arrays.update({f"m{i}.pre.{name}": array for name, array in preprocessor_arrays.items()})
+        for j, (_, regressor_arrays) in enumerate(regressors):
+            arrays.update({f"m{i}.r{j}.{name}": array for name, array in regressor_arrays.items()})
+    arrays['__meta__'] = np.array(json.dumps(meta, ensure_ascii=False))
+
+    if path is None:
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+    os.close(fd)
+    try:
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export des modèles de déviation vers un artefact d'inférence NumPy")
+    parser.add_argument('--models', required=True, help="Fichier .joblib du stockage des modèles")
+    parser.add_argument('--output', required=True, help="Fichier .npz à écrire")
+    parser.add_argument('--check', help="CSV de forages pour comparer les prédictions aux pipelines")
+    parser.add_argument('--batch-factor', type=int, default=20,
+                        help="Avec --check, prédit aussi le CSV répété ce nombre de fois en un seul lot")
+    args = parser.parse_args()
+
+    models = joblib.load(args.models)
+    export_models(models, args.output)
+    start = time.perf_counter()
+    compiled = load_compiled_models(args.output)
+    print(f"Artefact écrit dans {args.output} ({os.path.getsize(args.output) / 1e6:.1f} Mo, "
+          f"chargé en {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    if args.check:
+        import pandas as pd
+        from deviation_model import predict
+
+        holes = pd.read_csv(args.check, dtype={'lithologie': 'category', 'company': 'category'})
+        start = time.perf_counter()
+        expected = predict(models, holes)
+        pipeline_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        predictions = compiled.predict(holes)
+        compiled_seconds = time.perf_counter() - start
+        for target, values in predictions.items():
+            error = np.max(np.abs(values - expected[target].to_numpy()))
+            print(f"{target}: écart maximal {error:.2e}")
+        print(f"{len(holes):,} forages: pipelines {pipeline_seconds * 1000:.1f} ms, "
+              f"artefact {compiled_seconds * 1000:.1f} ms")
+
+        # Un grand lot doit donner les mêmes prédictions sans que la mémoire croisse avec lui
+        if args.batch_factor > 1:
+            batch = pd.concat([holes] * args.batch_factor, ignore_index=True)
+            start = time.perf_counter()
+            batch_predictions = compiled.predict(batch)
+            batch_seconds = time.perf_counter() - start
+            error = max(np.max(np.abs(batch_predictions[target] - np.tile(values, args.batch_factor)))
+                        for target, values in predictions.items())
+            print(f"Lot de {len(batch):,} forages: artefact {batch_seconds * 1000:.1f} ms, "
+                  f"écart maximal avec le petit lot {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+Évaluation des modèles exportés par deviation_export, avec NumPy seulement.
+
+L'artefact est un fichier .npz sans objet Python sérialisé: une description JSON et les
+tableaux de chaque étape (moyennes et échelles de standardisation, tables des catégories,
+coefficients, poids du réseau, nœuds des arbres mis bout à bout). Le charger ne demande ni
+scikit-learn ni pandas, et un lot de forages est prédit par opérations sur des tableaux.
+
+Le parcours NumPy des arbres reste plus lent que le code compilé de scikit-learn sur un grand
+lot. Quand les pipelines d'origine sont disponibles, load_compiled_models(path, models) évalue
+les lots de forêts et de gradient boosting par le predict de leur régresseur, sur le
+prétraitement de l'artefact.
+
+Utilisation:
+    models = load_compiled_models('modeles.npz')
+    predictions = models.predict({'profondeur_finale': [...], 'lithologie': [...], ...})
+"""
+
+import json
+
+import numpy as np
+
+# Version du format des artefacts
+ARTIFACT_FORMAT = 'deviation-inference'
+ARTIFACT_VERSION = 1
+
+# Nombre maximal de couples (arbre, ligne) et de lignes parcourus à la fois
+TREE_BATCH_ELEMENTS = 65_536
+TREE_BATCH_ROWS = 16_384
+
+# Nombre maximal de termes du noyau SVR calculés à la fois (32 Mo en float64)
+KERNEL_BATCH_ELEMENTS = 4_000_000
+
+# Lignes à partir desquelles un régresseur à arbres fourni remplace le parcours NumPy: plus
+# rapide sur un lot, il coûte plusieurs millisecondes d'appel pour un forage seul
+TREE_FALLBACK_ROWS = 1000
+
+# Niveaux descendus entre deux recherches des couples arrivés à une feuille
+TREE_LEVELS_PER_CHECK = 4
+
+_ACTIVATIONS = {
+    'identity': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'tanh': lambda x: np.tanh(x, out=x),
+    'logistic': lambda x: np.divide(1.0, 1.0 + np.exp(-x), out=x)
+}
+
+
+def _category_codes(values, categories):
+    # Indice de chaque valeur dans categories, -1 pour une modalité inconnue
+    values = np.asarray(values).astype(str)
+    order = np.argsort(categories)
+    sorted_categories = categories[order]
+    positions = np.clip(np.searchsorted(sorted_categories, values), 0, len(categories) - 1)
+    return np.where(sorted_categories[positions] == values, order[positions], -1)
+
+
+def _transform(preprocessor, arrays, columns):
+    # Matrice des variables, dans l'ordre du ColumnTransformer: numériques puis catégorielles
+    values = [np.asarray(columns[name]) for name in preprocessor['numeric']]
+    # Même précision que scikit-learn: des colonnes float32 restent en float32
+    dtype = np.result_type(np.float32, *[column.dtype for column in values])
+    numeric = np.column_stack(values).astype(dtype, copy=False)
+    parts = [numeric]
+    if preprocessor['kind'] == 'standard':
+        parts[0] = (numeric - arrays['mean'].astype(dtype)) / arrays['scale'].astype(dtype)
+        for i, name in enumerate(preprocessor['categorical']):
+            codes = _category_codes(columns[name], arrays[f'categories_{i}'])
+            # Modalité inconnue: ligne de zéros, comme OneHotEncoder(handle_unknown='ignore')
+            parts.append((codes[:, np.newaxis] == np.arange(len(arrays[f'categories_{i}']))).astype(np.float64))
+    else:
+        for i, name in enumerate(preprocessor['categorical']):
+            codes = _category_codes(columns[name], arrays[f'categories_{i}']).astype(np.float64)
+            codes[codes < 0] = np.nan
+            parts.append(codes[:, np.newaxis])
+    return np.hstack(parts)
+
+
+def _prepare_trees(arrays):
+    # Tableaux dérivés pour le parcours. Un nœud i est repéré par 2i: ses enfants gauche et
+    # droit sont children[2i] et children[2i + 1]. Les feuilles bouclent sur elles-mêmes, ce
+    # qui permet de descendre plusieurs niveaux sans tester les feuilles.
+    feature = arrays['feature']
+    is_leaf = feature < 0
+    nodes = 2 * np.arange(len(feature))
+    children = np.empty(2 * len(feature), dtype=np.intp)
+    children[0::2] = np.where(is_leaf, nodes, 2 * arrays['left'])
+    children[1::2] = np.where(is_leaf, nodes, 2 * arrays['right'])
+    arrays['node_feature'] = np.repeat(np.where(is_leaf, 0, feature).astype(np.intp), 2)
+    arrays['node_threshold'] = np.repeat(arrays['threshold'], 2)
+    arrays['node_is_leaf'] = np.repeat(is_leaf, 2)
+    arrays['children'] = children
+    return arrays
+
+
+def _fix_branches(arrays, nodes, values, go_right):
+    # Valeurs manquantes et nœuds catégoriels (gradient boosting): corrige go_right en place
+    nodes = nodes >> 1
+    if 'is_categorical' in arrays:
+        on_category = np.flatnonzero(arrays['is_categorical'].take(nodes))
+        if on_category.size:
+            # Catégories: gauche si la modalité est dans l'ensemble du nœud, droite si elle est
+            # connue, sinon traitée comme une valeur manquante (comme scikit-learn)
+            category_nodes, category_values = nodes[on_category], values[on_category]
+            known_value = ~np.isnan(category_values)
+            codes = np.where(known_value, category_values, 0).astype(np.intp)
+            words, bits = codes >> 5, (codes & 31).astype(np.uint32)
+            in_left = ((arrays['bitsets'][arrays['bitset_idx'].take(category_nodes), words] >> bits) & 1).astype(bool)
+            known = ((arrays['known_bitsets'][arrays['feature'].take(category_nodes), words] >> bits) & 1).astype(bool)
+            known &= known_value
+            go_right[on_category] = np.where(
+                in_left & known_value, False,
+                np.where(known, True, ~arrays['missing_left'].take(category_nodes))
+            )
+            values = values.copy()
+            values[on_category] = 0
+    missing = np.flatnonzero(np.isnan(values))
+    if missing.size:
+        go_right[missing] = ~arrays['missing_left'].take(nodes[missing])
+
+
+def _tree_leaves(arrays, X, roots):
+    # Feuille atteinte par chaque ligne de X (contiguë, au type des seuils) dans chacun des arbres
+    # de roots, de forme (arbres, lignes). Tous les couples (arbre, ligne) descendent d'un niveau
+    # à chaque étape; ceux arrivés à une feuille sortent du lot dès qu'ils en forment un quart.
+    node_feature, node_threshold = arrays['node_feature'], arrays['node_threshold']
+    children, node_is_leaf = arrays['children'], arrays['node_is_leaf']
+    n_rows, n_features = X.shape
+    flat_X = X.ravel()
+    exact = 'is_categorical' not in arrays and not np.isnan(flat_X).any()
+
+    leaves = np.repeat(2 * roots, n_rows)
+    offsets = np.tile(np.arange(n_rows) * n_features, len(roots))
+    active = None
+    current = leaves
+    while True:
+        for _ in range(TREE_LEVELS_PER_CHECK):
+            values = flat_X.take(offsets + node_feature.take(current))
+            go_right = values > node_threshold.take(current)
+            if not exact:
+                _fix_branches(arrays, current, values, go_right)
+            current = children.take(current + go_right)
+        done = node_is_leaf.take(current)
+        n_done = np.count_nonzero(done)
+        if n_done == len(current) or n_done * 4 >= len(current):
+            if active is None:
+                leaves = current.copy()
+                active = np.arange(len(current))
+            else:
+                leaves[active] = current
+            if n_done == len(current):
+                return (leaves >> 1).reshape(len(roots), n_rows)
+            remaining = np.flatnonzero(~done)
+            active, offsets, current = active[remaining], offsets[remaining], current[remaining]
+
+
+def _predict_trees(spec, arrays, X):
+    # Lots d'au plus TREE_BATCH_ROWS lignes et TREE_BATCH_ELEMENTS couples (arbre, ligne): peu
+    # de lignes passent dans tous les arbres à la fois, un grand lot par petits groupes d'arbres
+    roots = arrays['roots']
+    X = np.ascontiguousarray(X, dtype=arrays['threshold'].dtype)
+    n_rows = max(1, min(len(X), TREE_BATCH_ROWS))
+    n_trees = max(1, TREE_BATCH_ELEMENTS // n_rows)
+    outputs = []
+    for start in range(0, len(X), n_rows):
+        X_chunk = X[start:start + n_rows]
+        leaf_values = np.zeros((len(X_chunk), arrays['value'].shape[1]))
+        for first in range(0, len(roots), n_trees):
+            leaves = _tree_leaves(arrays, X_chunk, roots[first:first + n_trees])
+            leaf_values += arrays['value'][leaves].sum(axis=0)
+        if spec['reduce'] == 'mean':
+            outputs.append(leaf_values / len(roots))
+        else:
+            outputs.append(leaf_values + arrays['baseline'])
+    return np.concatenate(outputs)
+
+
+def _predict_svr(spec, arrays, X):
+    # Noyau RBF: exp(-gamma ||x - v||²), distances calculées par produits matriciels, par lots
+    # de lignes pour que la matrice (lignes, vecteurs de support) reste bornée
+    support = arrays['support_vectors']
+    support_norms = np.square(support).sum(axis=1)
+    n_rows = max(1, KERNEL_BATCH_ELEMENTS // max(1, len(support)))
+    outputs = []
+    for start in range(0, len(X), n_rows):
+        X_chunk = X[start:start + n_rows]
+        distances = np.square(X_chunk).sum(axis=1)[:, np.newaxis] - 2 * X_chunk @ support.T
+        distances += support_norms
+        kernel = np.exp(-spec['gamma'] * np.maximum(distances, 0, out=distances), out=distances)
+        outputs.append(kernel @ arrays['dual_coef'] + arrays['intercept'])
+    return np.concatenate(outputs)[:, np.newaxis]
+
+
+def _predict_regressor(spec, arrays, X):
+    # Prédictions de forme (lignes, sorties)
+    kind = spec['type']
+    if kind == 'linear':
+        return X @ arrays['coef'].T + arrays['intercept']
+    if kind == 'mlp':
+        activation = _ACTIVATIONS[spec['activation']]
+        hidden = X
+        for layer in range(spec['n_layers']):
+            hidden = hidden @ arrays[f'weights_{layer}'] + arrays[f'bias_{layer}']
+            if layer < spec['n_layers'] - 1:
+                hidden = activation(hidden)
+        return hidden
+    if kind == 'svr':
+        return _predict_svr(spec, arrays, X)
+    if kind == 'trees':
+        return _predict_trees(spec, arrays, X)
+    raise ValueError(f"Type de régresseur inconnu dans l'artefact: {kind}")
+
+
+class CompiledModels:
+    """
+    Modèles exportés, prêts à prédire sans scikit-learn.
+
+    Chaque modèle regroupe un préprocesseur et un ou plusieurs régresseurs (un par cible
+    pour un modèle multi-sorties construit cible par cible). Un modèle à arbres dont le
+    pipeline d'origine est fourni est évalué par le régresseur scikit-learn.
+    """
+
+    def __init__(self, meta, arrays, models=None):
+        if meta.get('format') != ARTIFACT_FORMAT or meta.get('version') != ARTIFACT_VERSION:
+            raise ValueError("Fichier d'inférence non reconnu ou de version incompatible")
+        self.meta = meta
+        self._models = []
+        for i, model in enumerate(meta['models']):
+            prefix = f"m{i}."
+            preprocessor_arrays = {
+                name[len(prefix) + 4:]: array for name, array in arrays.items()
+                if name.startswith(prefix + 'pre.')
+            }
+            regressors = []
+            for j, spec in enumerate(model['regressors']):
+                regressor_prefix = f"{prefix}r{j}."
+                regressor_arrays = {
+                    name[len(regressor_prefix):]: array for name, array in arrays.items()
+                    if name.startswith(regressor_prefix)
+                }
+                if spec['type'] == 'trees':
+                    regressor_arrays = _prepare_trees(regressor_arrays)
+                regressors.append((spec, regressor_arrays))
+            key = tuple(model['targets']) if len(model['targets']) > 1 else model['targets'][0]
+            fallback = None
+            if models is not None and key in models and all(spec['type'] == 'trees' for spec in model['regressors']):
+                fallback = models[key].named_steps['regressor']
+            self._models.append((model, preprocessor_arrays, regressors, fallback))
+
+    @property
+    def targets(self):
+        """Cibles prédites, dans l'ordre des modèles."""
+        return [target for model in self.meta['models'] for target in model['targets']]
+
+    @property
+    def features(self):
+        """Colonnes d'entrée nécessaires."""
+        names = []
+        for model, _, _, _ in self._models:
+            for name in model['preprocessor']['numeric'] + model['preprocessor']['categorical']:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def predict(self, columns):
+        """
+        Prédit toutes les cibles d'un lot de forages.
+
+        Args:
+            columns: Dictionnaire (ou DataFrame) {colonne: valeurs} contenant au moins features
+
+        Returns:
+            Dictionnaire {cible: tableau des prédictions}
+        """
+        missing = [name for name in self.features if name not in columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+        predictions = {}
+        for model, preprocessor_arrays, regressors, fallback in self._models:
+            X = _transform(model['preprocessor'], preprocessor_arrays, columns)
+            if fallback is not None and len(X) >= TREE_FALLBACK_ROWS:
+                outputs = fallback.predict(X).reshape(len(X), -1)
+            else:
+                outputs = np.hstack([_predict_regressor(spec, arrays, X) for spec, arrays in regressors])
+            for i, target in enumerate(model['targets']):
+                predictions[target] = outputs[:, i]
+        return predictions
+
+
+def load_compiled_models(path, models=None):
+    """
+    Charge un artefact d'inférence (.npz écrit par deviation_export.export_models).
+
+    Args:
+        path: Fichier .npz ou objet fichier
+        models: Pipelines exportés (facultatif, demande scikit-learn): les forêts et le gradient
+            boosting sont alors évalués par leur régresseur, plus rapide sur un grand lot
+
+    Returns:
+        CompiledModels
+    """
+    with np.load(path, allow_pickle=False) as artifact:
+        meta = json.loads(str(artifact['__meta__']))
+        arrays = {name: artifact[name] for name in artifact.files if name != '__meta__'}
+    return CompiledModels(meta, arrays, models)
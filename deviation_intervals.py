@@ -0,0 +1,227 @@
+"""
+Intervalles de prédiction des déviations, sans Streamlit.
+
+Pour la forêt aléatoire, l'intervalle est tiré de la dispersion des prédictions des arbres,
+obtenues en une passe (feuilles atteintes dans tous les arbres, puis lecture groupée de leurs
+valeurs). Cette dispersion traduit le désaccord entre arbres plus que le bruit de mesure: elle
+est élargie par un facteur calibré hors sac (calibrate_forest_intervals) pour couvrir la
+probabilité voulue. Pour le gradient boosting, deux modèles quantiles supplémentaires par cible
+donnent les bornes.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+from deviation_model import build_preprocessor, build_regressor, check_design
+from deviation_perf import timed
+
+# Probabilité couverte par les intervalles de prédiction
+INTERVAL_COVERAGE = 0.9
+
+# Options de modèle pour lesquelles des modèles quantiles peuvent être entraînés
+QUANTILE_OPTIONS = ["Gradient Boosting"]
+
+# Nombre de lignes traitées à la fois (tableaux de forme (lignes, arbres, sorties))
+TREE_CHUNK_SIZE = 10000
+
+# Nombre maximal de lignes d'entraînement tirées pour calibrer les intervalles des forêts
+CALIBRATION_ROWS = 5000
+
+
+def _leaf_values(forest):
+    # Valeurs des nœuds de tous les arbres mises bout à bout, et indice du premier nœud de chaque arbre
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    offsets = np.concatenate([[0], np.cumsum([tree.node_count for tree in trees])[:-1]])
+    return np.concatenate([tree.value[:, :, 0] for tree in trees]), offsets
+
+
+def tree_predictions(forest, X, chunk_size=TREE_CHUNK_SIZE):
+    """
+    Prédictions de chaque arbre d'une RandomForestRegressor sur une matrice prétraitée.
+
+    forest.apply donne en un appel la feuille atteinte dans chaque arbre (parcours compilé,
+    réparti sur les cœurs de la forêt); les valeurs des feuilles sont ensuite lues d'un seul
+    coup dans un tableau commun à tous les arbres.
+
+    Returns:
+        Tableau de forme (arbres, lignes, sorties); leur moyenne sur les arbres est forest.predict(X)
+    """
+    values, offsets = _leaf_values(forest)
+    return np.concatenate([
+        values[forest.apply(X[start:start + chunk_size]) + offsets].transpose(1, 0, 2)
+        for start in range(0, X.shape[0], chunk_size)
+    ], axis=1)
+
+
+def _tree_quantiles(per_tree, valid, quantiles):
+    # Quantiles (interpolation linéaire, comme np.quantile) des prédictions des seuls arbres
+    # valides de chaque ligne; per_tree de forme (arbres, lignes, sorties), valid (arbres, lignes)
+    values = np.sort(np.where(valid[:, :, np.newaxis], per_tree, np.nan), axis=0)
+    counts = valid.sum(axis=0)[np.newaxis, :, np.newaxis]
+    results = []
+    for quantile in quantiles:
+        position = quantile * (counts - 1)
+        below = np.floor(position).astype(np.intp)
+        above = np.minimum(below + 1, counts - 1)
+        low = np.take_along_axis(values, np.broadcast_to(below, (1,) + values.shape[1:]), axis=0)[0]
+        high = np.take_along_axis(values, np.broadcast_to(above, (1,) + values.shape[1:]), axis=0)[0]
+        results.append(low + (position[0] - below[0]) * (high - low))
+    return results
+
+
+def _forest_bounds(per_tree, scales, coverage):
+    # Bornes de l'intervalle autour de la moyenne des arbres: les écarts aux quantiles des
+    # arbres sont multipliés par le facteur de chaque sortie
+    prediction = per_tree.mean(axis=0)
+    lower, upper = np.quantile(per_tree, [(1 - coverage) / 2, (1 + coverage) / 2], axis=0)
+    return prediction - scales * (prediction - lower), prediction + scales * (upper - prediction)
+
+
+def calibrate_forest_intervals(models, X_train, y_train, coverage=INTERVAL_COVERAGE,
+                               max_rows=CALIBRATION_ROWS, random_state=0):
+    """
+    Calibre, pour chaque cible d'une forêt, le facteur d'élargissement de la dispersion des arbres.
+
+    Chaque ligne d'entraînement n'a pas servi à environ un tiers des arbres (échantillons
+    bootstrap). Sur un échantillon de lignes, l'intervalle formé par ces seuls arbres est comparé
+    à la déviation mesurée; le facteur retenu est le plus petit qui place la proportion coverage
+    des lignes dans l'intervalle élargi (quantile conforme des rapports écart / demi-largeur).
+
+    Args:
+        models: Dictionnaire de pipelines (voir fit_models), entraînés sur X_train
+        X_train: Variables d'entrée de l'entraînement
+        y_train: DataFrame des déviations de l'entraînement
+        coverage: Probabilité couverte par l'intervalle
+        max_rows: Nombre maximal de lignes utilisées
+        random_state: Graine du tirage des lignes
+
+    Returns:
+        Dictionnaire {cible: facteur} pour les cibles des forêts
+    """
+    rng = np.random.default_rng(random_state)
+    rows = np.sort(rng.choice(len(X_train), size=min(max_rows, len(X_train)), replace=False))
+    scales = {}
+    for targets, model in models.items():
+        regressor = model.named_steps['regressor']
+        if not isinstance(regressor, RandomForestRegressor):
+            continue
+        if not regressor.bootstrap:
+            raise ValueError("Calibrage des intervalles impossible: forêt entraînée sans échantillons bootstrap")
+        target_list = list(targets) if isinstance(targets, tuple) else [targets]
+        per_tree = tree_predictions(regressor, model.named_steps['preprocessor'].transform(X_train.iloc[rows]))
+        # Arbres pour lesquels chaque ligne est hors sac
+        out_of_bag = np.ones((len(regressor.estimators_), len(X_train)), dtype=bool)
+        for i, samples in enumerate(regressor.estimators_samples_):
+            out_of_bag[i, samples] = False
+        out_of_bag = out_of_bag[:, rows]
+        kept = out_of_bag.sum(axis=0) >= 2
+        per_tree, out_of_bag = per_tree[:, kept], out_of_bag[:, kept]
+
+        prediction = np.where(out_of_bag[:, :, np.newaxis], per_tree, 0).sum(axis=0) / out_of_bag.sum(axis=0)[:, np.newaxis]
+        lower, upper = _tree_quantiles(per_tree, out_of_bag, [(1 - coverage) / 2, (1 + coverage) / 2])
+        y = y_train[target_list].to_numpy()[rows][kept]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(y >= prediction, (y - prediction) / (upper - prediction),
+                              (prediction - y) / (prediction - lower))
+        ratios = np.nan_to_num(ratios, nan=0.0, posinf=np.inf)
+        # Quantile conforme: rang ceil((n + 1) * coverage) parmi n rapports
+        level = min(1.0, np.ceil((len(ratios) + 1) * coverage) / len(ratios))
+        for i, target in enumerate(target_list):
+            scales[target] = float(np.quantile(ratios[:, i], level, method='higher'))
+    return scales
+
+
+def fit_quantile_models(X_train, y_train, model_option, coverage=INTERVAL_COVERAGE, design=None, timer=None):
+    """
+    Entraîne, pour chaque cible, les modèles des quantiles inférieur et supérieur de l'intervalle.
+
+    Args:
+        X_train: Variables d'entrée
+        y_train: DataFrame des déviations (une colonne par cible)
+        model_option: Option de modèle (voir QUANTILE_OPTIONS)
+        coverage: Probabilité couverte par l'intervalle
+        design: Matrice des variables (build_design_matrix) à réutiliser, facultative
+        timer: StageTimer facultatif
+
+    Returns:
+        Dictionnaire {cible: (pipeline du quantile inférieur, pipeline du quantile supérieur)}
+    """
+    if model_option not in QUANTILE_OPTIONS:
+        raise ValueError(f"Modèles quantiles indisponibles pour le modèle {model_option}")
+    if design is not None:
+        check_design(design, model_option)
+        preprocessor, X_transformed = design['preprocessor'], design['X_train']
+    else:
+        with timed(timer, "Ajustement du préprocesseur (quantiles)"):
+            preprocessor = build_preprocessor(model_option)
+            X_transformed = preprocessor.fit_transform(X_train)
+
+    quantiles = ((1 - coverage) / 2, (1 + coverage) / 2)
+    quantile_models = {}
+    for target in y_train.columns:
+        bounds = []
+        for quantile in quantiles:
+            with timed(timer, f"Entraînement du modèle quantile ({target})"):
+                regressor = build_regressor(model_option).set_params(loss='quantile', quantile=quantile)
+                regressor.fit(X_transformed, y_train[target])
+            bounds.append(Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)]))
+        quantile_models[target] = tuple(bounds)
+    return quantile_models
+
+
+def supports_intervals(models, quantile_models=None, forest_scales=None):
+    """Indique si prediction_intervals peut calculer des intervalles pour tous les modèles."""
+    for targets, model in models.items():
+        target_list = targets if isinstance(targets, tuple) else (targets,)
+        if isinstance(model.named_steps['regressor'], RandomForestRegressor):
+            available = forest_scales
+        else:
+            available = quantile_models
+        if not available or any(target not in available for target in target_list):
+            return False
+    return True
+
+
+def prediction_intervals(models, X, coverage=INTERVAL_COVERAGE, quantile_models=None, forest_scales=None):
+    """
+    Calcule les bornes de l'intervalle de prédiction de chaque cible.
+
+    Pour une forêt, les écarts entre la prédiction et les quantiles des prédictions des arbres
+    sont élargis par les facteurs de calibrate_forest_intervals. Les autres modèles utilisent
+    les modèles quantiles de fit_quantile_models (entraînés pour une probabilité fixée).
+
+    Args:
+        models: Dictionnaire de pipelines (voir fit_models)
+        X: Variables d'entrée (colonnes FEATURES)
+        coverage: Probabilité couverte, pour les forêts (celle du calibrage)
+        quantile_models: Résultat de fit_quantile_models, facultatif
+        forest_scales: Résultat de calibrate_forest_intervals, nécessaire pour les forêts
+
+    Returns:
+        DataFrame avec les colonnes '<cible>_inf' et '<cible>_sup', même index que X
+    """
+    bounds = {}
+    for targets, model in models.items():
+        target_list = targets if isinstance(targets, tuple) else (targets,)
+        regressor = model.named_steps['regressor']
+        if isinstance(regressor, RandomForestRegressor) and forest_scales and all(
+                target in forest_scales for target in target_list):
+            per_tree = tree_predictions(regressor, model.named_steps['preprocessor'].transform(X))
+            scales = np.array([forest_scales[target] for target in target_list])
+            lower, upper = _forest_bounds(per_tree, scales, coverage)
+            for i, target in enumerate(target_list):
+                bounds[f"{target}_inf"] = lower[:, i]
+                bounds[f"{target}_sup"] = upper[:, i]
+        elif quantile_models and all(target in quantile_models for target in target_list):
+            for target in target_list:
+                lower_model, upper_model = quantile_models[target]
+                lower, upper = lower_model.predict(X), upper_model.predict(X)
+                # Les deux modèles sont indépendants: leurs prédictions peuvent se croiser
+                bounds[f"{target}_inf"] = np.minimum(lower, upper)
+                bounds[f"{target}_sup"] = np.maximum(lower, upper)
+        else:
+            raise ValueError("Intervalles de prédiction disponibles uniquement pour la forêt aléatoire calibrée "
+                             "et les modèles entraînés avec les quantiles")
+    return pd.DataFrame(bounds, index=X.index)
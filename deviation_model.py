@@ -0,0 +1,434 @@
+"""Prétraitement, entraînement, évaluation et prédiction des modèles de déviation, sans Streamlit."""
+
+import copy
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import sparse
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.svm import SVR
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.neural_network import MLPRegressor
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+
+from deviation_data import NUMERIC_FEATURES, CATEGORICAL_FEATURES, TARGETS
+from deviation_perf import timed
+from deviation_trajectory import final_offsets
+
+# Variables d'entrée des modèles, dans l'ordre attendu par les pipelines
+FEATURES = ['profondeur_finale', 'azimuth_initial', 'inclinaison_initiale', 'lithologie', 'company', 'vitesse_rotation']
+
+MODEL_OPTIONS = ["Random Forest", "SVM", "Régression Linéaire", "Réseau de Neurones", "Gradient Boosting"]
+
+# Modèles qui traitent eux-mêmes les variables catégorielles (sans encodage one-hot)
+NATIVE_CATEGORICAL_OPTIONS = ["Gradient Boosting"]
+
+# Modèles à arbres, qui convertissent de toute façon leurs entrées en float32: leur matrice des
+# variables partagée est conservée en float32 (voir build_design_matrix); les autres modèles
+# gardent la précision float64 du pipeline, dont dépendent leurs résultats (réseau de neurones, SVR)
+FLOAT32_DESIGN_OPTIONS = ["Random Forest", "Gradient Boosting"]
+
+# Modèles à une seule sortie, enveloppés dans un MultiOutputRegressor en mode conjoint
+SINGLE_OUTPUT_OPTIONS = ["SVM", "Gradient Boosting"]
+
+# Modèles pouvant être mis à jour avec de nouvelles lignes sans réentraînement complet
+INCREMENTAL_MODEL_OPTIONS = ["Random Forest", "Régression Linéaire", "Réseau de Neurones"]
+
+# Passes sur les nouvelles lignes lors d'une mise à jour du réseau de neurones ou du modèle SGD
+INCREMENTAL_EPOCHS = 5
+
+
+def build_preprocessor(model_option=None):
+    """
+    Crée le ColumnTransformer: standardisation des variables numériques, one-hot des catégories.
+
+    Pour les modèles de NATIVE_CATEGORICAL_OPTIONS, les variables numériques sont transmises
+    telles quelles et chaque catégorie est codée par un entier (NaN pour une modalité inconnue),
+    dans cet ordre: numériques puis catégorielles.
+    """
+    if model_option in NATIVE_CATEGORICAL_OPTIONS:
+        return ColumnTransformer(
+            transformers=[
+                ('num', 'passthrough', NUMERIC_FEATURES),
+                ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan),
+                 CATEGORICAL_FEATURES)
+            ])
+
+    numeric_transformer = Pipeline(steps=[
+        ('scaler', StandardScaler())
+    ])
+
+    categorical_transformer = Pipeline(steps=[
+        ('onehot', OneHotEncoder(handle_unknown='ignore'))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, NUMERIC_FEATURES),
+            ('cat', categorical_transformer, CATEGORICAL_FEATURES)
+        ])
+
+
+def build_regressor(model_option, n_jobs=None):
+    """
+    Crée le régresseur correspondant à une option de modèle de l'application.
+
+    n_jobs répartit la construction des arbres de la forêt sur plusieurs cœurs; les autres
+    modèles l'ignorent (le gradient boosting utilise les threads OpenMP).
+    """
+    if model_option == "Random Forest":
+        return RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    if model_option == "SVM":
+        return SVR()
+    if model_option == "Régression Linéaire":
+        return LinearRegression()
+    if model_option == "Réseau de Neurones":
+        return MLPRegressor(hidden_layer_sizes=(100, 50), max_iter=1000, random_state=42)
+    if model_option == "Gradient Boosting":
+        # Catégories natives: colonnes placées après les numériques par build_preprocessor
+        categorical_mask = [False] * len(NUMERIC_FEATURES) + [True] * len(CATEGORICAL_FEATURES)
+        return HistGradientBoostingRegressor(max_iter=500, early_stopping=True, validation_fraction=0.1,
+                                             n_iter_no_change=10, categorical_features=categorical_mask,
+                                             random_state=42)
+    raise ValueError(f"Modèle inconnu: {model_option}")
+
+
+def build_model(model_option, multi_output=False, n_jobs=None):
+    """
+    Crée le pipeline complet (prétraitement + régresseur) non entraîné.
+
+    Avec multi_output=True, le pipeline prédit toutes les cibles à la fois. Random Forest,
+    la régression linéaire et le réseau de neurones le gèrent nativement; SVR et le gradient
+    boosting sont enveloppés dans un MultiOutputRegressor (un régresseur par cible).
+    """
+    regressor = build_regressor(model_option, n_jobs=n_jobs)
+    if multi_output and model_option in SINGLE_OUTPUT_OPTIONS:
+        regressor = MultiOutputRegressor(regressor, n_jobs=n_jobs)
+    return Pipeline(steps=[
+        ('preprocessor', build_preprocessor(model_option)),
+        ('regressor', regressor)
+    ])
+
+
+def split_data(df, test_size=0.2, random_state=42):
+    """
+    Sépare les variables d'entrée et les déviations en jeux d'entraînement et de test.
+
+    Returns:
+        Tuple (X_train, X_test, y_train, y_test), les y étant des DataFrames avec une colonne par cible
+    """
+    return train_test_split(df[FEATURES], df[TARGETS], test_size=test_size, random_state=random_state)
+
+
+def preprocessor_kind(model_option):
+    """Identifie le préprocesseur d'une option de modèle: 'natif' (catégories natives) ou 'standard'."""
+    return 'natif' if model_option in NATIVE_CATEGORICAL_OPTIONS else 'standard'
+
+
+def design_dtype(model_option):
+    """Type de la matrice des variables d'une option de modèle: float32 pour les arbres, sinon float64."""
+    return np.float32 if model_option in FLOAT32_DESIGN_OPTIONS else np.float64
+
+
+def _compact(X_transformed, dtype):
+    # Conserve le format creux éventuel et réduit la précision des valeurs
+    if sparse.issparse(X_transformed):
+        return X_transformed.astype(dtype).tocsr()
+    return np.asarray(X_transformed, dtype=dtype)
+
+
+def build_design_matrix(X_train, X_test, model_option=None, dtype=None, timer=None):
+    """
+    Ajuste le préprocesseur une seule fois et transforme les jeux d'entraînement et de test.
+
+    La matrice obtenue peut être transmise à fit_models, tune_models et evaluate pour toutes les
+    options de modèle de même preprocessor_kind et de même design_dtype: changer de modèle ne
+    coûte alors que l'ajustement du régresseur.
+
+    Args:
+        X_train: Variables d'entrée d'entraînement
+        X_test: Variables d'entrée de test
+        model_option: Option de modèle dont le préprocesseur est construit
+        dtype: Type des matrices conservées; par défaut design_dtype(model_option). float32
+            divise la mémoire par deux mais modifie les résultats des modèles qui ne sont pas
+            à arbres (réseau de neurones, SVR)
+        timer: StageTimer facultatif
+
+    Returns:
+        Dictionnaire {'kind', 'preprocessor' (ajusté), 'X_train', 'X_test', 'nbytes'}
+    """
+    if dtype is None:
+        dtype = design_dtype(model_option)
+    with timed(timer, "Ajustement du préprocesseur"):
+        preprocessor = build_preprocessor(model_option)
+        X_train_transformed = _compact(preprocessor.fit_transform(X_train), dtype)
+        X_test_transformed = _compact(preprocessor.transform(X_test), dtype)
+    nbytes = sum(
+        X.data.nbytes + X.indices.nbytes + X.indptr.nbytes if sparse.issparse(X) else X.nbytes
+        for X in (X_train_transformed, X_test_transformed)
+    )
+    return {
+        'kind': preprocessor_kind(model_option),
+        'preprocessor': preprocessor,
+        'X_train': X_train_transformed,
+        'X_test': X_test_transformed,
+        'nbytes': nbytes
+    }
+
+
+def check_design(design, model_option):
+    """Vérifie qu'une matrice des variables (build_design_matrix) convient à une option de modèle."""
+    if design is None:
+        return
+    if design['kind'] != preprocessor_kind(model_option):
+        raise ValueError(f"La matrice des variables ({design['kind']}) ne convient pas au modèle {model_option}")
+    if design['X_train'].dtype != design_dtype(model_option):
+        raise ValueError(f"La matrice des variables ({design['X_train'].dtype}) n'a pas la précision attendue "
+                         f"par le modèle {model_option}")
+
+
+def _fit_pipeline(model, X_train, y_train, label, timer=None, design=None):
+    # Équivalent à model.fit, en mesurant séparément le prétraitement et le régresseur; avec une
+    # matrice des variables (build_design_matrix), le préprocesseur déjà ajusté est réutilisé
+    if design is None:
+        with timed(timer, f"Ajustement du préprocesseur ({label})"):
+            X_transformed = model.named_steps['preprocessor'].fit_transform(X_train)
+    else:
+        model.steps[0] = ('preprocessor', design['preprocessor'])
+        X_transformed = design['X_train']
+    with timed(timer, f"Entraînement du modèle ({label})"):
+        model.named_steps['regressor'].fit(X_transformed, y_train)
+    return model
+
+
+def fit_model(X_train, y_train, model_option, n_jobs=None, timer=None, design=None):
+    """Entraîne un pipeline pour une seule cible; timer (StageTimer) mesure chaque étape."""
+    check_design(design, model_option)
+    model = build_model(model_option, n_jobs=n_jobs)
+    return _fit_pipeline(model, X_train, y_train, getattr(y_train, 'name', None), timer, design)
+
+
+def fit_joint_model(X_train, y_train, model_option, n_jobs=None, timer=None, design=None):
+    """Entraîne un seul pipeline multi-sorties sur toutes les colonnes de y_train."""
+    check_design(design, model_option)
+    model = build_model(model_option, multi_output=True, n_jobs=n_jobs)
+    return _fit_pipeline(model, X_train, y_train.to_numpy(), "conjoint", timer, design)
+
+
+def fit_models(X_train, y_train, model_option, joint=False, n_jobs=None, timer=None, design=None):
+    """
+    Entraîne un pipeline par cible, ou un seul pipeline multi-sorties si joint=True.
+
+    Sans n_jobs, les cibles sont entraînées l'une après l'autre sur un seul cœur. Avec n_jobs,
+    chaque cible est entraînée dans son propre processus et les cœurs restants servent à
+    construire les arbres de la forêt en parallèle.
+
+    Args:
+        X_train: Variables d'entrée
+        y_train: DataFrame des déviations (une colonne par cible)
+        model_option: Nom du modèle (voir MODEL_OPTIONS)
+        joint: Si True, entraîne un modèle commun à toutes les cibles
+        n_jobs: Nombre de cœurs à utiliser (-1 pour tous), None pour l'entraînement séquentiel
+        timer: StageTimer facultatif; en parallèle, seule la durée totale est mesurable
+        design: Matrice des variables de X_train (build_design_matrix) à réutiliser, facultative
+
+    Returns:
+        Dictionnaire {cible: pipeline entraîné}, ou {tuple des cibles: pipeline} en mode conjoint
+    """
+    if joint:
+        return {tuple(y_train.columns): fit_joint_model(X_train, y_train, model_option, n_jobs=n_jobs, timer=timer,
+                                                        design=design)}
+    if n_jobs is None:
+        return {target: fit_model(X_train, y_train[target], model_option, timer=timer, design=design)
+                for target in y_train.columns}
+
+    targets = list(y_train.columns)
+    n_workers = effective_n_jobs(n_jobs)
+    target_jobs = min(len(targets), n_workers)
+    jobs_per_model = max(1, n_workers // target_jobs)
+    with timed(timer, "Entraînement parallèle des modèles"):
+        fitted = Parallel(n_jobs=target_jobs)(
+            delayed(fit_model)(X_train, y_train[target], model_option, n_jobs=jobs_per_model, design=design)
+            for target in targets
+        )
+    if design is not None:
+        # Les processus renvoient des copies du préprocesseur: on rétablit l'objet partagé
+        for model in fitted:
+            model.steps[0] = ('preprocessor', design['preprocessor'])
+    return dict(zip(targets, fitted))
+
+
+def _sgd_from_linear(coef, intercept, X, y, n_epochs):
+    # Régression SGD initialisée avec les coefficients de la régression linéaire, puis ajustée
+    # sur les nouvelles lignes seulement
+    sgd = SGDRegressor(max_iter=n_epochs, tol=None, learning_rate='constant', eta0=1e-3, random_state=42)
+    return sgd.fit(X, y, coef_init=coef, intercept_init=intercept)
+
+
+def _update_regressor(regressor, X, y, n_train_rows, n_epochs):
+    if isinstance(regressor, RandomForestRegressor):
+        # Arbres supplémentaires entraînés sur les nouvelles lignes, en proportion de leur nombre
+        n_trees = len(regressor.estimators_)
+        n_new_trees = max(1, round(n_trees * len(X) / n_train_rows))
+        regressor.set_params(warm_start=True, n_estimators=n_trees + n_new_trees)
+        return regressor.fit(X, y)
+    if isinstance(regressor, MLPRegressor):
+        for _ in range(n_epochs):
+            regressor.partial_fit(X, y)
+        return regressor
+    if isinstance(regressor, LinearRegression):
+        if np.ndim(regressor.coef_) == 1:
+            return _sgd_from_linear(regressor.coef_, regressor.intercept_, X, y, n_epochs)
+        # Modèle conjoint: une régression SGD par cible, réunies dans un MultiOutputRegressor
+        multi_output = MultiOutputRegressor(SGDRegressor())
+        multi_output.estimators_ = [
+            _sgd_from_linear(coef, intercept, X, y[:, i], n_epochs)
+            for i, (coef, intercept) in enumerate(zip(regressor.coef_, regressor.intercept_))
+        ]
+        multi_output.n_features_in_ = X.shape[1]
+        return multi_output
+    if isinstance(regressor, SGDRegressor) or (
+            isinstance(regressor, MultiOutputRegressor) and isinstance(regressor.estimator, SGDRegressor)):
+        for _ in range(n_epochs):
+            regressor.partial_fit(X, y)
+        return regressor
+    raise ValueError(f"Le modèle {type(regressor).__name__} ne permet pas la mise à jour incrémentale")
+
+
+def update_models(models, X_new, y_new, n_train_rows, n_epochs=INCREMENTAL_EPOCHS, timer=None):
+    """
+    Met à jour des modèles entraînés avec de nouvelles lignes, en un temps proportionnel à
+    leur nombre.
+
+    Le préprocesseur n'est pas réajusté (les nouvelles modalités sont ignorées par l'encodage
+    one-hot). Selon le régresseur:
+        - Random Forest: des arbres sont ajoutés (warm_start), entraînés sur les nouvelles
+          lignes, en proportion de leur nombre par rapport à n_train_rows
+        - Réseau de neurones: n_epochs passes de partial_fit
+        - Régression linéaire: remplacée par une régression SGD partant des mêmes coefficients,
+          puis mise à jour par partial_fit lors des mises à jour suivantes
+        - SVM: non pris en charge (ValueError)
+
+    Args:
+        models: Dictionnaire de modèles entraînés (voir fit_models); il n'est pas modifié
+        X_new: Variables d'entrée des nouvelles lignes
+        y_new: DataFrame des déviations mesurées des nouvelles lignes
+        n_train_rows: Nombre de lignes déjà apprises par les modèles
+        n_epochs: Passes sur les nouvelles lignes (réseau de neurones et SGD)
+        timer: StageTimer facultatif
+
+    Returns:
+        Nouveau dictionnaire de modèles mis à jour
+    """
+    updated = {}
+    for targets, model in models.items():
+        # Copie: les modèles rechargés du stockage sont en lecture seule (mmap)
+        model = copy.deepcopy(model)
+        y = y_new[list(targets)].to_numpy() if isinstance(targets, tuple) else y_new[targets].to_numpy()
+        label = "conjoint" if isinstance(targets, tuple) else targets
+        with timed(timer, f"Mise à jour incrémentale ({label})"):
+            X_transformed = model.named_steps['preprocessor'].transform(X_new)
+            model.steps[-1] = ('regressor', _update_regressor(
+                model.named_steps['regressor'], X_transformed, y, n_train_rows, n_epochs
+            ))
+        updated[targets] = model
+    return updated
+
+
+def predict(models, X, design=None):
+    """
+    Prédit toutes les cibles; renvoie un DataFrame avec une colonne par cible.
+
+    Les clés de models sont soit une cible, soit un tuple de cibles pour un modèle multi-sorties.
+    Si design (build_design_matrix) est fourni, X est son jeu de test: les modèles qui partagent
+    son préprocesseur prédisent directement sur la matrice déjà transformée.
+    """
+    predictions = {}
+    for targets, model in models.items():
+        if design is not None and model.named_steps['preprocessor'] is design['preprocessor']:
+            y_pred = model.named_steps['regressor'].predict(design['X_test'])
+        else:
+            y_pred = model.predict(X)
+        if isinstance(targets, tuple):
+            for i, target in enumerate(targets):
+                predictions[target] = y_pred[:, i]
+        else:
+            predictions[targets] = y_pred
+    return pd.DataFrame(predictions, index=X.index)
+
+
+def evaluate(models, X_test, y_test, design=None):
+    """
+    Calcule les prédictions, le RMSE et le R² de chaque cible sur le jeu de test.
+
+    Returns:
+        Dictionnaire {cible: {'rmse', 'r2', 'y_pred'}}
+    """
+    predictions = predict(models, X_test, design=design)
+    metrics = {}
+    for target in predictions.columns:
+        y_pred = predictions[target].to_numpy()
+        metrics[target] = {
+            'rmse': np.sqrt(mean_squared_error(y_test[target], y_pred)),
+            'r2': r2_score(y_test[target], y_pred),
+            'y_pred': y_pred
+        }
+    return metrics
+
+
+def get_feature_names(model):
+    """Noms des variables après prétraitement (numériques puis modalités one-hot ou catégories codées)."""
+    preprocessor = model.named_steps['preprocessor']
+    if isinstance(preprocessor.named_transformers_['cat'], OrdinalEncoder):
+        return np.array(NUMERIC_FEATURES + CATEGORICAL_FEATURES)
+    cat_features = preprocessor.named_transformers_['cat'].named_steps['onehot'].get_feature_names_out(CATEGORICAL_FEATURES)
+    return np.concatenate([NUMERIC_FEATURES, cat_features])
+
+
+def predict_holes(models, holes):
+    """
+    Prédit les déviations d'un lot de forages planifiés, avec un seul appel predict par modèle.
+
+    Args:
+        models: Dictionnaire de modèles entraînés (voir fit_models)
+        holes: DataFrame contenant au moins les colonnes FEATURES; les autres colonnes
+            (identifiant, coordonnées du collet...) sont conservées
+
+    Returns:
+        DataFrame des forages complété par les déviations prédites, l'azimuth et l'inclinaison
+        finaux, l'intensité de la déviation (°) et l'écart final par rapport à la trajectoire
+        planifiée (m), calculé par courbure minimale (voir deviation_trajectory)
+    """
+    missing = [col for col in FEATURES if col not in holes.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+
+    predictions = predict(models, holes[FEATURES])
+    predicted_azimuth = predictions['deviation_azimuth'].to_numpy()
+    predicted_inclinaison = predictions['deviation_inclinaison'].to_numpy()
+
+    depth = holes['profondeur_finale'].to_numpy(dtype=np.float64)
+    azimuth_initial = holes['azimuth_initial'].to_numpy(dtype=np.float64)
+    inclinaison_initiale = holes['inclinaison_initiale'].to_numpy(dtype=np.float64)
+
+    # Normaliser l'azimuth (0-360°) et contraindre l'inclinaison entre -90 et 0
+    azimuth_final = (azimuth_initial + predicted_azimuth) % 360
+    inclinaison_finale = np.clip(inclinaison_initiale + predicted_inclinaison, -90, 0)
+
+    # Écart entre le fond du forage prédit et celui de la trajectoire planifiée (courbure minimale)
+    offset = final_offsets(depth, azimuth_initial, inclinaison_initiale, azimuth_final, inclinaison_finale)
+
+    results = holes.copy()
+    results['deviation_azimuth'] = predicted_azimuth
+    results['deviation_inclinaison'] = predicted_inclinaison
+    results['azimuth_final'] = azimuth_final
+    results['inclinaison_finale'] = inclinaison_finale
+    results['intensite_deviation'] = np.hypot(predicted_azimuth, predicted_inclinaison)
+    results['ecart_final_m'] = offset
+    return results
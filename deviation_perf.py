@@ -0,0 +1,167 @@
+"""Mesure de la durée et de la mémoire des étapes d'une exécution."""
+
+import datetime
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def current_memory_mb():
+    """
+    Mémoire résidente du processus en Mo, ou None si elle n'est pas disponible.
+
+    Sous Linux la valeur courante est lue dans /proc; ailleurs, on se rabat sur le pic
+    mémoire fourni par le module resource.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS et en kilo-octets ailleurs
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+# Tableaux d'un arbre scikit-learn (objet Cython sans __dict__)
+_TREE_ARRAYS = ('children_left', 'children_right', 'feature', 'threshold', 'value', 'impurity',
+                'n_node_samples', 'weighted_n_node_samples')
+
+
+def _array_buffers(value, seen):
+    # Génère (clé du tableau, octets) pour chaque tableau atteignable depuis value. seen garde
+    # chaque objet visité en vie pendant le parcours, pour qu'un id ne soit pas réutilisé.
+    if id(value) in seen:
+        return
+    seen[id(value)] = value
+    if isinstance(value, np.memmap):
+        # Projection d'un fichier (modèles enregistrés): pages partagées par le système, non comptées
+        return
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            for item in value.flat:
+                yield from _array_buffers(item, seen)
+        yield value.__array_interface__['data'][0], value.nbytes
+    elif isinstance(value, pd.DataFrame):
+        for _, column in value.items():
+            yield from _array_buffers(column, seen)
+    elif isinstance(value, (pd.Series, pd.Index)):
+        if isinstance(value.dtype, pd.CategoricalDtype):
+            yield from _array_buffers(value.array.codes, seen)
+            yield from _array_buffers(value.array.categories, seen)
+        elif isinstance(value.array, pd.arrays.NumpyExtensionArray) or isinstance(value.dtype, np.dtype):
+            yield from _array_buffers(value.to_numpy(copy=False), seen)
+        else:
+            # Tableau d'extension (texte, Arrow): taille estimée par pandas
+            yield ('extension', id(value.array)), int(value.memory_usage(deep=True))
+            seen[id(value.array)] = value.array
+    elif sparse.issparse(value):
+        for part in (value.data, getattr(value, 'indices', None), getattr(value, 'indptr', None)):
+            if part is not None:
+                yield from _array_buffers(part, seen)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _array_buffers(item, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            yield from _array_buffers(item, seen)
+    elif all(hasattr(value, name) for name in _TREE_ARRAYS):
+        for name in _TREE_ARRAYS:
+            yield from _array_buffers(getattr(value, name), seen)
+    elif hasattr(value, '__dict__') and not isinstance(value, type):
+        for item in vars(value).values():
+            yield from _array_buffers(item, seen)
+
+
+def memory_report(objects):
+    """
+    Mémoire des tableaux NumPy et pandas de chaque objet, les tableaux partagés (vues, objets
+    référencés plusieurs fois) n'étant comptés qu'une fois.
+
+    Les conteneurs, DataFrames et estimateurs scikit-learn sont parcourus; les petits objets
+    Python et les tableaux projetés depuis le disque (np.memmap) ne sont pas comptés.
+
+    Args:
+        objects: Dictionnaire {nom: objet}, dans l'ordre d'attribution de la mémoire partagée
+
+    Returns:
+        DataFrame avec les colonnes 'objet', 'memory_mb' (tableaux comptés pour cet objet) et
+        'shared_mb' (tableaux déjà comptés pour un objet précédent)
+    """
+    counted = set()
+    keep_alive = []
+    rows = []
+    for name, value in objects.items():
+        seen = {}
+        buffers = dict(_array_buffers(value, seen))
+        keep_alive.append(seen)
+        own = sum(nbytes for key, nbytes in buffers.items() if key not in counted)
+        shared = sum(nbytes for key, nbytes in buffers.items() if key in counted)
+        counted.update(buffers)
+        rows.append({'objet': name, 'memory_mb': own / 1e6, 'shared_mb': shared / 1e6})
+    return pd.DataFrame(rows, columns=['objet', 'memory_mb', 'shared_mb'])
+
+
+class StageTimer:
+    """
+    Enregistre la durée et la variation de mémoire résidente de chaque étape.
+
+    La mémoire est celle de tout le processus: sur un serveur partagé, une variation peut
+    inclure l'activité d'autres sessions.
+    """
+
+    def __init__(self, records=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = list(records or [])
+
+    @contextmanager
+    def stage(self, name):
+        memory_before = current_memory_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            memory_after = current_memory_mb()
+            self.records.append({
+                'stage': name,
+                'seconds': seconds,
+                'memory_delta_mb': (memory_after - memory_before
+                                    if memory_before is not None and memory_after is not None else None)
+            })
+
+    def to_frame(self):
+        """Étapes dans l'ordre d'exécution, une ligne par nom d'étape (durées cumulées)."""
+        if not self.records:
+            return pd.DataFrame(columns=['stage', 'seconds', 'memory_delta_mb', 'calls'])
+        frame = pd.DataFrame(self.records)
+        return frame.groupby('stage', sort=False).agg(
+            seconds=('seconds', 'sum'),
+            memory_delta_mb=('memory_delta_mb', 'sum'),
+            calls=('seconds', 'size')
+        ).reset_index()
+
+    def write_jsonl(self, path):
+        """Ajoute une ligne JSON par étape à un fichier journal."""
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps({'timestamp': timestamp, 'run_id': self.run_id, **record},
+                                   ensure_ascii=False) + '\n')
+
+
+def timed(timer, name):
+    """Contexte de mesure d'une étape, sans effet si timer est None."""
+    return timer.stage(name) if timer is not None else nullcontext()
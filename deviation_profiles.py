@@ -0,0 +1,95 @@
+"""Profils de mappage des colonnes, reconnus à partir de l'en-tête du CSV."""
+
+import datetime
+import json
+import os
+import tempfile
+
+from deviation_data import NOT_AVAILABLE
+
+# Fichier des profils (modifiable par la variable d'environnement DEVIATION_MAPPING_PROFILES)
+MAPPING_PROFILES_PATH = os.environ.get(
+    'DEVIATION_MAPPING_PROFILES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mapping_profiles.json')
+)
+
+
+def load_profiles(path=None):
+    """
+    Lit les profils de mappage enregistrés.
+
+    Returns:
+        Liste de dictionnaires {'name', 'header', 'mapping', 'saved_at'}, vide si le fichier
+        n'existe pas encore
+    """
+    path = path or MAPPING_PROFILES_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_profile(name, header, column_mapping, path=None):
+    """
+    Enregistre (ou remplace, pour un même nom) un profil de mappage.
+
+    Le fichier est réécrit dans un fichier temporaire puis renommé atomiquement.
+
+    Args:
+        name: Nom du profil (format d'export, logiciel, entreprise...)
+        header: Colonnes du CSV pour lequel le mappage a été fait
+        column_mapping: Dictionnaire {colonne attendue: colonne du CSV ou NOT_AVAILABLE}
+
+    Returns:
+        Le profil enregistré
+    """
+    name = name.strip()
+    if not name:
+        raise ValueError("Le nom du profil de mappage est vide")
+    path = path or MAPPING_PROFILES_PATH
+    profile = {
+        'name': name,
+        'header': [str(col) for col in header],
+        'mapping': dict(column_mapping),
+        'saved_at': datetime.datetime.now().isoformat(timespec='seconds')
+    }
+    profiles = [existing for existing in load_profiles(path) if existing['name'] != name] + [profile]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return profile
+
+
+def match_profile(profiles, columns):
+    """
+    Cherche le profil applicable à un CSV d'après son en-tête.
+
+    Un profil est applicable si toutes ses colonnes sources sont présentes. Un profil dont
+    l'en-tête est exactement celui du CSV (à l'ordre près) est préféré, puis le plus récent.
+
+    Args:
+        profiles: Profils lus par load_profiles
+        columns: Colonnes du CSV
+
+    Returns:
+        Tuple (profil ou None, True si l'en-tête est identique à celui du profil)
+    """
+    columns = [str(col) for col in columns]
+    available = set(columns)
+    applicable = [
+        profile for profile in profiles
+        if all(source == NOT_AVAILABLE or source in available for source in profile['mapping'].values())
+    ]
+    if not applicable:
+        return None, False
+    exact = [profile for profile in applicable if sorted(profile['header']) == sorted(columns)]
+    profile = max(exact or applicable, key=lambda p: p['saved_at'])
+    return profile, bool(exact)
@@ -0,0 +1,271 @@
+"""
+Service HTTP local de prédiction des déviations.
+
+Les modèles enregistrés par l'application (voir deviation_store) sont chargés une seule fois
+au démarrage. Les requêtes d'un seul forage arrivant en même temps sont regroupées en
+micro-lots pour amortir chaque appel à predict.
+
+Utilisation:
+    python deviation_server.py --models model_store/<clé>.joblib --port 8502
+
+Points d'accès:
+    POST /predict   JSON (un forage, une liste ou {"holes": [...]}) ou CSV (text/csv)
+    GET  /stats     Percentiles de latence et taille moyenne des micro-lots
+    GET  /health    Vérification de disponibilité
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from deviation_data import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+from deviation_model import FEATURES, predict_holes
+from deviation_store import MODEL_STORE_DIR
+
+
+class LatencyRecorder:
+    """Conserve les dernières latences mesurées et en calcule les percentiles."""
+
+    def __init__(self, maxlen=10000):
+        self._latencies = deque(maxlen=maxlen)
+        self._batch_sizes = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_batch(self, size):
+        with self._lock:
+            self._batch_sizes.append(size)
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+        summary = {'requests': int(len(latencies))}
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+            summary.update({'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': latencies.max() * 1000})
+        if len(batch_sizes):
+            summary['micro_batches'] = int(len(batch_sizes))
+            summary['mean_batch_size'] = float(batch_sizes.mean())
+        return summary
+
+
+def validate_hole(hole):
+    """
+    Vérifie un forage soumis seul et convertit ses variables: nombres pour les colonnes
+    numériques, texte pour les catégories.
+
+    Returns:
+        Copie du forage, prête à être regroupée avec d'autres dans un micro-lot
+    """
+    if not isinstance(hole, dict):
+        raise ValueError("Un forage doit être un objet JSON")
+    missing = [col for col in FEATURES if col not in hole]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+    hole = dict(hole)
+    for col in NUMERIC_FEATURES:
+        try:
+            hole[col] = float(hole[col])
+        except (TypeError, ValueError):
+            raise ValueError(f"Valeur non numérique pour {col}: {hole[col]!r}") from None
+        if not np.isfinite(hole[col]):
+            raise ValueError(f"Valeur manquante ou infinie pour {col}")
+    for col in CATEGORICAL_FEATURES:
+        if hole[col] is not None:
+            hole[col] = str(hole[col])
+    return hole
+
+
+class MicroBatcher:
+    """
+    Regroupe les forages soumis individuellement et les prédit en un seul appel.
+
+    Un lot part dès qu'il atteint max_batch_size forages ou que max_wait_ms s'est écoulé
+    depuis l'arrivée du premier forage. Les forages sont validés à la soumission; si la
+    prédiction du lot échoue malgré tout, chaque forage est repris seul pour que l'erreur ne
+    touche que le forage fautif.
+    """
+
+    def __init__(self, models, max_batch_size=256, max_wait_ms=5.0, recorder=None):
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.recorder = recorder
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, hole):
+        """
+        Soumet un forage (dictionnaire) et renvoie un Future du résultat.
+
+        Lève ValueError, sans rien mettre en file, si le forage est invalide (voir validate_hole).
+        """
+        hole = validate_hole(hole)
+        future = Future()
+        self._queue.put((hole, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._predict_batch(batch)
+
+    def _predict_batch(self, batch):
+        holes = pd.DataFrame([hole for hole, _ in batch])
+        try:
+            results = predict_holes(self.models, holes)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                for item in batch:
+                    self._predict_batch([item])
+            return
+        if self.recorder is not None:
+            self.recorder.record_batch(len(batch))
+        for (_, future), record in zip(batch, _to_records(results)):
+            future.set_result(record)
+
+
+def _to_records(results):
+    return json.loads(results.to_json(orient='records', force_ascii=False))
+
+
+def latest_model_path(store_dir=None):
+    """Fichier de modèles le plus récent du stockage, ou None."""
+    paths = glob.glob(os.path.join(store_dir or MODEL_STORE_DIR, '*.joblib'))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def make_handler(models, batcher, recorder):
+    """Crée la classe de gestionnaire HTTP liée aux modèles chargés."""
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type='application/json'):
+            if not isinstance(body, bytes):
+                body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            elif self.path == '/stats':
+                self._send(200, recorder.summary())
+            else:
+                self._send(404, {'error': f"Chemin inconnu: {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send(404, {'error': f"Chemin inconnu: {self.path}"})
+                return
+
+            start = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            content_type = self.headers.get('Content-Type', 'application/json')
+            try:
+                if content_type.startswith('text/csv'):
+                    holes = pd.read_csv(io.BytesIO(body))
+                    results = predict_holes(models, holes)
+                    if 'text/csv' in self.headers.get('Accept', ''):
+                        response = results.to_csv(index=False).encode('utf-8')
+                        self._send(200, response, content_type='text/csv')
+                        recorder.record(time.perf_counter() - start)
+                        return
+                    response = _to_records(results)
+                else:
+                    payload = json.loads(body)
+                    if isinstance(payload, dict) and 'holes' in payload:
+                        payload = payload['holes']
+                    if isinstance(payload, dict):
+                        # Un seul forage, validé à la soumission pour ne pas faire échouer le micro-lot
+                        response = batcher.submit(payload).result()
+                    else:
+                        response = _to_records(predict_holes(models, pd.DataFrame(payload)))
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+                return
+            except Exception as e:
+                self._send(500, {'error': f"Erreur interne: {e}"})
+                return
+
+            self._send(200, response)
+            recorder.record(time.perf_counter() - start)
+
+    return PredictionHandler
+
+
+class PredictionServer(ThreadingHTTPServer):
+    """Serveur multi-thread avec une file d'attente de connexions adaptée aux appels simultanés."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(models, host='127.0.0.1', port=8502, max_batch_size=256, max_wait_ms=5.0):
+    """Crée le serveur HTTP (non démarré) autour de modèles déjà chargés."""
+    recorder = LatencyRecorder()
+    batcher = MicroBatcher(models, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, recorder=recorder)
+    return PredictionServer((host, port), make_handler(models, batcher, recorder))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP de prédiction des déviations de forage")
+    parser.add_argument('--models', help="Fichier .joblib du stockage (par défaut: le plus récent)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    models_path = args.models or latest_model_path()
+    if models_path is None:
+        parser.error(f"Aucun modèle enregistré dans {MODEL_STORE_DIR}; entraînez d'abord un modèle dans l'application")
+
+    models = joblib.load(models_path, mmap_mode='r')
+    server = create_server(models, host=args.host, port=args.port,
+                           max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    print(f"Modèles chargés depuis {models_path}")
+    print(f"Service de prédiction sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Statistiques de l'onglet Exploration, calculées en une passe par regroupement, sans Streamlit."""
+
+import numpy as np
+import pandas as pd
+
+from deviation_data import CATEGORICAL_FEATURES, TARGETS
+
+# Seuil de |corrélation| au-delà duquel une paire de variables est signalée
+STRONG_CORRELATION_THRESHOLD = 0.3
+
+_DESCRIBE_PERCENTILES = [25, 50, 75]
+
+
+def describe_numeric(numeric):
+    """
+    Équivalent de DataFrame.describe() sur des colonnes numériques, en une passe NumPy.
+
+    Returns:
+        DataFrame indexé par count, mean, std, min, 25%, 50%, 75% et max
+    """
+    values = numeric.to_numpy(dtype=np.float64)
+    count = np.count_nonzero(~np.isnan(values), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary = np.vstack([
+            count,
+            np.nanmean(values, axis=0),
+            np.nanstd(values, axis=0, ddof=1),
+            np.nanmin(values, axis=0),
+            np.nanpercentile(values, _DESCRIBE_PERCENTILES, axis=0),
+            np.nanmax(values, axis=0)
+        ])
+    return pd.DataFrame(summary, columns=numeric.columns,
+                        index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+
+def correlation_matrix(numeric):
+    """Matrice de corrélation de Pearson; np.corrcoef sans valeurs manquantes, DataFrame.corr sinon."""
+    values = numeric.to_numpy(dtype=np.float64)
+    if np.isnan(values).any():
+        return numeric.corr()
+    return pd.DataFrame(np.corrcoef(values, rowvar=False), index=numeric.columns, columns=numeric.columns)
+
+
+def strong_correlations(corr_matrix, threshold=STRONG_CORRELATION_THRESHOLD):
+    """
+    Paires de variables distinctes dont |corrélation| dépasse threshold, par force décroissante.
+
+    Returns:
+        Liste de dictionnaires {'var1', 'var2', 'corr'}
+    """
+    rows, cols = np.tril_indices(len(corr_matrix.columns), k=-1)
+    values = corr_matrix.to_numpy()[rows, cols]
+    selected = np.flatnonzero(np.abs(values) > threshold)
+    selected = selected[np.argsort(-np.abs(values[selected]), kind='stable')]
+    return [
+        {'var1': corr_matrix.columns[rows[k]], 'var2': corr_matrix.columns[cols[k]], 'corr': values[k]}
+        for k in selected
+    ]
+
+
+def grouped_deviation_statistics(df, group):
+    """
+    Moyenne, écart-type, minimum et maximum des déviations par modalité de group, avec la
+    déviation quadratique moyenne sqrt(mean(az² + inc²)), le tout en un seul groupby.
+
+    Returns:
+        DataFrame indexé par modalité; colonnes (cible, statistique) et 'rms_deviation'
+    """
+    deviations = df[TARGETS].astype(np.float64)
+    deviations['_squared'] = np.square(deviations.to_numpy()).sum(axis=1)
+    grouped = deviations.groupby(df[group], observed=True).agg(
+        {target: ['mean', 'std', 'min', 'max'] for target in TARGETS} | {'_squared': ['mean']}
+    )
+    rms = np.sqrt(grouped.pop(('_squared', 'mean')))
+    grouped['rms_deviation'] = rms
+    return grouped
+
+
+def exploration_statistics(df):
+    """
+    Calcule toutes les statistiques de l'onglet Exploration.
+
+    Returns:
+        Dictionnaire avec 'describe', 'corr', 'strong_correlations', 'deviation_metrics'
+        (moyennes et maxima des |déviations|) et 'by_group' ({variable catégorielle:
+        statistiques groupées})
+    """
+    numeric = df.select_dtypes(include=np.number)
+    corr = correlation_matrix(numeric)
+    absolute = np.abs(df[TARGETS].to_numpy(dtype=np.float64))
+    return {
+        'describe': describe_numeric(numeric),
+        'corr': corr,
+        'strong_correlations': strong_correlations(corr),
+        'deviation_metrics': {
+            target: {'mean_abs': np.nanmean(absolute[:, i]), 'max_abs': np.nanmax(absolute[:, i])}
+            for i, target in enumerate(TARGETS)
+        },
+        'by_group': {group: grouped_deviation_statistics(df, group) for group in CATEGORICAL_FEATURES}
+    }
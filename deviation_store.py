@@ -0,0 +1,86 @@
+"""Stockage sur disque des modèles entraînés, indexé par le contenu de l'entraînement."""
+
+import hashlib
+import os
+import tempfile
+
+import joblib
+import pandas as pd
+import sklearn
+
+from deviation_cache import dataframe_fingerprint
+from deviation_model import build_regressor
+
+# Répertoire du stockage (modifiable par la variable d'environnement DEVIATION_MODEL_STORE)
+MODEL_STORE_DIR = os.environ.get(
+    'DEVIATION_MODEL_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_store')
+)
+
+# Paramètres sans effet sur le modèle obtenu, exclus de la clé
+_IGNORED_PARAMS = {'n_jobs', 'verbose'}
+
+
+def model_store_key(X_train, y_train, model_option, joint=False):
+    """
+    Calcule la clé d'un entraînement: données d'entraînement, modèle, hyperparamètres,
+    mode conjoint et version de scikit-learn.
+
+    Returns:
+        Chaîne hexadécimale utilisée comme nom de fichier
+    """
+    params = {
+        name: value for name, value in build_regressor(model_option).get_params().items()
+        if name not in _IGNORED_PARAMS
+    }
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(dataframe_fingerprint(pd.concat([X_train, y_train], axis=1)).encode())
+    digest.update(repr((model_option, sorted(params.items()), joint, sklearn.__version__)).encode())
+    return digest.hexdigest()
+
+
+def _model_path(key, store_dir):
+    return os.path.join(store_dir, f"{key}.joblib")
+
+
+def save_models(models, key, store_dir=None):
+    """
+    Enregistre un dictionnaire de modèles entraînés sous une clé.
+
+    Le fichier est écrit sans compression pour pouvoir être relu par mmap, puis renommé
+    atomiquement pour qu'un lecteur ne voie jamais un fichier partiel.
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    store_dir = store_dir or MODEL_STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+    path = _model_path(key, store_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(models, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def load_models(key, store_dir=None, mmap_mode='r'):
+    """
+    Recharge les modèles enregistrés sous une clé.
+
+    Les tableaux NumPy sont lus par mmap au lieu d'être copiés depuis le flux du fichier, ce
+    qui évite une seconde copie du contenu en mémoire (environ la moitié de la mémoire d'un
+    chargement sans mmap pour une forêt). Les arbres de scikit-learn recopient toutefois leurs
+    nœuds et leurs valeurs dans leur propre mémoire au chargement: une forêt rechargée est
+    entièrement en RAM, seuls les autres tableaux (coefficients, poids, vecteurs de support)
+    restent projetés depuis le disque.
+
+    Returns:
+        Dictionnaire de modèles, ou None si la clé est absente du stockage
+    """
+    path = _model_path(key, store_dir or MODEL_STORE_DIR)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path, mmap_mode=mmap_mode)
@@ -0,0 +1,282 @@
+"""
+Calcul des trajectoires de forage par la méthode de courbure minimale, sans Streamlit.
+
+Conventions: x pointe vers l'est, y vers le nord et z vers le haut; l'azimuth est mesuré en
+degrés depuis le nord dans le sens horaire et l'inclinaison est négative vers le bas. Toutes
+les fonctions acceptent un forage (tableaux 1D de stations) ou plusieurs forages à la fois
+(une ligne par forage).
+"""
+
+import numpy as np
+
+# Nombre de stations par défaut le long d'une trajectoire (collet et fond compris)
+TRAJECTORY_STATIONS = 100
+
+# Stations utilisées pour l'écart final d'un lot: l'écart diffère de moins de 2 cm de celui
+# obtenu avec 400 stations pour des forages de 1000 m, pour un temps de calcul 5 fois plus court
+OFFSET_STATIONS = 20
+
+# Nombre de forages traités à la fois par final_offsets, pour borner la mémoire
+OFFSET_CHUNK_SIZE = 20000
+
+# Colonnes facultatives des coordonnées du collet (m) dans un fichier de forages planifiés
+COLLAR_COLUMNS = ['collet_est', 'collet_nord', 'collet_elevation']
+
+
+def direction_vectors(azimuth, inclination):
+    """
+    Vecteurs unitaires (est, nord, haut) pour des azimuths et inclinaisons en degrés.
+
+    Returns:
+        Tableau de forme azimuth.shape + (3,)
+    """
+    azimuth_rad = np.radians(azimuth)
+    inclination_rad = np.radians(inclination)
+    return np.stack([
+        np.cos(inclination_rad) * np.sin(azimuth_rad),
+        np.cos(inclination_rad) * np.cos(azimuth_rad),
+        np.sin(inclination_rad)
+    ], axis=-1)
+
+
+def _curvature_steps(md, azimuth, inclination):
+    # Déplacement entre stations consécutives, de forme (..., n_stations - 1, 3)
+    md = np.asarray(md, dtype=np.float64)
+    directions = direction_vectors(azimuth, inclination)
+    t1 = directions[..., :-1, :]
+    t2 = directions[..., 1:, :]
+    tangent_sum = t1 + t2
+
+    # β = 2·arcsin(|t2 - t1|/2) reste précis pour les très petits doglegs, contrairement à arccos
+    difference = t2 - t1
+    half = np.arcsin(np.clip(np.sqrt(np.einsum('...k,...k->...', difference, difference)) / 2, 0, 1))
+    ratio_factor = np.ones_like(half)
+    curved = half > 5e-10
+    ratio_factor[curved] = np.tan(half[curved]) / half[curved]
+
+    tangent_sum *= (np.diff(md, axis=-1) / 2 * ratio_factor)[..., None]
+    return tangent_sum
+
+
+def minimum_curvature(md, azimuth, inclination):
+    """
+    Positions des stations d'un levé par la méthode de courbure minimale.
+
+    Entre deux stations, la trajectoire est un arc de cercle tangent aux deux directions
+    mesurées; le déplacement vaut ΔMD/2 · (t1 + t2) · RF, avec RF = 2/β · tan(β/2) et β
+    l'angle entre t1 et t2 (dogleg).
+
+    Args:
+        md: Profondeurs le long du forage (m), de forme (..., n_stations), croissantes
+        azimuth: Azimuths aux stations (°), même forme que md
+        inclination: Inclinaisons aux stations (°), même forme que md
+
+    Returns:
+        Positions (m) de forme (..., n_stations, 3), le collet (première station) à l'origine
+    """
+    steps = _curvature_steps(md, azimuth, inclination)
+    positions = np.zeros(steps.shape[:-2] + (steps.shape[-2] + 1, 3))
+    np.cumsum(steps, axis=-2, out=positions[..., 1:, :])
+    return positions
+
+
+def interpolated_stations(depth, azimuth_initial, inclination_initial, azimuth_final, inclination_final,
+                          n_stations=TRAJECTORY_STATIONS):
+    """
+    Stations régulières d'un forage dont l'orientation passe linéairement de l'orientation
+    initiale (collet) à l'orientation finale (fond).
+
+    L'azimuth suit le plus court chemin angulaire, pour qu'un passage par le nord
+    (ex. 350° → 10°) ne fasse pas faire un tour complet au forage.
+
+    Args:
+        depth: Profondeur finale de chaque forage (m), scalaire ou tableau (n_forages,)
+        azimuth_initial, inclination_initial: Orientation au collet (°)
+        azimuth_final, inclination_final: Orientation au fond (°)
+        n_stations: Nombre de stations, collet et fond compris
+
+    Returns:
+        Tuple (md, azimuth, inclination) de forme depth.shape + (n_stations,)
+    """
+    if n_stations < 2:
+        raise ValueError("Une trajectoire nécessite au moins 2 stations")
+    fraction = np.linspace(0, 1, n_stations)
+    depth = np.asarray(depth, dtype=np.float64)[..., None]
+    azimuth_initial = np.asarray(azimuth_initial, dtype=np.float64)[..., None]
+    inclination_initial = np.asarray(inclination_initial, dtype=np.float64)[..., None]
+    azimuth_change = (np.asarray(azimuth_final, dtype=np.float64)[..., None] - azimuth_initial + 180) % 360 - 180
+    inclination_change = np.asarray(inclination_final, dtype=np.float64)[..., None] - inclination_initial
+
+    return (
+        depth * fraction,
+        (azimuth_initial + azimuth_change * fraction) % 360,
+        inclination_initial + inclination_change * fraction
+    )
+
+
+def hole_trajectories(depth, azimuth_initial, inclination_initial, azimuth_final, inclination_final,
+                      n_stations=TRAJECTORY_STATIONS):
+    """
+    Trajectoires déviées et planifiées d'un ou plusieurs forages.
+
+    La trajectoire planifiée garde l'orientation initiale sur toute la profondeur; les deux
+    sont calculées par courbure minimale à partir du même collet.
+
+    Returns:
+        Tuple (trajectoire prédite, trajectoire planifiée), positions (m) de forme
+        depth.shape + (n_stations, 3)
+    """
+    md, azimuth, inclination = interpolated_stations(
+        depth, azimuth_initial, inclination_initial, azimuth_final, inclination_final, n_stations
+    )
+    planned_md, planned_azimuth, planned_inclination = interpolated_stations(
+        depth, azimuth_initial, inclination_initial, azimuth_initial, inclination_initial, n_stations
+    )
+    return (
+        minimum_curvature(md, azimuth, inclination),
+        minimum_curvature(planned_md, planned_azimuth, planned_inclination)
+    )
+
+
+def final_offsets(depth, azimuth_initial, inclination_initial, azimuth_final, inclination_final,
+                  n_stations=OFFSET_STATIONS, chunk_size=OFFSET_CHUNK_SIZE):
+    """
+    Distance (m) entre le fond de la trajectoire prédite et celui de la trajectoire planifiée.
+
+    Les forages sont traités par blocs de chunk_size pour que la mémoire reste proportionnelle
+    à chunk_size × n_stations, quel que soit le nombre de forages.
+
+    Returns:
+        Tableau (n_forages,) des écarts finaux
+    """
+    depth = np.atleast_1d(np.asarray(depth, dtype=np.float64))
+    azimuth_initial, inclination_initial, azimuth_final, inclination_final = (
+        np.broadcast_to(np.asarray(values, dtype=np.float64), depth.shape)
+        for values in (azimuth_initial, inclination_initial, azimuth_final, inclination_final)
+    )
+    # Orientation constante: la courbure minimale donne la ligne droite depth · t0
+    planned_bottom = depth[:, None] * direction_vectors(azimuth_initial, inclination_initial)
+
+    offsets = np.empty(len(depth))
+    for start in range(0, len(depth), chunk_size):
+        block = slice(start, start + chunk_size)
+        md, azimuth, inclination = interpolated_stations(
+            depth[block], azimuth_initial[block], inclination_initial[block],
+            azimuth_final[block], inclination_final[block], n_stations
+        )
+        # Seul le fond est utile: sommer les déplacements sans garder les positions intermédiaires
+        bottom = _curvature_steps(md, azimuth, inclination).sum(axis=1)
+        offsets[block] = np.linalg.norm(bottom - planned_bottom[block], axis=1)
+    return offsets
+
+
+def campaign_trajectories(results, n_stations=TRAJECTORY_STATIONS):
+    """
+    Trajectoires prédites d'une campagne, à partir des résultats de predict_holes.
+
+    Les trajectoires partent des coordonnées du collet (COLLAR_COLUMNS) quand elles sont
+    présentes, de l'origine sinon.
+
+    Returns:
+        Positions (m) de forme (n_forages, n_stations, 3)
+    """
+    positions, _ = hole_trajectories(
+        results['profondeur_finale'].to_numpy(dtype=np.float64),
+        results['azimuth_initial'].to_numpy(dtype=np.float64),
+        results['inclinaison_initiale'].to_numpy(dtype=np.float64),
+        results['azimuth_final'].to_numpy(dtype=np.float64),
+        results['inclinaison_finale'].to_numpy(dtype=np.float64),
+        n_stations
+    )
+    for axis, column in enumerate(COLLAR_COLUMNS):
+        if column in results.columns:
+            positions[..., axis] += results[column].to_numpy(dtype=np.float64)[:, None]
+    return positions
+
+
+def turning_angles(positions):
+    """
+    Angle (radians) entre les segments qui arrivent et repartent de chaque station.
+
+    Returns:
+        Tableau de forme positions.shape[:-1], nul au collet et au fond
+    """
+    segments = np.diff(positions, axis=-2)
+    lengths = np.linalg.norm(segments, axis=-1, keepdims=True)
+    unit = np.divide(segments, lengths, out=np.zeros_like(segments), where=lengths > 0)
+    cosine = np.clip(np.einsum('...k,...k->...', unit[..., :-1, :], unit[..., 1:, :]), -1, 1)
+    angles = np.zeros(positions.shape[:-1])
+    angles[..., 1:-1] = np.arccos(cosine)
+    return angles
+
+
+def decimate_trajectories(positions, max_points):
+    """
+    Choisit les stations à afficher pour que le nombre total de points reste sous max_points.
+
+    Le collet et le fond de chaque forage sont toujours gardés. Entre les deux, une station
+    est gardée chaque fois que la trajectoire a tourné d'un angle de tolérance depuis la
+    précédente: les portions rectilignes se réduisent à leurs extrémités et les points se
+    concentrent là où le forage se courbe. La tolérance est la plus petite qui respecte le
+    budget de points.
+
+    Args:
+        positions: Positions de forme (n_forages, n_stations, 3)
+        max_points: Nombre maximal de points gardés (au moins 2 par forage)
+
+    Returns:
+        Masque booléen (n_forages, n_stations) des stations gardées
+    """
+    n_holes, n_stations = positions.shape[:2]
+    if max_points < 2 * n_holes:
+        raise ValueError(f"Budget de {max_points} points insuffisant pour {n_holes} forages")
+    keep = np.ones((n_holes, n_stations), dtype=bool)
+    if keep.size <= max_points:
+        return keep
+
+    cumulative_turn = np.cumsum(turning_angles(positions), axis=1)
+    interior_budget = max_points - 2 * n_holes
+    total_turn = cumulative_turn[:, -1].sum()
+    if interior_budget == 0 or total_turn == 0:
+        keep[:, 1:-1] = False
+        return keep
+
+    # Chaque forage garde environ (rotation totale / tolérance) stations intérieures; la
+    # tolérance est augmentée tant que l'arrondi dépasse encore le budget
+    tolerance = total_turn / interior_budget
+    while True:
+        step = np.floor(cumulative_turn / tolerance)
+        keep[:, 1:-1] = np.diff(step, axis=1)[:, :-1] > 0
+        if keep.sum() <= max_points:
+            return keep
+        tolerance *= 1.1
+
+
+def pack_trajectories(positions, keep=None, values=None):
+    """
+    Regroupe les stations gardées de tous les forages dans des tableaux à plat, séparés par
+    un NaN entre deux forages pour qu'une seule trace les dessine sans les relier.
+
+    Args:
+        positions: Positions de forme (n_forages, n_stations, 3)
+        keep: Masque (n_forages, n_stations) des stations à garder (voir decimate_trajectories)
+        values: Valeur facultative par forage (n_forages,), répétée sur chacun de ses points
+
+    Returns:
+        Tuple (x, y, z, couleurs), couleurs valant None sans values
+    """
+    n_holes, n_stations = positions.shape[:2]
+    if keep is None:
+        keep = np.ones((n_holes, n_stations), dtype=bool)
+    padded = np.full((n_holes, n_stations + 1, 3), np.nan)
+    padded[:, :-1] = positions
+    padded_keep = np.ones((n_holes, n_stations + 1), dtype=bool)
+    padded_keep[:, :-1] = keep
+    points = padded[padded_keep]
+
+    colors = None
+    if values is not None:
+        colors = np.repeat(np.asarray(values, dtype=np.float64)[:, None], n_stations + 1, axis=1)
+        colors[:, -1] = np.nan
+        colors = colors[padded_keep]
+    return points[:, 0], points[:, 1], points[:, 2], colors
@@ -0,0 +1,246 @@
+"""
+Optimisation des hyperparamètres par divisions successives (successive halving), sans Streamlit.
+
+Tous les candidats sont évalués par validation croisée sur un petit échantillon, puis seul le
+meilleur tiers passe au tour suivant avec trois fois plus de lignes, jusqu'à un seul candidat
+ou l'épuisement du budget de temps (ajustement final compris). Le préprocesseur est ajusté une
+seule fois: la matrice transformée est réutilisée par tous les candidats et tous les tours.
+"""
+
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.stats import loguniform
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.utils import check_random_state
+
+from deviation_model import build_preprocessor, build_regressor, check_design, SINGLE_OUTPUT_OPTIONS
+from deviation_perf import timed
+
+# Espaces de recherche des hyperparamètres du régresseur de chaque option de modèle
+PARAM_DISTRIBUTIONS = {
+    "Random Forest": {
+        'n_estimators': [50, 100, 200, 300],
+        'max_depth': [None, 10, 20, 30],
+        'min_samples_leaf': [1, 2, 4, 8],
+        'max_features': [1.0, 0.5, 'sqrt']
+    },
+    "SVM": {
+        'C': loguniform(0.1, 100),
+        'epsilon': [0.01, 0.1, 0.5, 1.0],
+        'gamma': ['scale', 'auto']
+    },
+    "Régression Linéaire": {
+        'fit_intercept': [True, False],
+        'positive': [False, True]
+    },
+    "Réseau de Neurones": {
+        'hidden_layer_sizes': [(50,), (100,), (100, 50), (200, 100)],
+        'alpha': loguniform(1e-5, 1e-1),
+        'learning_rate_init': loguniform(1e-4, 1e-2)
+    },
+    "Gradient Boosting": {
+        'learning_rate': loguniform(0.01, 0.3),
+        'max_leaf_nodes': [15, 31, 63, 127],
+        'min_samples_leaf': [10, 20, 50, 100],
+        'l2_regularization': loguniform(1e-4, 10)
+    }
+}
+
+# Nombre de candidats tirés au hasard et facteur de sélection entre deux tours
+N_CANDIDATES = 16
+HALVING_FACTOR = 3
+CV_FOLDS = 3
+
+
+def _candidate_regressor(model_option, params, multi_output):
+    regressor = build_regressor(model_option, n_jobs=1).set_params(**params)
+    if multi_output and model_option in SINGLE_OUTPUT_OPTIONS:
+        regressor = MultiOutputRegressor(regressor)
+    return regressor
+
+
+def _fit_and_score(regressor, X, y, train, test):
+    # RMSE d'un pli (moyenne des cibles pour un modèle multi-sorties) et durée d'ajustement
+    start = time.perf_counter()
+    regressor.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+    error = regressor.predict(X[test]) - y[test]
+    return float(np.sqrt(np.mean(np.square(error), axis=0)).mean()), fit_seconds
+
+
+def _subsample(n_rows, rounds, factor, random_state):
+    # Nombre de lignes du premier tour, pour que le dernier tour possible utilise tout le jeu
+    min_resources = max(CV_FOLDS * 10, n_rows // factor ** (rounds - 1))
+    order = check_random_state(random_state).permutation(n_rows)
+    return min_resources, order
+
+
+def _refit_estimate(record, n_rows):
+    # Durée estimée de l'ajustement final d'un candidat sur n_rows lignes, d'après ses plis
+    train_rows = record['lignes'] * (CV_FOLDS - 1) / CV_FOLDS
+    return record['temps_ajustement_s'] * n_rows / train_rows
+
+
+def halving_search(X_transformed, y, model_option, time_budget, n_jobs=1, n_candidates=N_CANDIDATES,
+                   factor=HALVING_FACTOR, random_state=42, label=None):
+    """
+    Cherche les meilleurs hyperparamètres du régresseur sur une matrice déjà transformée.
+
+    Le budget couvre la recherche et l'ajustement final du meilleur candidat sur toutes les
+    lignes: une réserve, estimée d'après les plis du meilleur candidat, en est déduite. Le reste
+    est réparti entre les tours restants (le temps non utilisé par un tour revient aux suivants),
+    si bien qu'un premier tour trop long ne prive pas la recherche des divisions suivantes. Dans
+    un tour, les candidats sont évalués par groupes d'un candidat par cœur, dans l'ordre du
+    classement précédent; un groupe dont la durée estimée dépasse la part du tour n'est pas
+    lancé. Un ajustement en cours n'est pas interrompu et le premier groupe est toujours évalué:
+    le budget est respecté à la durée d'un groupe près. Enfin, le candidat retenu est le meilleur
+    du dernier tour dont l'ajustement final tient dans le temps restant, ou à défaut celui dont
+    l'ajustement final est le plus court (un budget inférieur à cet ajustement est alors dépassé).
+
+    Args:
+        X_transformed: Matrice des variables prétraitées
+        y: Cible (1D) ou cibles (2D, modèle multi-sorties)
+        model_option: Nom du modèle (voir PARAM_DISTRIBUTIONS)
+        time_budget: Durée maximale de la recherche et de l'ajustement final (s)
+        n_jobs: Cœurs utilisés pour évaluer les candidats et les plis en parallèle
+        n_candidates: Nombre de combinaisons tirées au hasard
+        factor: Facteur de sélection et d'augmentation des lignes entre deux tours
+        label: Nom de la cible, reporté dans le classement
+
+    Returns:
+        Tuple (meilleurs hyperparamètres, classement: DataFrame d'une ligne par candidat et par tour)
+    """
+    if model_option not in PARAM_DISTRIBUTIONS:
+        raise ValueError(f"Modèle inconnu: {model_option}")
+    y = np.asarray(y)
+    multi_output = y.ndim > 1
+    distributions = PARAM_DISTRIBUTIONS[model_option]
+    if all(isinstance(values, list) for values in distributions.values()):
+        # Grille finie: ParameterSampler tire sans remise et avertit si elle est plus petite
+        n_candidates = min(n_candidates, len(ParameterGrid(distributions)))
+    candidates = list(ParameterSampler(distributions, n_candidates, random_state=random_state))
+    rounds = max(1, math.ceil(math.log(len(candidates), factor)) + 1)
+    min_resources, order = _subsample(len(y), rounds, factor, random_state)
+
+    batch_size = max(1, effective_n_jobs(n_jobs))
+    records = []
+    deadline = time.perf_counter() + time_budget
+    refit_seconds = 0.0
+    batch_seconds = None
+    previous_resources = None
+    for round_index in range(rounds):
+        n_resources = min(len(y), min_resources * factor ** round_index)
+        # Un tour dispose au plus de la moitié du temps restant (tout le temps pour le dernier tour)
+        available = deadline - time.perf_counter() - refit_seconds
+        round_deadline = time.perf_counter() + (available if round_index == rounds - 1 else available / 2)
+        # Durée d'un groupe: celle du tour précédent, proportionnelle au nombre de lignes
+        if batch_seconds is not None:
+            batch_seconds *= n_resources / previous_resources
+
+        rows = np.sort(order[:n_resources])
+        X_round, y_round = X_transformed[rows], y[rows]
+        folds = list(KFold(CV_FOLDS, shuffle=True, random_state=random_state).split(rows))
+        round_records = []
+        with Parallel(n_jobs=n_jobs) as parallel:
+            for batch_start in range(0, len(candidates), batch_size):
+                if (records or round_records) and (time.perf_counter() + batch_seconds > round_deadline
+                                                   or time.perf_counter() + batch_seconds + refit_seconds > deadline):
+                    break
+                batch = candidates[batch_start:batch_start + batch_size]
+                batch_start_time = time.perf_counter()
+                scores = parallel(
+                    delayed(_fit_and_score)(_candidate_regressor(model_option, params, multi_output),
+                                            X_round, y_round, train, test)
+                    for params in batch for train, test in folds
+                )
+                elapsed = time.perf_counter() - batch_start_time
+                # Moyenne des groupes du tour, ramenée à un groupe complet
+                measured = elapsed * batch_size / len(batch)
+                batch_seconds = measured if not round_records else (batch_seconds + measured) / 2
+                for i, params in enumerate(batch):
+                    fold_scores = scores[i * CV_FOLDS:(i + 1) * CV_FOLDS]
+                    round_records.append({
+                        'cible': label,
+                        'tour': round_index + 1,
+                        'lignes': n_resources,
+                        'hyperparamètres': params,
+                        'rmse_cv': np.mean([rmse for rmse, _ in fold_scores]),
+                        'rmse_cv_std': np.std([rmse for rmse, _ in fold_scores]),
+                        'temps_ajustement_s': np.mean([seconds for _, seconds in fold_scores])
+                    })
+                # Réserve de l'ajustement final: celui du meilleur candidat du tour jusqu'ici
+                refit_seconds = _refit_estimate(min(round_records, key=lambda record: record['rmse_cv']), len(y))
+        if not round_records:
+            # Aucun candidat de ce tour ne tient dans le budget: le tour précédent décide
+            break
+        previous_resources = n_resources
+        records += round_records
+
+        # Seuls les candidats évalués avant l'épuisement du budget restent en lice, du meilleur au moins bon
+        ranked = sorted(round_records, key=lambda record: record['rmse_cv'])
+        candidates = [record['hyperparamètres'] for record in ranked[:max(1, math.ceil(len(ranked) / factor))]]
+        if len(candidates) == 1 or n_resources == len(y):
+            break
+
+    leaderboard = pd.DataFrame(records)
+    if leaderboard.empty:
+        return candidates[0], leaderboard
+    # Meilleur candidat du dernier tour dont l'ajustement final tient dans le temps restant; à
+    # défaut, le candidat évalué dont l'ajustement final est le plus court
+    remaining = deadline - time.perf_counter()
+    last_round = [record for record in records if record['tour'] == records[-1]['tour']]
+    affordable = [record for record in last_round if _refit_estimate(record, len(y)) <= remaining]
+    if affordable:
+        best = min(affordable, key=lambda record: record['rmse_cv'])
+    else:
+        best = min(records, key=lambda record: (_refit_estimate(record, len(y)), record['rmse_cv']))
+    return best['hyperparamètres'], leaderboard
+
+
+def tune_models(X_train, y_train, model_option, joint=False, time_budget=60, n_jobs=1, timer=None, design=None):
+    """
+    Optimise et entraîne les modèles de toutes les cibles (ou le modèle conjoint).
+
+    Le préprocesseur est ajusté et appliqué une seule fois, ou repris de design (matrice des
+    variables de build_design_matrix). Le budget de temps couvre la recherche et l'ajustement
+    final de chaque cible; il est partagé entre les cibles, le temps non utilisé par une cible
+    revenant aux suivantes.
+
+    Returns:
+        Tuple (dictionnaire de pipelines comme fit_models, classement de tous les candidats)
+    """
+    if design is not None:
+        check_design(design, model_option)
+        preprocessor, X_transformed = design['preprocessor'], design['X_train']
+    else:
+        with timed(timer, "Ajustement du préprocesseur (optimisation)"):
+            preprocessor = build_preprocessor(model_option)
+            X_transformed = preprocessor.fit_transform(X_train)
+
+    targets = [tuple(y_train.columns)] if joint else list(y_train.columns)
+    models = {}
+    leaderboards = []
+    deadline = time.perf_counter() + time_budget
+    for i, targets_key in enumerate(targets):
+        label = "conjoint" if joint else targets_key
+        y = y_train.to_numpy() if joint else y_train[targets_key].to_numpy()
+        target_budget = max(0.0, deadline - time.perf_counter()) / (len(targets) - i)
+        with timed(timer, f"Optimisation des hyperparamètres ({label})"):
+            best_params, leaderboard = halving_search(
+                X_transformed, y, model_option, target_budget, n_jobs=n_jobs, label=label
+            )
+        with timed(timer, f"Entraînement du modèle ({label})"):
+            regressor = _candidate_regressor(model_option, best_params, joint)
+            if model_option == "Random Forest":
+                regressor.set_params(n_jobs=n_jobs)
+            regressor.fit(X_transformed, y)
+        # Le préprocesseur déjà ajusté est partagé par les pipelines de toutes les cibles
+        models[targets_key] = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)])
+        leaderboards.append(leaderboard)
+    return models, pd.concat(leaderboards, ignore_index=True)